@@ -0,0 +1,265 @@
+# aboutadmin.py
+import asyncio
+import itertools
+import logging
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from telegram import Update
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from telegram.ext import ContextTypes
+from core_singleton import get_farm_core
+from farmcore import canonical_crop_name
+from aboutdata import import_document, iter_rows, parse_cell_date, parse_cell_number
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_PAGE_SIZE = 200
+BROADCAST_RATE = 25  # messages per second, below Telegram's ~30/s global bot limit
+BROADCAST_MAX_RETRIES = 3
+
+PRICES_MAX_ERRORS_SHOWN = 10
+PRICES_CHUNK_SIZE = 1000  # rows validated and upserted per request
+PRICES_MAX_ERRORS_KEPT = 50
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "548"))  # ~18 months
+ARCHIVE_INTERVAL = 24 * 3600
+
+# broadcast ids being sent by this process (guards against double /broadcast_resume)
+_running_broadcasts = set()
+
+# ----------------------
+# Helpers
+# ----------------------
+def is_admin(user_id: int) -> bool:
+    """Admins are listed in ADMIN_IDS as comma-separated Telegram user ids."""
+    ids = {i.strip() for i in (os.getenv("ADMIN_IDS") or "").split(",") if i.strip()}
+    return str(user_id) in ids
+
+class _RateLimiter:
+    """Spaces calls evenly so that at most `rate` go out per second."""
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_at = time.monotonic()
+
+    async def wait(self):
+        now = time.monotonic()
+        if self.next_at > now:
+            await asyncio.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+def _retry_seconds(err: RetryAfter) -> float:
+    ra = err.retry_after
+    return ra.total_seconds() if hasattr(ra, "total_seconds") else float(ra)
+
+def _render_price_message(broadcast, lang):
+    name = broadcast['crop_name'].split("|")[0].strip()
+    price = broadcast['price_per_kg']
+    when = broadcast.get('price_date') or date.today().isoformat()
+    if lang == 'ar':
+        return f"📈 سعر سوق جديد: {name} — {price} LBP/kg ({when})"
+    return f"📈 New market price: {name} — {price} LBP/kg ({when})"
+
+async def _send_with_retry(bot, limiter, chat_id, text) -> bool:
+    for _ in range(BROADCAST_MAX_RETRIES):
+        await limiter.wait()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+            return True
+        except RetryAfter as e:
+            # flood control: everyone waits, not just this chat
+            delay = _retry_seconds(e)
+            logger.warning("Broadcast hit flood control, sleeping %.1fs", delay)
+            await asyncio.sleep(delay)
+            limiter.next_at = time.monotonic()
+        except Forbidden:
+            return False  # user blocked the bot
+        except TelegramError as e:
+            logger.warning("Broadcast send to %s failed: %s", chat_id, e)
+            return False
+    return False
+
+# ----------------------
+# Market price broadcast
+# ----------------------
+async def run_broadcast(bot, broadcast_id: str) -> None:
+    """
+    Stream farmers growing the broadcast's crop page by page (keyset on farmers.id) and send the
+    pre-rendered message for their language through a rate limiter. Progress is saved after every
+    page, so a restart resends at most one page.
+    """
+    if broadcast_id in _running_broadcasts:
+        return
+    _running_broadcasts.add(broadcast_id)
+    farm_core = get_farm_core()
+    try:
+        b = await asyncio.to_thread(farm_core.get_broadcast, broadcast_id)
+        if not b or b.get('status') == 'done':
+            return
+        names = [n.strip() for n in b['crop_name'].split("|") if n.strip()]
+        texts = {lang: _render_price_message(b, lang) for lang in ('ar', 'en')}
+        limiter = _RateLimiter(BROADCAST_RATE)
+        sent, failed, after = b.get('sent') or 0, b.get('failed') or 0, b.get('last_farmer_id')
+        while True:
+            page = await asyncio.to_thread(farm_core.get_farmers_growing_page, names, after, BROADCAST_PAGE_SIZE)
+            for f in page:
+                if await _send_with_retry(bot, limiter, f['telegram_id'], texts.get(f.get('language'), texts['ar'])):
+                    sent += 1
+                else:
+                    failed += 1
+            if page:
+                after = page[-1]['id']
+                await asyncio.to_thread(farm_core.update_broadcast, broadcast_id, last_farmer_id=after, sent=sent, failed=failed)
+            if len(page) < BROADCAST_PAGE_SIZE:
+                break
+        await asyncio.to_thread(farm_core.update_broadcast, broadcast_id, status='done')
+        logger.info("Broadcast %s done: sent=%s failed=%s", broadcast_id, sent, failed)
+    except Exception:
+        logger.exception("Broadcast %s stopped; resume with /broadcast_resume %s", broadcast_id, broadcast_id)
+        try:
+            await asyncio.to_thread(farm_core.update_broadcast, broadcast_id, status='failed')
+        except Exception:
+            logger.exception("Could not mark broadcast %s as failed", broadcast_id)
+    finally:
+        _running_broadcasts.discard(broadcast_id)
+
+async def broadcast_price_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/broadcast_price <crop[|alias...]> <price_per_kg> — record the price and notify farmers growing it."""
+    if not is_admin(update.effective_user.id):
+        return
+    args = context.args or []
+    try:
+        crop_name, price = " ".join(args[:-1]).strip(), float(args[-1])
+        if not crop_name:
+            raise ValueError
+    except (ValueError, IndexError):
+        await update.message.reply_text("Usage: /broadcast_price <crop[|alias...]> <price_per_kg>\ne.g. /broadcast_price Tomato|طماطم 45000")
+        return
+    farm_core = get_farm_core()
+    farm_core.add_market_price(canonical_crop_name(crop_name.split("|")[0]), date.today(), price, source="admin")
+    b = farm_core.create_broadcast(crop_name, price, date.today())
+    if not b:
+        await update.message.reply_text("Could not create the broadcast.")
+        return
+    context.application.create_task(run_broadcast(context.bot, b['id']))
+    await update.message.reply_text(f"Broadcast {b['id']} started. Check it with /broadcast_status {b['id']}")
+
+async def broadcast_resume_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not is_admin(update.effective_user.id):
+        return
+    if not context.args:
+        await update.message.reply_text("Usage: /broadcast_resume <broadcast_id>")
+        return
+    broadcast_id = context.args[0]
+    if not get_farm_core().update_broadcast(broadcast_id, status='running'):
+        await update.message.reply_text("Broadcast not found.")
+        return
+    context.application.create_task(run_broadcast(context.bot, broadcast_id))
+    await update.message.reply_text(f"Broadcast {broadcast_id} resumed.")
+
+async def broadcast_status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not is_admin(update.effective_user.id):
+        return
+    if not context.args:
+        await update.message.reply_text("Usage: /broadcast_status <broadcast_id>")
+        return
+    b = get_farm_core().get_broadcast(context.args[0])
+    if not b:
+        await update.message.reply_text("Broadcast not found.")
+        return
+    await update.message.reply_text(
+        f"{b['crop_name']} @ {b['price_per_kg']}: {b['status']}\nsent={b['sent']} failed={b['failed']}"
+        + (" (running here)" if b['id'] in _running_broadcasts else "")
+    )
+
+# ----------------------
+# Bulk market price ingestion (admin CSV/XLSX upload or POST /admin/prices)
+# ----------------------
+def prepare_price_rows(raw_rows):
+    """
+    Normalize and validate (crop_name, price_date, price_per_kg, source) rows and deduplicate them on
+    (crop_name, price_date, source), later rows winning. raw_rows yields (line_no, dict).
+    Returns (rows, errors).
+    """
+    unique, errors = {}, []
+    for line_no, raw in raw_rows:
+        try:
+            name = canonical_crop_name(str(raw.get("crop_name") or raw.get("crop") or ""))
+            if not name:
+                raise ValueError("missing crop_name")
+            price_date = parse_cell_date(raw.get("price_date") or raw.get("date"))
+            price = parse_cell_number(raw.get("price_per_kg") if raw.get("price_per_kg") not in (None, "") else raw.get("price"), "price_per_kg")
+            if price <= 0:
+                raise ValueError(f"invalid price_per_kg '{price}'")
+            source = str(raw.get("source") or "admin").strip() or "admin"
+        except ValueError as e:
+            errors.append(f"#{line_no}: {e}")
+            continue
+        unique[(name, price_date, source)] = {"crop_name": name, "price_date": price_date, "price_per_kg": price, "source": source}
+    return list(unique.values()), errors
+
+def ingest_prices(raw_rows):
+    """
+    Prepare and upsert rows PRICES_CHUNK_SIZE at a time, so an upload is never held in memory
+    whole. Duplicates are merged within a chunk; across chunks the later upsert wins as well.
+    Returns (written, duplicates_dropped, rejected, first PRICES_MAX_ERRORS_KEPT errors).
+    """
+    farm_core = get_farm_core()
+    raw_rows = iter(raw_rows)
+    written = dupes = rejected = 0
+    kept_errors = []
+    while True:
+        chunk = list(itertools.islice(raw_rows, PRICES_CHUNK_SIZE))
+        if not chunk:
+            break
+        rows, errors = prepare_price_rows(chunk)
+        written += farm_core.bulk_upsert_market_prices(rows)
+        dupes += len(chunk) - len(errors) - len(rows)
+        rejected += len(errors)
+        kept_errors.extend(errors[:PRICES_MAX_ERRORS_KEPT - len(kept_errors)])
+    return written, dupes, rejected, kept_errors
+
+async def import_prices_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin document with caption 'prices': columns crop_name, price_date, price_per_kg, source."""
+    if not is_admin(update.effective_user.id):
+        await import_document(update, context)
+        return
+    doc = update.message.document
+    ext = os.path.splitext(doc.file_name or "")[1].lower()
+    if ext not in (".csv", ".xlsx"):
+        await update.message.reply_text("Send the prices as a CSV or XLSX file.")
+        return
+    fd, path = tempfile.mkstemp(suffix=ext)
+    os.close(fd)
+    try:
+        file = await doc.get_file()
+        await file.download_to_drive(path)
+        written, dupes, rejected, errors = await asyncio.to_thread(ingest_prices, iter_rows(path, ext))
+    except Exception as e:
+        logger.exception("Price ingestion failed")
+        await update.message.reply_text(f"Price import failed: {e}")
+        return
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    text = f"✅ {written} prices written, {dupes} duplicates merged, {rejected} rejected."
+    if errors:
+        text += "\n\n" + "\n".join(errors[:PRICES_MAX_ERRORS_SHOWN])
+    await update.message.reply_text(text)
+
+# ----------------------
+# Cold-tier archival (JobQueue, daily)
+# ----------------------
+async def archive_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Move closed records older than ARCHIVE_AFTER_DAYS to the archive tables."""
+    cutoff = date.today() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    try:
+        moved = await asyncio.to_thread(get_farm_core().archive_closed_records, cutoff)
+    except Exception:
+        logger.exception("Archival run failed")
+        return
+    if any(moved.values()):
+        logger.info("Archived records dated before %s: %s", cutoff, ", ".join(f"{k}={v}" for k, v in moved.items()))
@@ -1,8 +1,11 @@
 # aboutcrop.py
+import asyncio
+import re
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from datetime import datetime, date, timedelta
-from core_singleton import get_farm_core
+from core_singleton import get_farm_core, get_outbox
+from farmcore import normalize_text, parse_number
 from keyboards import get_main_keyboard
 
 # Conversation states
@@ -18,7 +21,9 @@ HARVEST_STATES = {
     'HARVEST_QUANTITY': 2,
     'HARVEST_DELIVERY': 3,
     'DELIVERY_COLLECTOR': 4,
-    'DELIVERY_MARKET': 5
+    'DELIVERY_MARKET': 5,
+    'HARVEST_BULK_INPUT': 6,
+    'HARVEST_BULK_CONFIRM': 7
 }
 
 EDIT_STATES = {
@@ -48,6 +53,49 @@ def _parse_date_input(text: str):
             pass
     raise ValueError("Invalid date")
 
+# "tomato 120", "cucumber 40kg", "35 باذنجان" (run on normalize_text output)
+_BULK_UNITS = r"(?:kg|kgs|كغ|كجم|كلغ|كيلو)"
+_BULK_QTY = r"(?P<qty>\d[\d,]*(?:\.\d+)?)"  # read by parse_number: "1,200" and "12,5" both work
+_BULK_NAME_FIRST = re.compile(r"^(?P<name>.+?)\s*" + _BULK_QTY + r"\s*" + _BULK_UNITS + r"?$")
+_BULK_QTY_FIRST = re.compile(r"^" + _BULK_QTY + r"\s*" + _BULK_UNITS + r"?\s+(?P<name>.+)$")
+
+# a comma between two digits is a decimal comma ("12,5"), any other comma separates items
+_BULK_SPLIT = re.compile(r"[;\n؛]+|(?<!\d)[,،]|[,،](?!\d)")
+
+def _parse_bulk_harvest(text: str, crops):
+    """
+    Parse "tomato 120, cucumber 12,5kg, باذنجان 35" against the farmer's crops.
+    Returns (items, rejected, ambiguous): items are dicts with crop_id/name/quantity,
+    rejected are the raw fragments that matched no crop (or had no valid quantity) and
+    ambiguous the ones naming a crop the farmer has more than once.
+    """
+    index = {}
+    for c in crops:
+        index.setdefault(normalize_text(c.get('name')), []).append(c)
+    items, rejected, ambiguous = [], [], []
+    for raw in _BULK_SPLIT.split(text or ""):
+        fragment = normalize_text(raw)
+        if not fragment:
+            continue
+        m = _BULK_NAME_FIRST.match(fragment) or _BULK_QTY_FIRST.match(fragment)
+        matches = index.get(m.group('name').strip()) if m else None
+        if matches and len(matches) > 1:
+            ambiguous.append(raw.strip())
+            continue
+        if not matches:
+            rejected.append(raw.strip())
+            continue
+        try:
+            quantity = parse_number(m.group('qty'))
+        except ValueError:
+            quantity = 0
+        if quantity <= 0:
+            rejected.append(raw.strip())
+            continue
+        crop = matches[0]
+        items.append({'crop_id': crop['id'], 'name': crop.get('name'), 'quantity': quantity})
+    return items, rejected, ambiguous
+
 def _format_crop_line(crop):
     name = crop.get('name') or "Unknown"
     plant_date = crop.get('planting_date') or "N/A"
@@ -118,16 +166,15 @@ async def add_crop_notes_handler(update: Update, context: ContextTypes.DEFAULT_T
     farmer = farm_core.get_farmer(update.effective_user.id)
     lang = farmer.get('language', 'ar') if farmer else 'ar'
     notes = None if text.lower() in ['تخطي', 'skip'] else text.strip()
-    crop = farm_core.add_crop(
+    # queued in the local outbox; written to Supabase by the background flusher
+    get_outbox().submit(
+        "add_crop",
         farmer_id=farmer['id'],
         name=context.user_data.get('crop_name'),
         planting_date=context.user_data.get('planting_date'),
         notes=notes
     )
-    if crop:
-        await update.message.reply_text("تم إضافة المحصول بنجاح! ✅" if lang == 'ar' else "Crop added successfully! ✅", reply_markup=get_main_keyboard(lang))
-    else:
-        await update.message.reply_text("خطأ أثناء إضافة المحصول. حاول مرة أخرى." if lang == 'ar' else "Error adding crop. Please try again.", reply_markup=get_main_keyboard(lang))
+    await update.message.reply_text("تم إضافة المحصول بنجاح! ✅" if lang == 'ar' else "Crop added successfully! ✅", reply_markup=get_main_keyboard(lang))
     for k in ("crop_name", "planting_date"):
         context.user_data.pop(k, None)
     return -1  # ConversationHandler.END (used by main) — returning -1 is safe; main registered fallbacks handle ending
@@ -139,16 +186,15 @@ async def addcrop_skip_notes_callback(update: Update, context: ContextTypes.DEFA
     farmer = farm_core.get_farmer(query.from_user.id)
     lang = farmer.get('language', 'ar') if farmer else 'ar'
     notes = None
-    crop = farm_core.add_crop(
+    # queued in the local outbox; written to Supabase by the background flusher
+    get_outbox().submit(
+        "add_crop",
         farmer_id=farmer['id'],
         name=context.user_data.get('crop_name'),
         planting_date=context.user_data.get('planting_date'),
         notes=notes
     )
-    if crop:
-        await query.message.reply_text("تم إضافة المحصول بنجاح! ✅" if lang == 'ar' else "Crop added successfully! ✅", reply_markup=get_main_keyboard(lang))
-    else:
-        await query.message.reply_text("خطأ أثناء إضافة المحصول. حاول مرة أخرى." if lang=='ar' else "Error adding crop. Please try again.", reply_markup=get_main_keyboard(lang))
+    await query.message.reply_text("تم إضافة المحصول بنجاح! ✅" if lang == 'ar' else "Crop added successfully! ✅", reply_markup=get_main_keyboard(lang))
     for k in ("crop_name", "planting_date"):
         context.user_data.pop(k, None)
     return -1
@@ -156,19 +202,37 @@ async def addcrop_skip_notes_callback(update: Update, context: ContextTypes.DEFA
 # ----------------------
 # My Crops view: list + inline per-crop manage + pagination + Add inline
 # ----------------------
-async def _send_crops_page(update_or_query, context, page: int):
+def _crop_page_data(direction: str, crop) -> str:
+    """callback_data for crop list navigation: crop_page:<n|p>:<planting_date or empty>:<id> (fits in 64 bytes)."""
+    return f"crop_page:{direction}:{crop.get('planting_date') or ''}:{crop['id']}"
+
+def _parse_crop_page_data(data: str):
+    """Return (cursor, backward) from crop_page callback data; crop_page:0 (or junk) is the first page."""
+    try:
+        _, direction, rest = data.split(":", 2)
+        value, crop_id = rest.rsplit(":", 1)
+    except ValueError:
+        return None, False
+    if direction not in ("n", "p"):
+        return None, False
+    # an undated crop has an empty value ("None" in buttons sent before that was handled)
+    return (value if value not in ("", "None") else None, crop_id), direction == "p"
+
+async def _send_crops_page(update_or_query, context, cursor=None, backward: bool = False):
     farm_core = get_farm_core()
-    crops = context.user_data.get('crops_list', [])
     if hasattr(update_or_query, "effective_user"):
         farmer = farm_core.get_farmer(update_or_query.effective_user.id)
     else:
         farmer = farm_core.get_farmer(context.user_data.get('caller_id') or 0)
     lang = farmer.get('language', 'ar') if farmer else 'ar'
 
-    total = len(crops)
-    start = page * CROPS_PER_PAGE
-    end = start + CROPS_PER_PAGE
-    page_crops = crops[start:end]
+    rows = farm_core.get_farmer_crops_page(farmer['id'], cursor=cursor, limit=CROPS_PER_PAGE + 1, backward=backward) if farmer else []
+    has_more = len(rows) > CROPS_PER_PAGE
+    page_crops = rows[:CROPS_PER_PAGE]
+    if backward:
+        page_crops.reverse()
+    has_prev = has_more if backward else cursor is not None
+    has_next = True if backward else has_more
 
     header = "🌾 محاصيلك:\n\n" if lang == 'ar' else "🌾 Your Crops:\n\n"
     if not page_crops:
@@ -181,10 +245,10 @@ async def _send_crops_page(update_or_query, context, page: int):
         kb_rows.append([InlineKeyboardButton(f"⚙️ {c.get('name', 'Crop')}", callback_data=f"crop_manage:{c['id']}")])
 
     nav_row = []
-    if page > 0:
-        nav_row.append(InlineKeyboardButton("⬅️ السابق" if lang == 'ar' else "⬅️ Prev", callback_data=f"crop_page:{page-1}"))
-    if end < total:
-        nav_row.append(InlineKeyboardButton("التالي ➡️" if lang == 'ar' else "Next ➡️", callback_data=f"crop_page:{page+1}"))
+    if has_prev and page_crops:
+        nav_row.append(InlineKeyboardButton("⬅️ السابق" if lang == 'ar' else "⬅️ Prev", callback_data=_crop_page_data("p", page_crops[0])))
+    if has_next and page_crops:
+        nav_row.append(InlineKeyboardButton("التالي ➡️" if lang == 'ar' else "Next ➡️", callback_data=_crop_page_data("n", page_crops[-1])))
     nav_row.append(InlineKeyboardButton("➕ أضف محصول" if lang == 'ar' else "➕ Add Crop", callback_data="crop_add"))
     if nav_row:
         kb_rows.append(nav_row)
@@ -208,13 +272,7 @@ async def my_crops(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not farmer:
         await update.message.reply_text("Create an account first. Use /start")
         return
-    lang = farmer.get('language', 'ar')
-    crops = farm_core.get_farmer_crops(farmer['id'])
-    if not crops:
-        await update.message.reply_text("ليس لديك محاصيل." if lang == 'ar' else "No crops found.", reply_markup=get_main_keyboard(lang))
-        return
-    context.user_data['crops_list'] = crops
-    await _send_crops_page(update, context, 0)
+    await _send_crops_page(update, context)
 
 # callback for navigation (pages) and pref crop sugg. Also handle "crop_add" start here to keep UX simple
 async def crops_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -223,14 +281,8 @@ async def crops_callback_handler(update: Update, context: ContextTypes.DEFAULT_T
     data = query.data or ""
     await query.answer()
     if data.startswith("crop_page:"):
-        try:
-            page = int(data.split(":", 1)[1])
-        except Exception:
-            page = 0
-        if 'crops_list' not in context.user_data:
-            farmer = farm_core.get_farmer(update.effective_user.id)
-            context.user_data['crops_list'] = farm_core.get_farmer_crops(farmer['id'])
-        await _send_crops_page(update, context, page)
+        cursor, backward = _parse_crop_page_data(data)
+        await _send_crops_page(update, context, cursor=cursor, backward=backward)
         return
 
     if data.startswith("prefcrop:"):
@@ -266,21 +318,27 @@ async def crop_manage_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     except Exception:
         await query.message.reply_text("Invalid selection.")
         return
-    crops = context.user_data.get('crops_list') or []
-    crop = next((c for c in crops if str(c.get('id')) == str(crop_id)), None)
-    if not crop:
-        farmer = farm_core.get_farmer(update.effective_user.id)
-        all_crops = farm_core.get_farmer_crops(farmer['id'])
-        crop = next((c for c in all_crops if str(c.get('id')) == str(crop_id)), None)
-    if not crop:
+    farmer = farm_core.get_farmer(update.effective_user.id)
+    crop = farm_core.get_crop(crop_id)
+    if not crop or not farmer or str(crop.get('farmer_id')) != str(farmer['id']):
         await query.message.reply_text("Crop not found.")
         return
-    lang = farm_core.get_farmer(update.effective_user.id).get('language', 'ar')
+    lang = farmer.get('language', 'ar')
     text = f"🔎 {crop.get('name')}\n\n• planted: {crop.get('planting_date')}\n• notes: {crop.get('notes') or '—'}\n"
+    ledger = farm_core.get_crop_ledger(crop_id)
+    if ledger:
+        cost = float(ledger.get('total_cost') or 0)
+        paid = float(ledger.get('paid_amount') or 0)
+        text += (
+            f"\n💰 التكاليف: {int(cost)} LBP\n🧾 الحصاد: {float(ledger.get('harvested_qty') or 0):g} kg (تم تسليم {float(ledger.get('delivered_qty') or 0):g} kg)\n💵 المدفوع: {int(paid)} LBP\n📊 الصافي: {int(paid - cost)} LBP\n"
+            if lang == 'ar' else
+            f"\n💰 Cost: {int(cost)} LBP\n🧾 Harvested: {float(ledger.get('harvested_qty') or 0):g} kg ({float(ledger.get('delivered_qty') or 0):g} kg delivered)\n💵 Paid: {int(paid)} LBP\n📊 Net: {int(paid - cost)} LBP\n"
+        )
     kb = InlineKeyboardMarkup([
         [InlineKeyboardButton("✏️ تعديل" if lang == 'ar' else "✏️ Edit", callback_data=f"crop_edit:{crop_id}"),
          InlineKeyboardButton("🗑️ حذف" if lang == 'ar' else "🗑️ Delete", callback_data=f"crop_delete:{crop_id}")],
-        [InlineKeyboardButton("🔙 العودة" if lang == 'ar' else "🔙 Back", callback_data="crop_page:0")]
+        [InlineKeyboardButton("📜 السجل" if lang == 'ar' else "📜 History", callback_data=f"hist_for:{crop_id}"),
+         InlineKeyboardButton("🔙 العودة" if lang == 'ar' else "🔙 Back", callback_data="crop_page:0")]
     ])
     await query.message.edit_text(text, reply_markup=kb)
 
@@ -315,12 +373,10 @@ async def confirm_delete_callback(update: Update, context: ContextTypes.DEFAULT_
     lang = farmer.get('language', 'ar') if farmer else 'ar'
     success = farm_core.delete_crop(crop_id)
     if success:
-        context.user_data.pop('crops_list', None)
         await query.message.edit_text("تم حذف المحصول." if lang == 'ar' else "Crop deleted.")
     else:
         await query.message.edit_text("خطأ: لم يتم الحذف." if lang == 'ar' else "Error: could not delete crop.")
-    context.user_data['crops_list'] = farm_core.get_farmer_crops(farmer['id'])
-    await _send_crops_page(update, context, 0)
+    await _send_crops_page(update, context)
 
 # ----------------------
 # Edit flow (starts from callback crop_edit:<id>)
@@ -381,7 +437,6 @@ async def edit_name_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return EDIT_STATES['EDIT_NAME']
     updated = farm_core.update_crop(crop_id, name=new_name)
     if updated:
-        context.user_data.pop('crops_list', None)
         await update.message.reply_text("تم تحديث اسم المحصول." if lang == 'ar' else "Crop name updated.", reply_markup=get_main_keyboard(lang))
     else:
         await update.message.reply_text("خطأ أثناء التحديث." if lang == 'ar' else "Error updating crop.")
@@ -400,7 +455,6 @@ async def edit_date_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return EDIT_STATES['EDIT_PLANTING_DATE']
     updated = farm_core.update_crop(crop_id, planting_date=new_date)
     if updated:
-        context.user_data.pop('crops_list', None)
         await update.message.reply_text("تم تحديث تاريخ الزراعة." if lang == 'ar' else "Planting date updated.", reply_markup=get_main_keyboard(lang))
     else:
         await update.message.reply_text("خطأ أثناء التحديث." if lang == 'ar' else "Error updating crop.")
@@ -418,7 +472,6 @@ async def edit_notes_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         notes = text.strip()
     updated = farm_core.update_crop(crop_id, notes=notes)
     if updated:
-        context.user_data.pop('crops_list', None)
         await update.message.reply_text("تم تحديث الملاحظات." if lang == 'ar' else "Notes updated.", reply_markup=get_main_keyboard(lang))
     else:
         await update.message.reply_text("خطأ أثناء التحديث." if lang == 'ar' else "Error updating crop.")
@@ -453,6 +506,7 @@ async def record_harvest(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     kb = []
     for c in crops:
         kb.append([InlineKeyboardButton(c['name'], callback_data=f"harvest_select:{c['id']}")])
+    kb.append([InlineKeyboardButton("📝 " + ("إدخال عدة محاصيل" if lang == 'ar' else "Several crops at once"), callback_data="harvest_bulk:start")])
     kb.append([InlineKeyboardButton("🔙 " + ("العودة" if lang == 'ar' else "Back"), callback_data="crop_page:0")])
     await send_method("اختر المحصول:" if lang == 'ar' else "Choose crop:", reply_markup=InlineKeyboardMarkup(kb))
     return HARVEST_STATES['HARVEST_CROP']
@@ -548,17 +602,23 @@ async def harvest_delivery_callback(update: Update, context: ContextTypes.DEFAUL
     lang = farmer.get('language', 'ar') if farmer else 'ar'
 
     status = "delivered" if data.endswith(":delivered") else "stored"
-    harvest = farm_core.record_harvest(
+    harvest_args = dict(
         crop_id=context.user_data['crop_id'],
         harvest_date=context.user_data.get('harvest_date', date.today()),
         quantity=context.user_data.get('harvest_quantity', 0),
         notes=None,
         status=status
     )
-    if not harvest:
-        await query.message.reply_text("خطأ في تسجيل الحصاد." if lang == 'ar' else "Error recording harvest.")
-        return -1
-    context.user_data['harvest_id'] = harvest.get('id')
+    if status == "stored":
+        # queued in the local outbox; written to Supabase by the background flusher
+        get_outbox().submit("add_harvest", **harvest_args)
+    else:
+        # the delivery recorded next needs the harvest's id, so this insert cannot be deferred
+        harvest = await asyncio.to_thread(farm_core.record_harvest, **harvest_args)
+        if not harvest:
+            await query.message.reply_text("خطأ في تسجيل الحصاد." if lang == 'ar' else "Error recording harvest.")
+            return -1
+        context.user_data['harvest_id'] = harvest.get('id')
 
     if status == "delivered":
         kb = InlineKeyboardMarkup([[InlineKeyboardButton("تخطي" if lang=='ar' else "Skip", callback_data="harvest_skip:collector")]])
@@ -626,3 +686,74 @@ async def harvest_delivery_market(update: Update, context: ContextTypes.DEFAULT_
     else:
         await update.message.reply_text("خطأ في تسجيل التسليم." if lang == 'ar' else "Error recording delivery.")
     return -1
+
+# ----------------------
+# Bulk harvest entry: one message, one confirmation, one insert
+# ----------------------
+async def harvest_bulk_start_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    farm_core = get_farm_core()
+    query = update.callback_query
+    await query.answer()
+    farmer = farm_core.get_farmer(query.from_user.id)
+    lang = farmer.get('language', 'ar') if farmer else 'ar'
+    await query.message.reply_text(
+        "اكتب المحاصيل والكميات (كجم) في رسالة واحدة، مثال:\nطماطم 120، خيار 40، باذنجان 35" if lang == 'ar' else
+        "Send crops and quantities (kg) in one message, e.g.:\ntomato 120, cucumber 40kg, eggplant 35"
+    )
+    return HARVEST_STATES['HARVEST_BULK_INPUT']
+
+async def harvest_bulk_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    farm_core = get_farm_core()
+    farmer = farm_core.get_farmer(update.effective_user.id)
+    if not farmer:
+        await update.message.reply_text("Create an account first. Use /start")
+        return -1
+    lang = farmer.get('language', 'ar')
+    crops = farm_core.get_farmer_crops(farmer['id'])
+    items, rejected, ambiguous = _parse_bulk_harvest(update.message.text or "", crops)
+    ambiguous_note = (
+        ("\n\n" + ("لديك أكثر من محصول بهذا الاسم، سجّلها من قائمة الحصاد: " if lang == 'ar' else
+                   "You have several crops with this name, record them from the harvest menu: ") + ", ".join(ambiguous))
+        if ambiguous else ""
+    )
+    if not items:
+        await update.message.reply_text(
+            ("لم أتعرف على أي محصول. استخدم أسماء محاصيلك، مثال: طماطم 120، خيار 40" if lang == 'ar' else
+             "No crops recognized. Use your crop names, e.g.: tomato 120, cucumber 40") + ambiguous_note
+        )
+        return HARVEST_STATES['HARVEST_BULK_INPUT']
+    context.user_data['bulk_harvest'] = items
+    lines = [f"• {i['name']}: {i['quantity']:g} kg" for i in items]
+    text = (("تأكيد الحصاد بتاريخ" if lang == 'ar' else "Confirm harvest for") + f" {date.today().isoformat()}:\n" + "\n".join(lines))
+    if rejected:
+        text += "\n\n" + ("لم يتم التعرف على: " if lang == 'ar' else "Not recognized: ") + ", ".join(rejected)
+    text += ambiguous_note
+    kb = InlineKeyboardMarkup([
+        [InlineKeyboardButton("✅ تأكيد" if lang == 'ar' else "✅ Confirm", callback_data="harvest_bulk:confirm"),
+         InlineKeyboardButton("إلغاء" if lang == 'ar' else "Cancel", callback_data="harvest_bulk:cancel")]
+    ])
+    await update.message.reply_text(text, reply_markup=kb)
+    return HARVEST_STATES['HARVEST_BULK_CONFIRM']
+
+async def harvest_bulk_confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    farm_core = get_farm_core()
+    query = update.callback_query
+    await query.answer()
+    farmer = farm_core.get_farmer(query.from_user.id)
+    lang = farmer.get('language', 'ar') if farmer else 'ar'
+    items = context.user_data.pop('bulk_harvest', None) or []
+    if query.data.endswith(":cancel") or not items:
+        await query.message.edit_text("تم الإلغاء." if lang == 'ar' else "Cancelled.")
+        return -1
+    saved = farm_core.bulk_record_harvests([
+        {'crop_id': i['crop_id'], 'harvest_date': date.today(), 'quantity': i['quantity']} for i in items
+    ])
+    if saved:
+        total = sum(i['quantity'] for i in items)
+        await query.message.edit_text(
+            f"تم تسجيل {len(saved)} حصاد! ✅ المجموع {total:g} kg" if lang == 'ar' else
+            f"{len(saved)} harvests recorded! ✅ Total {total:g} kg"
+        )
+    else:
+        await query.message.edit_text("خطأ في تسجيل الحصاد." if lang == 'ar' else "Error recording harvest.")
+    return -1
@@ -0,0 +1,515 @@
+# aboutdata.py
+import asyncio
+import csv
+import itertools
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, date, timedelta
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from aboutmoney import EXPENSE_CATEGORIES
+from core_singleton import get_farm_core
+from farmcore import nested, normalize_text, parse_number
+
+from openpyxl import Workbook, load_workbook
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_BYTES = 20 * 1024 * 1024  # Telegram bots cannot download bigger files
+IMPORT_PROGRESS_EVERY = 2.0  # seconds between progress edits (edit rate limits)
+IMPORT_MAX_ERRORS_SHOWN = 10
+
+_EXPENSE_TYPES = {"expense", "expenses", "مصروف", "مصاريف"}
+_HARVEST_TYPES = {"harvest", "harvests", "حصاد"}
+
+# ----------------------
+# Helpers
+# ----------------------
+def parse_cell_date(value):
+    """Accept date/datetime cells (XLSX) or the usual typed formats; empty means today."""
+    if value is None or value == "":
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = normalize_text(str(value))
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except Exception:
+            pass
+    raise ValueError(f"invalid date '{value}'")
+
+def parse_cell_number(value, field):
+    """Parse an amount/quantity cell (same rules as typed quantities); zero and negative values are rejected."""
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        try:
+            number = parse_number(value)
+        except ValueError:
+            raise ValueError(f"invalid {field} '{value}'")
+    if not number > 0:  # also catches nan
+        raise ValueError(f"{field} must be positive, got '{value}'")
+    return number
+
+def iter_rows(path: str, ext: str):
+    """Yield (line_no, row dict with normalized headers) without loading the whole file."""
+    if ext == ".xlsx":
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [normalize_text(str(h or "")) for h in next(rows, [])]
+            for line_no, values in enumerate(rows, start=2):
+                if values and any(v not in (None, "") for v in values):
+                    yield line_no, dict(zip(header, values))
+        finally:
+            wb.close()
+        return
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        reader = csv.reader(fh)
+        header = [normalize_text(h) for h in next(reader, [])]
+        for values in reader:
+            if any(v.strip() for v in values):
+                yield reader.line_num, dict(zip(header, values))
+
+def _crop_index(crops):
+    """normalized name -> crop id; names shared by several crops map to None (ambiguous)."""
+    index = {}
+    for c in crops:
+        key = normalize_text(c.get('name'))
+        index[key] = None if key in index else c['id']
+    return index
+
+def _validate_row(row, farmer_id, crop_index):
+    """Return ('expense' | 'harvest', record) or raise ValueError with a short reason."""
+    kind = normalize_text(str(row.get("type") or ""))
+    if not kind:
+        kind = "expense" if row.get("amount") not in (None, "") else "harvest"
+    crop_name = normalize_text(str(row.get("crop") or ""))
+    crop_id = None
+    if crop_name:
+        if crop_name not in crop_index:
+            raise ValueError(f"unknown crop '{row.get('crop')}'")
+        crop_id = crop_index[crop_name]
+        if crop_id is None:
+            raise ValueError(f"ambiguous crop '{row.get('crop')}'")
+    notes = str(row.get("notes")).strip() if row.get("notes") not in (None, "") else None
+
+    if kind in _EXPENSE_TYPES:
+        category = str(row.get("category") or "").strip()
+        if not category:
+            raise ValueError("missing category")
+        return "expense", {
+            "farmer_id": farmer_id,
+            "expense_date": parse_cell_date(row.get("date")),
+            "category": category,
+            "amount": parse_cell_number(row.get("amount"), "amount"),
+            "crop_id": crop_id,
+            "notes": notes,
+        }
+    if kind in _HARVEST_TYPES:
+        if crop_id is None:
+            raise ValueError("missing crop")
+        return "harvest", {
+            "crop_id": crop_id,
+            "harvest_date": parse_cell_date(row.get("date")),
+            "quantity": parse_cell_number(row.get("quantity"), "quantity"),
+            "unit": str(row.get("unit") or "kg").strip(),
+            "notes": notes,
+            "status": "delivered" if normalize_text(str(row.get("status") or "")) == "delivered" else "stored",
+        }
+    raise ValueError(f"unknown type '{row.get('type')}'")
+
+def _validated_rows(path, ext, farmer_id, crop_index):
+    """Yield (line_no, kind, record, error) for every data row; error is a short reason or None."""
+    for line_no, row in iter_rows(path, ext):
+        try:
+            kind, record = _validate_row(row, farmer_id, crop_index)
+        except ValueError as e:
+            yield line_no, None, None, str(e)
+        else:
+            yield line_no, kind, record, None
+
+def _read_chunk(rows, size):
+    """Runs in a worker thread: parse and validate up to size rows."""
+    return list(itertools.islice(rows, size))
+
+# ----------------------
+# Import (CSV / XLSX document upload)
+# ----------------------
+async def import_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Import expenses and harvests from an uploaded CSV/XLSX file.
+    Columns: type (expense|harvest), date, crop, category, amount, quantity, unit, status, notes.
+    Rows are streamed from disk, parsed and validated in a worker thread and written in
+    IMPORT_CHUNK_SIZE bulk inserts, all off the event loop.
+    """
+    farm_core = get_farm_core()
+    farmer = farm_core.get_farmer(update.effective_user.id)
+    if not farmer:
+        await update.message.reply_text("Create an account first. Use /start")
+        return
+    lang = farmer.get('language', 'ar')
+
+    doc = update.message.document
+    ext = os.path.splitext(doc.file_name or "")[1].lower()
+    if ext not in (".csv", ".xlsx"):
+        await update.message.reply_text("أرسل ملف CSV أو XLSX." if lang == 'ar' else "Please send a CSV or XLSX file.")
+        return
+    if doc.file_size and doc.file_size > IMPORT_MAX_BYTES:
+        await update.message.reply_text("الملف كبير جدًا (الحد 20MB)." if lang == 'ar' else "File too large (20MB max).")
+        return
+
+    progress = await update.message.reply_text("⏳ جاري الاستيراد..." if lang == 'ar' else "⏳ Importing...")
+    fd, path = tempfile.mkstemp(suffix=ext)
+    os.close(fd)
+    counts = {"expense": 0, "harvest": 0}
+    errors = []
+    error_count = 0
+    batches = {"expense": [], "harvest": []}
+    writers = {"expense": farm_core.bulk_add_expenses, "harvest": farm_core.bulk_record_harvests}
+
+    async def _flush(kind):
+        rows, batches[kind] = batches[kind], []
+        if rows:
+            saved = await asyncio.to_thread(writers[kind], rows)
+            counts[kind] += len(saved)
+
+    def _progress_text(done):
+        if lang == 'ar':
+            return f"⏳ جاري الاستيراد... {done} صف\nمصاريف: {counts['expense']} | حصاد: {counts['harvest']} | أخطاء: {error_count}"
+        return f"⏳ Importing... {done} rows\nExpenses: {counts['expense']} | Harvests: {counts['harvest']} | Errors: {error_count}"
+
+    rows = None
+    last_line = 1  # the header; updated as rows are read
+    try:
+        file = await doc.get_file()
+        await file.download_to_drive(path)
+        crops = await asyncio.to_thread(farm_core.get_farmer_crops, farmer['id'])
+        rows = _validated_rows(path, ext, farmer['id'], _crop_index(crops))
+        last_edit = time.monotonic()
+        done = 0
+        # parsing (openpyxl / csv) and validation run in a worker thread one chunk at a time,
+        # so the loop keeps serving other farmers even on a file of only invalid rows
+        while True:
+            chunk = await asyncio.to_thread(_read_chunk, rows, IMPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            for line_no, kind, record, error in chunk:
+                done += 1
+                last_line = line_no
+                if error:
+                    error_count += 1
+                    if len(errors) < IMPORT_MAX_ERRORS_SHOWN:
+                        errors.append(f"#{line_no}: {error}")
+                    continue
+                batches[kind].append(record)
+                if len(batches[kind]) >= IMPORT_CHUNK_SIZE:
+                    await _flush(kind)
+            if time.monotonic() - last_edit >= IMPORT_PROGRESS_EVERY:
+                await progress.edit_text(_progress_text(done))
+                last_edit = time.monotonic()
+        for kind in batches:
+            await _flush(kind)
+    except Exception:
+        # rows are saved in batches, so the failing one is at most IMPORT_CHUNK_SIZE rows back
+        logger.exception("Import failed for farmer %s near row %s", farmer.get('id'), last_line)
+        await progress.edit_text(
+            (f"❌ توقف الاستيراد عند الصف {last_line} تقريبًا. حاول مرة أخرى لاحقًا.\nتم حفظ: مصاريف {counts['expense']}، حصاد {counts['harvest']}") if lang == 'ar' else
+            (f"❌ Import stopped around row {last_line}. Please try again later.\nSaved: {counts['expense']} expenses, {counts['harvest']} harvests")
+        )
+        return
+    finally:
+        if rows is not None:
+            rows.close()  # closes the workbook / CSV file before removing it
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    summary = (
+        f"✅ تم الاستيراد: مصاريف {counts['expense']}، حصاد {counts['harvest']}، أخطاء {error_count}" if lang == 'ar' else
+        f"✅ Import done: {counts['expense']} expenses, {counts['harvest']} harvests, {error_count} errors"
+    )
+    if errors:
+        summary += "\n\n" + "\n".join(errors)
+        if error_count > len(errors):
+            summary += "\n…"
+    await progress.edit_text(summary)
+
+# ----------------------
+# Export (/export [csv|xlsx])
+# ----------------------
+EXPORT_PAGE_SIZE = 500
+EXPORT_COLUMNS = ("record_type", "id", "date", "crop", "category", "quantity", "unit", "amount", "status", "due_date", "collector", "market", "notes")
+
+def _export_rows(farm_core, farmer_id):
+    """Generator over the farmer's full ledger; only one keyset page is held at a time."""
+    yield EXPORT_COLUMNS
+    for h in farm_core.iter_records("harvests", farmer_id, EXPORT_PAGE_SIZE, include_archived=True):
+        yield ("harvest", h.get("id"), h.get("harvest_date"), nested(h, "crops", "name"), None,
+               h.get("quantity"), h.get("unit"), None, h.get("status"), None, None, None, h.get("notes"))
+    for d in farm_core.iter_records("deliveries", farmer_id, EXPORT_PAGE_SIZE, include_archived=True):
+        yield ("delivery", d.get("id"), d.get("delivery_date"), nested(d, "harvests", "crops", "name"), None,
+               nested(d, "harvests", "quantity"), nested(d, "harvests", "unit"), None, None, None,
+               d.get("collector_name"), d.get("market"), None)
+    for p in farm_core.iter_records("payments", farmer_id, EXPORT_PAGE_SIZE, include_archived=True):
+        paid = p.get("status") == "paid"
+        yield ("payment", p.get("id"), p.get("paid_date") if paid else p.get("expected_date"),
+               nested(p, "deliveries", "harvests", "crops", "name"), None,
+               nested(p, "deliveries", "harvests", "quantity"), None,
+               p.get("paid_amount") if paid else p.get("expected_amount"), p.get("status"),
+               p.get("expected_date"), None, None, None)
+    for e in farm_core.iter_records("expenses", farmer_id, EXPORT_PAGE_SIZE, include_archived=True):
+        yield ("expense", e.get("id"), e.get("expense_date"), nested(e, "crops", "name"), e.get("category"),
+               None, None, e.get("amount"), None, None, None, None, e.get("notes"))
+    for t in farm_core.iter_records("treatments", farmer_id, EXPORT_PAGE_SIZE, include_archived=True):
+        yield ("treatment", t.get("id"), t.get("treatment_date"), nested(t, "crops", "name"), t.get("product_name"),
+               None, None, t.get("cost"), None, t.get("next_due_date"), None, None, t.get("notes"))
+
+def _write_export(farm_core, farmer_id, fmt, path):
+    """Runs in a worker thread: stream _export_rows into a CSV or write-only XLSX file."""
+    if fmt == "xlsx":
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("ledger")
+        for row in _export_rows(farm_core, farmer_id):
+            ws.append(row)
+        wb.save(path)
+        return
+    with open(path, "w", newline="", encoding="utf-8-sig") as fh:
+        csv.writer(fh).writerows(_export_rows(farm_core, farmer_id))
+
+async def export_ledger(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    farm_core = get_farm_core()
+    farmer = farm_core.get_farmer(update.effective_user.id)
+    if not farmer:
+        await update.message.reply_text("Create an account first. Use /start")
+        return
+    lang = farmer.get('language', 'ar')
+    fmt = "xlsx" if (context.args and context.args[0].lower() == "xlsx") else "csv"
+
+    progress = await update.message.reply_text("⏳ جاري تجهيز الملف..." if lang == 'ar' else "⏳ Preparing your file...")
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(_write_export, farm_core, farmer['id'], fmt, path)
+        with open(path, "rb") as fh:
+            await context.bot.send_document(
+                chat_id=update.effective_chat.id,
+                document=fh,
+                filename=f"farm_ledger_{date.today().isoformat()}.{fmt}",
+            )
+        await progress.delete()
+    except Exception:
+        logger.exception("Export failed for farmer %s", farmer.get('id'))
+        await progress.edit_text("خطأ أثناء التصدير. حاول لاحقًا." if lang == 'ar' else "Export failed. Please try again later.")
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# ----------------------
+# History browser (/history, or "History" from a crop's manage view)
+# ----------------------
+HISTORY_PER_PAGE = 10
+HISTORY_KINDS = ("harvests", "expenses", "treatments")
+HISTORY_RANGES = ("7", "30", "90", "365", "all")
+
+def _history_labels(lang):
+    if lang == 'ar':
+        return {"harvests": "🧾 الحصاد", "expenses": "💸 المصاريف", "treatments": "🗓️ العلاجات",
+                "7": "7 أيام", "30": "30 يومًا", "90": "3 أشهر", "365": "سنة", "all": "الكل",
+                **{c: ar for c, (ar, _) in EXPENSE_CATEGORIES.items()}}
+    return {"harvests": "🧾 Harvests", "expenses": "💸 Expenses", "treatments": "🗓️ Treatments",
+            "7": "7 days", "30": "30 days", "90": "3 months", "365": "1 year", "all": "All",
+            **{c: en for c, (_, en) in EXPENSE_CATEGORIES.items()}}
+
+def _history_line(kind, r):
+    crop = nested(r, "crops", "name")
+    if kind == "harvests":
+        return f"• {r.get('harvest_date')} — {crop}: {r.get('quantity')} {r.get('unit') or 'kg'} ({r.get('status')})"
+    if kind == "expenses":
+        return f"• {r.get('expense_date')} — {r.get('category')}: {r.get('amount')} LBP" + (f" ({crop})" if crop else "")
+    cost = f" — {r.get('cost')} LBP" if r.get('cost') is not None else ""
+    return f"• {r.get('treatment_date')} — {crop}: {r.get('product_name')}{cost}"
+
+def _page_data(direction, kind, r):
+    """callback_data for history navigation: hist_page:<n|p>:<date or empty>:<id>."""
+    sort_col = get_farm_core().RECORD_SOURCES[kind][2]
+    return f"hist_page:{direction}:{r.get(sort_col) or ''}:{r['id']}"
+
+def _parse_page_data(data):
+    try:
+        _, direction, rest = data.split(":", 2)
+        value, row_id = rest.rsplit(":", 1)
+    except ValueError:
+        return None, False
+    if direction not in ("n", "p"):
+        return None, False
+    return (value if value not in ("", "None") else None, row_id), direction == "p"
+
+async def _history_step(query_or_message, context, farmer, edit: bool):
+    """Ask for the next missing filter (kind -> crop -> range -> category) or show the first page."""
+    lang = farmer.get('language', 'ar')
+    labels = _history_labels(lang)
+    f = context.user_data.setdefault('history', {})
+    if 'kind' not in f:
+        text = "📜 أي سجل تريد عرضه؟" if lang == 'ar' else "📜 Which records?"
+        kb = [[InlineKeyboardButton(labels[k], callback_data=f"hist_kind:{k}")] for k in HISTORY_KINDS]
+    elif 'crop_id' not in f:
+        text = "اختر المحصول:" if lang == 'ar' else "Choose crop:"
+        kb = [[InlineKeyboardButton("كل المحاصيل" if lang == 'ar' else "All crops", callback_data="hist_crop:all")]]
+        for c in get_farm_core().get_farmer_crops(farmer['id']):
+            kb.append([InlineKeyboardButton(c['name'], callback_data=f"hist_crop:{c['id']}")])
+    elif 'days' not in f:
+        text = "الفترة:" if lang == 'ar' else "Period:"
+        kb = [[InlineKeyboardButton(labels[r], callback_data=f"hist_range:{r}") for r in HISTORY_RANGES]]
+    elif f['kind'] == "expenses" and 'category' not in f:
+        text = "الفئة:" if lang == 'ar' else "Category:"
+        cats = [InlineKeyboardButton(labels["all"], callback_data="hist_cat:all")]
+        cats += [InlineKeyboardButton(labels[c], callback_data=f"hist_cat:{c}") for c in EXPENSE_CATEGORIES]
+        kb = [cats[:3], cats[3:]]
+    else:
+        await _send_history_page(query_or_message, context, farmer, edit=edit)
+        return
+    if edit:
+        await query_or_message.edit_text(text, reply_markup=InlineKeyboardMarkup(kb))
+    else:
+        await query_or_message.reply_text(text, reply_markup=InlineKeyboardMarkup(kb))
+
+async def _send_history_page(message, context, farmer, cursor=None, backward=False, edit=True):
+    farm_core = get_farm_core()
+    lang = farmer.get('language', 'ar')
+    labels = _history_labels(lang)
+    f = context.user_data.get('history') or {}
+    kind = f['kind']
+    start_date = None if f.get('days') in (None, "all") else date.today() - timedelta(days=int(f['days']))
+    rows = farm_core.get_records_page(
+        kind, farmer['id'],
+        cursor=cursor, limit=HISTORY_PER_PAGE + 1, backward=backward,
+        crop_id=f.get('crop_id'), start_date=start_date, category=f.get('category'),
+        include_archived=start_date is None,  # "All" reaches back into archived seasons
+    )
+    has_more = len(rows) > HISTORY_PER_PAGE
+    page = rows[:HISTORY_PER_PAGE]
+    if backward:
+        page.reverse()
+    has_prev = has_more if backward else cursor is not None
+    has_next = True if backward else has_more
+
+    title = f"📜 {labels[kind]} — {f.get('crop_name') or ('كل المحاصيل' if lang == 'ar' else 'All crops')} — {labels[f.get('days') or 'all']}"
+    if f.get('category'):
+        title += f" — {labels.get(f['category'], f['category'])}"
+    body = "\n".join(_history_line(kind, r) for r in page) if page else ("لا توجد سجلات." if lang == 'ar' else "No records.")
+
+    nav = []
+    if has_prev and page:
+        nav.append(InlineKeyboardButton("⬅️ السابق" if lang == 'ar' else "⬅️ Prev", callback_data=_page_data("p", kind, page[0])))
+    if has_next and page:
+        nav.append(InlineKeyboardButton("التالي ➡️" if lang == 'ar' else "Next ➡️", callback_data=_page_data("n", kind, page[-1])))
+    kb = [nav] if nav else []
+    kb.append([InlineKeyboardButton("🔁 " + ("تغيير الفلاتر" if lang == 'ar' else "Change filters"), callback_data="hist_reset")])
+    markup = InlineKeyboardMarkup(kb)
+    if edit:
+        await message.edit_text(f"{title}\n\n{body}", reply_markup=markup)
+    else:
+        await message.reply_text(f"{title}\n\n{body}", reply_markup=markup)
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    farm_core = get_farm_core()
+    farmer = farm_core.get_farmer(update.effective_user.id)
+    if not farmer:
+        await update.message.reply_text("Create an account first. Use /start")
+        return
+    context.user_data['history'] = {}
+    await _history_step(update.message, context, farmer, edit=False)
+
+async def history_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles hist_kind:/hist_crop:/hist_range:/hist_cat:/hist_for:/hist_page:/hist_reset callbacks, editing in place."""
+    farm_core = get_farm_core()
+    query = update.callback_query
+    await query.answer()
+    data = query.data or ""
+    farmer = farm_core.get_farmer(query.from_user.id)
+    if not farmer:
+        await query.message.reply_text("Create an account first. Use /start")
+        return
+    f = context.user_data.setdefault('history', {})
+    key, _, value = data.partition(":")
+
+    if key == "hist_page":
+        if 'kind' not in f:
+            await _history_step(query.message, context, farmer, edit=True)
+            return
+        cursor, backward = _parse_page_data(data)
+        await _send_history_page(query.message, context, farmer, cursor=cursor, backward=backward)
+        return
+    if key == "hist_reset":
+        context.user_data['history'] = {}
+    elif key == "hist_for":
+        crop = farm_core.get_crop(value)
+        if not crop or str(crop.get('farmer_id')) != str(farmer['id']):
+            await query.message.reply_text("Crop not found.")
+            return
+        context.user_data['history'] = {'crop_id': crop['id'], 'crop_name': crop.get('name')}
+    elif key == "hist_kind" and value in HISTORY_KINDS:
+        f['kind'] = value
+    elif key == "hist_crop":
+        if value == "all":
+            f['crop_id'], f['crop_name'] = None, None
+        else:
+            crop = farm_core.get_crop(value)
+            if not crop or str(crop.get('farmer_id')) != str(farmer['id']):
+                await query.message.reply_text("Crop not found.")
+                return
+            f['crop_id'], f['crop_name'] = crop['id'], crop.get('name')
+    elif key == "hist_range" and value in HISTORY_RANGES:
+        f['days'] = value
+    elif key == "hist_cat" and (value == "all" or value in EXPENSE_CATEGORIES):
+        f['category'] = None if value == "all" else value
+    await _history_step(query.message, context, farmer, edit=True)
+
+# ----------------------
+# Note search
+# ----------------------
+SEARCH_RESULTS = 10
+SEARCH_SNIPPET = 120
+
+def _search_snippet(notes: str, query: str) -> str:
+    """Up to SEARCH_SNIPPET characters of the note, centred on the match when it can be located."""
+    notes = " ".join((notes or "").split())
+    if len(notes) <= SEARCH_SNIPPET:
+        return notes
+    # normalize_text keeps single characters in place for plain text, so positions roughly line up
+    at = normalize_text(notes).find(normalize_text(query))
+    start = max(0, min(at - SEARCH_SNIPPET // 3, len(notes) - SEARCH_SNIPPET)) if at > 0 else 0
+    return ("…" if start else "") + notes[start:start + SEARCH_SNIPPET] + ("…" if start + SEARCH_SNIPPET < len(notes) else "")
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/search <words>: best matching crop, harvest and treatment notes."""
+    farm_core = get_farm_core()
+    farmer = farm_core.get_farmer(update.effective_user.id)
+    if not farmer:
+        await update.message.reply_text("Create an account first. Use /start")
+        return
+    lang = farmer.get('language', 'ar')
+    text = " ".join(context.args or [])
+    if not normalize_text(text):
+        await update.message.reply_text("اكتب: /search <كلمات من الملاحظات>" if lang == 'ar' else "Usage: /search <words from your notes>")
+        return
+
+    results = farm_core.search_notes(farmer['id'], text, limit=SEARCH_RESULTS)
+    if not results:
+        await update.message.reply_text("لا توجد ملاحظات مطابقة." if lang == 'ar' else "No matching notes.")
+        return
+    kinds = {"crop": "🌾", "harvest": "🧾", "treatment": "🗓️"}
+    lines = [f"🔎 {'نتائج البحث' if lang == 'ar' else 'Search results'}: {text}"]
+    for r in results:
+        lines.append(f"{kinds.get(r.get('kind'), '•')} {r.get('record_date') or ''} — {r.get('crop_name') or ''}\n  {_search_snippet(r.get('notes'), text)}")
+    await update.message.reply_text("\n".join(lines))
@@ -3,7 +3,7 @@ import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from datetime import datetime, date, timedelta
-from core_singleton import get_farm_core
+from core_singleton import get_farm_core, get_outbox
 from keyboards import get_main_keyboard
 
 logger = logging.getLogger(__name__)
@@ -15,6 +15,14 @@ EXPENSE_STATES = {
     'EXPENSE_DATE': 3
 }
 
+# stored category -> (Arabic label, English label); also the /history category filter
+EXPENSE_CATEGORIES = {
+    "Seeds": ("بذور", "Seeds"),
+    "Fertilizer": ("سماد", "Fertilizer"),
+    "Transport": ("نقل", "Transport"),
+    "Other": ("أخرى", "Other"),
+}
+
 PAYMENT_STATES = {
     'PAYMENT_AMOUNT': 0
 }
@@ -66,10 +74,8 @@ async def expense_crop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         lang = farmer.get('language', 'ar')
         # show category inline
         cats = [
-            InlineKeyboardButton("بذور" if lang == 'ar' else "Seeds", callback_data="expense_cat:Seeds"),
-            InlineKeyboardButton("سماد" if lang == 'ar' else "Fertilizer", callback_data="expense_cat:Fertilizer"),
-            InlineKeyboardButton("نقل" if lang == 'ar' else "Transport", callback_data="expense_cat:Transport"),
-            InlineKeyboardButton("أخرى" if lang == 'ar' else "Other", callback_data="expense_cat:Other"),
+            InlineKeyboardButton(ar if lang == 'ar' else en, callback_data=f"expense_cat:{cat}")
+            for cat, (ar, en) in EXPENSE_CATEGORIES.items()
         ]
         await query.message.reply_text("اختر الفئة:" if lang == 'ar' else "Choose category:", reply_markup=InlineKeyboardMarkup([cats[:2], cats[2:]]))
         return EXPENSE_STATES['EXPENSE_CATEGORY']
@@ -160,23 +166,19 @@ async def expense_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
     # Save expense
     farmer = farm_core.get_farmer(uid)
-    expense = farm_core.add_expense(
+    # queued in the local outbox; written to Supabase by the background flusher
+    get_outbox().submit(
+        "add_expense",
         farmer_id=farmer['id'],
         expense_date=expense_date_val,
         category=context.user_data.get('category'),
         amount=context.user_data.get('amount'),
         crop_id=context.user_data.get('crop_id')
     )
-    if expense:
-        if update.callback_query:
-            await update.callback_query.message.reply_text("تم تسجيل المصروف! ✅" if farmer.get('language','ar')=='ar' else "Expense recorded! ✅", reply_markup=get_main_keyboard(farmer.get('language', 'ar')))
-        else:
-            await update.message.reply_text("تم تسجيل المصروف! ✅" if farmer.get('language','ar')=='ar' else "Expense recorded! ✅", reply_markup=get_main_keyboard(farmer.get('language', 'ar')))
+    if update.callback_query:
+        await update.callback_query.message.reply_text("تم تسجيل المصروف! ✅" if farmer.get('language','ar')=='ar' else "Expense recorded! ✅", reply_markup=get_main_keyboard(farmer.get('language', 'ar')))
     else:
-        if update.callback_query:
-            await update.callback_query.message.reply_text("خطأ في تسجيل المصروف." if farmer.get('language','ar')=='ar' else "Error recording expense.")
-        else:
-            await update.message.reply_text("خطأ في تسجيل المصروف." if farmer.get('language','ar')=='ar' else "Error recording expense.")
+        await update.message.reply_text("تم تسجيل المصروف! ✅" if farmer.get('language','ar')=='ar' else "Expense recorded! ✅", reply_markup=get_main_keyboard(farmer.get('language', 'ar')))
     # cleanup
     for k in ("category", "amount", "crop_id"):
         context.user_data.pop(k, None)
@@ -0,0 +1,175 @@
+# aboutreport.py
+import asyncio
+import logging
+import numpy as np
+from telegram import Update
+from telegram.ext import ContextTypes
+from core_singleton import get_farm_core
+from farmcore import nested
+from keyboards import get_main_keyboard
+
+logger = logging.getLogger(__name__)
+
+REPORT_PAGE_SIZE = 1000
+TELEGRAM_MAX_CHARS = 4000
+# internal column keys; user-entered expense categories are keyed ("expense", name) so a
+# category called e.g. "Treatment" never lands in the treatment or yield column
+EXPENSE, TREATMENT, YIELD, REVENUE = "expense", ("treatment",), ("yield",), ("revenue",)
+
+# ----------------------
+# Columnar load + vectorized aggregation
+# ----------------------
+def _season_of(value):
+    """Season = calendar year of the event date ('2025-04-03' -> 2025); 0 when unknown."""
+    try:
+        return int(str(value)[:4])
+    except (TypeError, ValueError):
+        return 0
+
+def load_report_columns(farm_core, farmer_id):
+    """
+    Read the farmer's expenses, treatments, harvests and paid payments once and return flat columns:
+    crop code, season, column code, value. Crops are told apart by id (two plantings of "Tomato" are
+    two crops); crop_ids / crop_names hold each code's id and label. Columns are ("expense", category) per cost
+    category, then TREATMENT, YIELD and REVENUE, so one bincount produces every breakdown.
+    """
+    crop_codes, crop_names, categories = {}, [], {}
+    crop, season, column, value = [], [], [], []
+
+    def _add(crop_id, crop_name, when, key, amount):
+        if crop_id not in crop_codes:
+            crop_codes[crop_id] = len(crop_codes)
+            crop_names.append(crop_name)
+        crop.append(crop_codes[crop_id])
+        season.append(_season_of(when))
+        column.append(categories.setdefault(key, len(categories)))
+        value.append(float(amount or 0))
+
+    for e in farm_core.iter_records("expenses", farmer_id, REPORT_PAGE_SIZE, include_archived=True):
+        _add(e.get("crop_id"), nested(e, "crops", "name"), e.get("expense_date"), (EXPENSE, e.get("category") or "Other"), e.get("amount"))
+    for t in farm_core.iter_records("treatments", farmer_id, REPORT_PAGE_SIZE, include_archived=True):
+        if t.get("cost"):
+            _add(t.get("crop_id"), nested(t, "crops", "name"), t.get("treatment_date"), TREATMENT, t.get("cost"))
+    cost_columns = list(categories)
+    for h in farm_core.iter_records("harvests", farmer_id, REPORT_PAGE_SIZE, include_archived=True):
+        _add(h.get("crop_id"), nested(h, "crops", "name"), h.get("harvest_date"), YIELD, h.get("quantity"))
+    for p in farm_core.iter_records("payments", farmer_id, REPORT_PAGE_SIZE, include_archived=True):
+        if p.get("status") == "paid":
+            _add(nested(p, "deliveries", "harvests", "crop_id"), nested(p, "deliveries", "harvests", "crops", "name"),
+                 nested(p, "deliveries", "harvests", "harvest_date") or p.get("paid_date"),
+                 REVENUE, p.get("paid_amount"))
+
+    return {
+        "crop": np.asarray(crop, dtype=np.int64),
+        "season": np.asarray(season, dtype=np.int64),
+        "column": np.asarray(column, dtype=np.int64),
+        "value": np.asarray(value, dtype=np.float64),
+        "crop_ids": list(crop_codes),
+        "crop_names": crop_names,
+        "columns": list(categories),
+        "cost_columns": cost_columns,
+    }
+
+def compute_season_report(cols):
+    """
+    One vectorized pass over the columns: group by (crop, season) and sum every column at once.
+    Returns a list of dicts (newest season first) with cost by expense category, treatment cost, yield, revenue,
+    cost per kg and margin.
+    """
+    if cols["value"].size == 0:
+        return []
+    names = cols["columns"]
+    seasons, season_idx = np.unique(cols["season"], return_inverse=True)
+    dims = (len(cols["crop_names"]), seasons.size, len(names))
+    cell = np.ravel_multi_index((cols["crop"], season_idx, cols["column"]), dims)
+    totals = np.bincount(cell, weights=cols["value"], minlength=int(np.prod(dims))).reshape(dims[0] * dims[1], dims[2])
+    # keep the (crop, season) pairs that have at least one record
+    pair = np.ravel_multi_index((cols["crop"], season_idx), dims[:2])
+    groups = np.flatnonzero(np.bincount(pair, minlength=dims[0] * dims[1]))
+    totals = totals[groups]
+    group_crop, group_season = np.unravel_index(groups, dims[:2])
+
+    cost_idx = [names.index(c) for c in cols["cost_columns"]]
+    zeros = np.zeros(groups.size)
+    costs = totals[:, cost_idx] if cost_idx else zeros[:, None]
+    cost = costs.sum(axis=1)
+    yld = totals[:, names.index(YIELD)] if YIELD in names else zeros
+    revenue = totals[:, names.index(REVENUE)] if REVENUE in names else zeros
+    treatment = totals[:, names.index(TREATMENT)] if TREATMENT in names else zeros
+    cost_per_kg = np.divide(cost, yld, out=np.full(groups.size, np.nan), where=yld > 0)
+    margin = revenue - cost
+
+    order = np.lexsort((group_crop, -seasons[group_season]))
+    report = []
+    for i in order:
+        report.append({
+            "crop_id": cols["crop_ids"][group_crop[i]],
+            "crop": cols["crop_names"][group_crop[i]],
+            "season": int(seasons[group_season[i]]),
+            "cost_by_category": {c[1]: float(costs[i, j]) for j, c in enumerate(cols["cost_columns"])
+                                 if c[0] == EXPENSE and costs[i, j]},
+            "treatment_cost": float(treatment[i]),
+            "cost": float(cost[i]),
+            "yield": float(yld[i]),
+            "revenue": float(revenue[i]),
+            "cost_per_kg": None if np.isnan(cost_per_kg[i]) else float(cost_per_kg[i]),
+            "margin": float(margin[i]),
+        })
+    return report
+
+def _format_report(report, lang):
+    lines = ["📈 تقرير الربحية حسب الموسم" if lang == 'ar' else "📈 Profitability by season"]
+    current = None
+    for r in report:
+        if r["season"] != current:
+            current = r["season"]
+            lines.append("")
+            lines.append(f"📅 {current or '—'}")
+        crop = r["crop"] or ("عام" if lang == 'ar' else "General")
+        parts = [f"{c} {int(v)}" for c, v in r["cost_by_category"].items()]
+        if r["treatment_cost"]:
+            parts.append(("المعالجات" if lang == 'ar' else "treatments") + f" {int(r['treatment_cost'])}")
+        cats = ", ".join(parts)
+        cpk = f"{r['cost_per_kg']:.0f}" if r["cost_per_kg"] is not None else "—"
+        if lang == 'ar':
+            lines.append(f"• {crop}: الإنتاج {r['yield']:g} kg | الإيراد {int(r['revenue'])} | التكلفة {int(r['cost'])}"
+                         + (f" ({cats})" if cats else "") + f" | التكلفة/كغ {cpk} | الهامش {int(r['margin'])} LBP")
+        else:
+            lines.append(f"• {crop}: yield {r['yield']:g} kg | revenue {int(r['revenue'])} | cost {int(r['cost'])}"
+                         + (f" ({cats})" if cats else "") + f" | cost/kg {cpk} | margin {int(r['margin'])} LBP")
+    return lines
+
+def _build_report(farm_core, farmer_id):
+    return compute_season_report(load_report_columns(farm_core, farmer_id))
+
+# ----------------------
+# /report
+# ----------------------
+async def season_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    farm_core = get_farm_core()
+    farmer = farm_core.get_farmer(update.effective_user.id)
+    if not farmer:
+        await update.message.reply_text("Create an account first. Use /start")
+        return
+    lang = farmer.get('language', 'ar')
+    try:
+        report = await asyncio.to_thread(_build_report, farm_core, farmer['id'])
+    except Exception as e:
+        logger.error(f"Error building season report: {e}")
+        await update.message.reply_text(
+            "حدث خطأ أثناء إعداد التقرير. حاول لاحقًا." if lang == 'ar' else "Failed to build the report. Please try again later.",
+            reply_markup=get_main_keyboard(lang)
+        )
+        return
+    if not report:
+        await update.message.reply_text("لا توجد بيانات كافية للتقرير." if lang == 'ar' else "Not enough data for a report yet.", reply_markup=get_main_keyboard(lang))
+        return
+
+    # split on line boundaries to stay under Telegram's message limit
+    chunk = ""
+    for line in _format_report(report, lang):
+        if len(chunk) + len(line) + 1 > TELEGRAM_MAX_CHARS:
+            await update.message.reply_text(chunk)
+            chunk = ""
+        chunk += line + "\n"
+    await update.message.reply_text(chunk, reply_markup=get_main_keyboard(lang))
@@ -1,7 +1,7 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from datetime import datetime, date, timedelta
-from core_singleton import get_farm_core
+from core_singleton import get_farm_core, get_outbox
 from keyboards import get_main_keyboard
 
 
@@ -10,9 +10,12 @@ TREATMENT_STATES = {
     'TREATMENT_PRODUCT': 1,
     'TREATMENT_DATE': 2,
     'TREATMENT_COST': 3,
-    'TREATMENT_NEXT_DATE': 4
+    'TREATMENT_NEXT_DATE': 4,
+    'TREATMENT_INTERVAL': 5
 }
 
+MAX_INTERVAL_DAYS = 365
+
 # ----------------------
 # Helpers
 # ----------------------
@@ -30,6 +33,13 @@ def _parse_date_input(text: str):
             pass
     raise ValueError("Invalid date")
 
+def _next_date_keyboard(lang: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("تخطي" if lang=='ar' else "Skip", callback_data="treatment_skip:next"),
+         InlineKeyboardButton("📅 " + ("اختر تاريخًا" if lang=='ar' else "Pick Date"), callback_data="treatment_next:pick")],
+        [InlineKeyboardButton("🔁 " + ("تكرار كل عدة أيام" if lang=='ar' else "Repeat every few days"), callback_data="treatment_next:repeat")]
+    ])
+
 # ----------------------
 # Treatment flow (inline-first)
 # ----------------------
@@ -164,15 +174,12 @@ async def treatment_cost(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             return TREATMENT_STATES['TREATMENT_COST']
 
     # ask next date with inline skip / pick
-    kb = InlineKeyboardMarkup([
-        [InlineKeyboardButton("تخطي" if lang=='ar' else "Skip", callback_data="treatment_skip:next"),
-         InlineKeyboardButton("📅 " + ("اختر تاريخًا" if lang=='ar' else "Pick Date"), callback_data="treatment_next:pick")]
-    ])
-    await update.message.reply_text("التاريخ القادم للعلاج؟ (اختياري)" if lang=='ar' else "Next treatment date? (optional)", reply_markup=kb)
+    await update.message.reply_text("التاريخ القادم للعلاج؟ (اختياري)" if lang=='ar' else "Next treatment date? (optional)", reply_markup=_next_date_keyboard(lang))
     return TREATMENT_STATES['TREATMENT_NEXT_DATE']
 
 async def treatment_skip_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle Skip inline for cost or next date; also handle pick next-date callback."""
+    farm_core = get_farm_core()
     query = update.callback_query
     await query.answer()
     data = query.data or ""
@@ -182,11 +189,7 @@ async def treatment_skip_callback(update: Update, context: ContextTypes.DEFAULT_
     # cost skip
     if data == "treatment_skip:cost":
         context.user_data['treatment_cost'] = None
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("تخطي" if lang=='ar' else "Skip", callback_data="treatment_skip:next"),
-             InlineKeyboardButton("📅 " + ("اختر تاريخًا" if lang=='ar' else "Pick Date"), callback_data="treatment_next:pick")]
-        ])
-        await query.message.reply_text("التاريخ القادم للعلاج؟ (اختياري)" if lang=='ar' else "Next treatment date? (optional)", reply_markup=kb)
+        await query.message.reply_text("التاريخ القادم للعلاج؟ (اختياري)" if lang=='ar' else "Next treatment date? (optional)", reply_markup=_next_date_keyboard(lang))
         return TREATMENT_STATES['TREATMENT_NEXT_DATE']
 
     # next-date pick handler (user pressed pick)
@@ -194,22 +197,25 @@ async def treatment_skip_callback(update: Update, context: ContextTypes.DEFAULT_
         await query.message.reply_text("أدخل التاريخ التالي (YYYY-MM-DD أو DD/MM/YYYY)" if lang=='ar' else "Enter next date (YYYY-MM-DD or DD/MM/YYYY)")
         return TREATMENT_STATES['TREATMENT_NEXT_DATE']
 
+    # recurring: ask for the interval, the plan replaces a single next date
+    if data == "treatment_next:repeat":
+        await query.message.reply_text("كل كم يوم؟ (مثال: 10)" if lang=='ar' else "Every how many days? (e.g. 10)")
+        return TREATMENT_STATES['TREATMENT_INTERVAL']
+
     # next-date skip
     if data == "treatment_skip:next":
         next_date = None
         # save now
         farmer = farm_core.get_farmer(query.from_user.id)
-        saved = farm_core.add_treatment(
+        get_outbox().submit(
+            "add_treatment",
             crop_id=context.user_data.get('crop_id'),
             treatment_date=context.user_data.get('treatment_date'),
             product_name=context.user_data.get('product_name'),
             cost=context.user_data.get('treatment_cost'),
             next_due_date=next_date
         )
-        if saved:
-            await query.message.reply_text("تم تسجيل العلاج! ✅" if farmer['language']=='ar' else "Treatment recorded! ✅", reply_markup=get_main_keyboard(farmer['language']))
-        else:
-            await query.message.reply_text("خطأ في تسجيل العلاج." if farmer['language']=='ar' else "Error recording treatment.")
+        await query.message.reply_text("تم تسجيل العلاج! ✅" if farmer['language']=='ar' else "Treatment recorded! ✅", reply_markup=get_main_keyboard(farmer['language']))
         # cleanup
         for k in ("crop_id", "product_name", "treatment_date", "treatment_cost"):
             context.user_data.pop(k, None)
@@ -221,6 +227,7 @@ async def treatment_skip_callback(update: Update, context: ContextTypes.DEFAULT_
 
 async def treatment_next_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle typed next date after pick or typed skip."""
+    farm_core = get_farm_core()
     text = update.message.text.strip()
     farmer = farm_core.get_farmer(update.effective_user.id)
     lang = farmer['language']
@@ -233,25 +240,111 @@ async def treatment_next_date(update: Update, context: ContextTypes.DEFAULT_TYPE
             await update.message.reply_text("صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD أو DD/MM/YYYY" if lang=='ar' else "Invalid date format. Use YYYY-MM-DD or DD/MM/YYYY")
             return TREATMENT_STATES['TREATMENT_NEXT_DATE']
 
-    # save treatment
-    saved = farm_core.add_treatment(
+    # save treatment (queued in the local outbox; the background flusher writes it to Supabase)
+    get_outbox().submit(
+        "add_treatment",
         crop_id=context.user_data.get('crop_id'),
         treatment_date=context.user_data.get('treatment_date'),
         product_name=context.user_data.get('product_name'),
         cost=context.user_data.get('treatment_cost'),
         next_due_date=next_date
     )
-    if saved:
-        await update.message.reply_text("تم تسجيل العلاج! ✅" if lang=='ar' else "Treatment recorded! ✅", reply_markup=get_main_keyboard(lang))
-    else:
-        await update.message.reply_text("خطأ في تسجيل العلاج." if lang=='ar' else "Error recording treatment.")
+    await update.message.reply_text("تم تسجيل العلاج! ✅" if lang=='ar' else "Treatment recorded! ✅", reply_markup=get_main_keyboard(lang))
 
     # cleanup
     for k in ("crop_id", "product_name", "treatment_date", "treatment_cost"):
         context.user_data.pop(k, None)
     return ConversationHandler.END
 
+async def treatment_interval(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Save the treatment plus a recurring plan: due every N days after this treatment."""
+    farm_core = get_farm_core()
+    farmer = farm_core.get_farmer(update.effective_user.id)
+    if not farmer:
+        await update.message.reply_text("Create an account first. Use /start")
+        return ConversationHandler.END
+    lang = farmer['language']
+    try:
+        interval = int(update.message.text.strip())
+        if not 1 <= interval <= MAX_INTERVAL_DAYS:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(f"أدخل عدد أيام بين 1 و {MAX_INTERVAL_DAYS}." if lang=='ar' else f"Enter a number of days between 1 and {MAX_INTERVAL_DAYS}.")
+        return TREATMENT_STATES['TREATMENT_INTERVAL']
+
+    treatment_dt = context.user_data.get('treatment_date') or date.today()
+    outbox = get_outbox()
+    outbox.submit(
+        "add_treatment",
+        crop_id=context.user_data.get('crop_id'),
+        treatment_date=treatment_dt,
+        product_name=context.user_data.get('product_name'),
+        cost=context.user_data.get('treatment_cost'),
+        next_due_date=None
+    )
+    outbox.submit(
+        "add_treatment_plan",
+        crop_id=context.user_data.get('crop_id'),
+        product_name=context.user_data.get('product_name'),
+        interval_days=interval,
+        start_date=treatment_dt + timedelta(days=interval),
+        cost=context.user_data.get('treatment_cost')
+    )
+    first_due = (treatment_dt + timedelta(days=interval)).isoformat()
+    await update.message.reply_text(
+        f"تم تسجيل العلاج! ✅ سيتكرر كل {interval} يوم، الموعد القادم {first_due}.\nاستخدم /upcoming لعرض المواعيد." if lang=='ar' else
+        f"Treatment recorded! ✅ Repeats every {interval} days, next on {first_due}.\nUse /upcoming to see what is due.",
+        reply_markup=get_main_keyboard(lang)
+    )
+
+    # cleanup
+    for k in ("crop_id", "product_name", "treatment_date", "treatment_cost"):
+        context.user_data.pop(k, None)
+    return ConversationHandler.END
 
+# ----------------------
+# Upcoming treatments (one-off next dates + recurring plans)
+# ----------------------
+async def upcoming_treatments(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/upcoming [days]: what is due in the next 14 days (or the given number of days)."""
+    farm_core = get_farm_core()
+    farmer = farm_core.get_farmer(update.effective_user.id)
+    if not farmer:
+        await update.message.reply_text("Create an account first. Use /start")
+        return
+    lang = farmer['language']
+    try:
+        days = max(1, min(int(context.args[0]), MAX_INTERVAL_DAYS)) if context.args else 14
+    except ValueError:
+        days = 14
 
+    due = farm_core.get_upcoming_treatments(farmer['id'], days=days)
+    if not due:
+        await update.message.reply_text(f"لا توجد علاجات مستحقة خلال {days} يوم." if lang=='ar' else f"No treatments due in the next {days} days.")
+        return
 
+    lines = [f"🗓️ {'العلاجات القادمة' if lang=='ar' else 'Upcoming treatments'} ({days} {'يوم' if lang=='ar' else 'days'}):"]
+    plans = {}
+    for t in due:
+        crop_name = (t.get('crops') or {}).get('name', '')
+        lines.append(f"• {str(t['next_due_date'])[:10]} — {crop_name}: {t.get('product_name') or ''}{' 🔁' if t.get('recurring') else ''}")
+        if t.get('recurring'):
+            plans.setdefault(t['plan_id'], f"{crop_name}: {t.get('product_name') or ''}")
+    kb = [[InlineKeyboardButton("⏹️ " + ("إيقاف" if lang=='ar' else "Stop") + f" {label}", callback_data=f"plan_end:{plan_id}")]
+          for plan_id, label in plans.items()]
+    await update.message.reply_text("\n".join(lines), reply_markup=InlineKeyboardMarkup(kb) if kb else None)
 
+async def plan_end_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stop a recurring plan from today on."""
+    farm_core = get_farm_core()
+    query = update.callback_query
+    await query.answer()
+    farmer = farm_core.get_farmer(query.from_user.id)
+    lang = farmer['language'] if farmer else 'ar'
+    plan_id = (query.data or "").split(":", 1)[1]
+    # only the farmer's own plans can be stopped
+    if not farmer or not any(p['id'] == plan_id for p in farm_core.get_treatment_plans(farmer['id'])):
+        await query.message.reply_text("خيار غير معروف." if lang=='ar' else "Unknown option.")
+        return
+    farm_core.end_treatment_plan(plan_id)
+    await query.message.reply_text("تم إيقاف التكرار. ✅" if lang=='ar' else "Recurring treatment stopped. ✅")
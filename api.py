@@ -0,0 +1,157 @@
+# api.py
+"""
+Read-only JSON API for agronomist dashboards, mounted at /api by main.py.
+
+    GET /api/{farmers|crops|harvests|payments|prices}?limit=50&cursor=...&fields=a,b&farmer_id=...
+
+Auth: "Authorization: Bearer <token>" with one of DASHBOARD_API_TOKENS (comma-separated).
+Pages are keyset pages; pass back "next_cursor" to continue. Responses carry an ETag built from
+the invalidation bus's table versions, so If-None-Match is answered with 304 without a
+database round trip. While the bus is disconnected no ETag is sent.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+
+from core_singleton import get_farm_core
+from resilience import FarmCoreUnavailable
+
+logger = logging.getLogger("api")
+
+MAX_LIMIT = 200
+DEFAULT_LIMIT = 50
+
+# resource -> (table, sort column, selectable columns, embedded relation, farmer id column, tables it reads)
+RESOURCES = {
+    "farmers": ("farmers", "id", ("id", "telegram_id", "name", "phone", "village", "language"),
+                None, "id", ("farmers",)),
+    "crops": ("crops", "planting_date", ("id", "farmer_id", "name", "planting_date", "notes"),
+              None, "farmer_id", ("crops",)),
+    "harvests": ("harvests", "harvest_date", ("id", "crop_id", "harvest_date", "quantity", "unit", "status", "notes"),
+                 "crops!inner(name, farmer_id)", "crops.farmer_id", ("harvests", "crops")),
+    "payments": ("payments", "expected_date", ("id", "delivery_id", "expected_date", "paid_amount", "paid_date", "status"),
+                 "deliveries!inner(delivery_date, harvests!inner(quantity, unit, crop_id, crops!inner(name, farmer_id)))",
+                 "deliveries.harvests.crops.farmer_id", ("payments", "deliveries", "harvests", "crops")),
+    "prices": ("market_prices", "price_date", ("id", "crop_name", "price_date", "price_per_kg", "source"),
+               None, None, ("market_prices",)),
+}
+# extra equality filters a resource accepts as query parameters
+FILTERS = {
+    "harvests": ("status", "crop_id"),
+    "payments": ("status",),
+    "crops": ("name",),
+    "prices": ("crop_name", "source"),
+}
+
+def require_token(request: Request) -> None:
+    tokens = [t.strip() for t in os.getenv("DASHBOARD_API_TOKENS", "").split(",") if t.strip()]
+    scheme, _, given = request.headers.get("authorization", "").partition(" ")
+    if not tokens or scheme.lower() != "bearer" or not any(hmac.compare_digest(given, t) for t in tokens):
+        raise HTTPException(status_code=401, detail="Unauthorized", headers={"WWW-Authenticate": "Bearer"})
+
+router = APIRouter(prefix="/api", dependencies=[Depends(require_token)])
+
+def encode_cursor(value: Any, row_id: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # the sort value may be null (rows without a date sort last, see FarmCore._keyset_page); the id never is
+    scalar = lambda v: isinstance(v, (str, int, float)) and not isinstance(v, bool)
+    if not (value is None or scalar(value)) or not scalar(row_id) or row_id == "":
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # the values end up inside a PostgREST or=() filter
+    if any(isinstance(v, str) and any(c in v for c in ",()") for v in (value, row_id)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, row_id
+
+def _select(resource: str, fields: Optional[str]) -> str:
+    table, sort_col, columns, embed, _, _ = RESOURCES[resource]
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in wanted if f not in columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}; choose from {', '.join(columns)}")
+    else:
+        wanted = list(columns)
+    # the cursor needs (sort column, id) on every row
+    for required in ("id", sort_col):
+        if required not in wanted:
+            wanted.append(required)
+    return ", ".join(wanted + ([embed] if embed else []))
+
+def _etag(request: Request, resource: str) -> Optional[str]:
+    bus = getattr(request.app.state, "invalidation_bus", None)
+    version = bus.version(RESOURCES[resource][5]) if bus is not None else None
+    if version is None:
+        return None
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return 'W/"' + hashlib.sha1(f"{resource}?{params}@{version}".encode()).hexdigest()[:20] + '"'
+
+def _not_modified(request: Request, etag: Optional[str]) -> bool:
+    if etag is None:
+        return False
+    given = request.headers.get("if-none-match", "")
+    return given.strip() == "*" or etag in [t.strip() for t in given.split(",")]
+
+@router.get("/{resource}")
+async def list_resource(
+    resource: str,
+    request: Request,
+    response: Response,
+    limit: int = DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    farmer_id: Optional[str] = None,
+):
+    if resource not in RESOURCES:
+        raise HTTPException(status_code=404, detail="Unknown resource")
+    table, sort_col, _, _, farmer_col, _ = RESOURCES[resource]
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    # the version is taken before reading, so a change during the read only costs a later refetch
+    etag = _etag(request, resource)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    filters: Dict[str, Any] = {}
+    if farmer_id:
+        if farmer_col is None:
+            raise HTTPException(status_code=400, detail="farmer_id is not a filter for this resource")
+        filters[farmer_col] = farmer_id
+    for name in FILTERS.get(resource, ()):
+        if request.query_params.get(name):
+            filters[name] = request.query_params[name]
+
+    select = _select(resource, fields)
+    edge = decode_cursor(cursor) if cursor else None
+    try:
+        farm_core = get_farm_core()  # the bot's instance: same client, caches and circuit breaker
+    except RuntimeError:
+        raise HTTPException(status_code=503, detail="Starting")
+    try:
+        rows: List[Dict[str, Any]] = await asyncio.to_thread(
+            farm_core.get_rows_page, table, select, sort_col, cursor=edge, limit=limit + 1, **filters,
+        )
+    except FarmCoreUnavailable:
+        raise HTTPException(status_code=503, detail="Database unavailable", headers={"Retry-After": "5"})
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if etag is not None:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return {
+        "data": rows,
+        "next_cursor": encode_cursor(rows[-1][sort_col], rows[-1]["id"]) if has_more else None,
+    }
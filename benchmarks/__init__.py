@@ -0,0 +1,2 @@
+# benchmarks
+"""Micro-benchmarks for FarmCore methods and handler rendering; run with `python -m benchmarks`."""
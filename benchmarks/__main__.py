@@ -0,0 +1,64 @@
+# benchmarks/__main__.py
+"""
+Run:  python -m benchmarks [--sizes 10,100,500] [--repeat 30] [--only 'farmcore.*']
+                           [--out results.json] [--baseline benchmarks/baseline.json]
+                           [--threshold 0.2] [--threshold-for 'handler.*=0.5'] [--save-baseline]
+Exits with status 1 when a benchmark's median regressed past its threshold versus the baseline.
+With --supabase the FarmCore cases run against SUPABASE_URL/SUPABASE_KEY (an already seeded local
+instance) instead of the in-memory backend; only the first size is used then.
+"""
+import argparse
+import logging
+import os
+import sys
+
+from benchmarks.suite import compare, load, run_suite, save
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--sizes", default="10,100,500", help="crops per farmer, comma-separated")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--only", help="fnmatch pattern on benchmark names, e.g. 'farmcore.get_*'")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed median slowdown, 0.2 = +20%%")
+    parser.add_argument("--threshold-for", action="append", default=[], metavar="PATTERN=FRACTION")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--supabase", action="store_true", help="use SUPABASE_URL/SUPABASE_KEY instead of the fake backend")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)  # FarmCore/handler INFO lines would dominate the timings
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    client = None
+    if args.supabase:
+        from supabase import create_client
+        client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+        sizes = sizes[:1]
+
+    current = run_suite(sizes, args.repeat, args.only, client)
+    save(args.out, current)
+    print(f"\nResults written to {args.out}")
+
+    if args.save_baseline:
+        save(args.baseline, current)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (use --save-baseline).")
+        return 0
+
+    overrides = {}
+    for item in args.threshold_for:
+        pattern, _, value = item.rpartition("=")
+        overrides[pattern] = float(value)
+    regressions = compare(current, load(args.baseline), args.threshold, overrides)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+# benchmarks/check_plans.py
+"""
+Run:  DATABASE_URL=postgresql://localhost/scratch python -m benchmarks.check_plans [--scale 1] [--verbose]
+
+Applies every migrations/*.sql to the given (local, disposable) Postgres inside one transaction,
+seeds synthetic farmers/crops/harvests/... , runs each FarmCore query (as PostgREST compiles the
+request FarmCore sends; see query_shapes) through EXPLAIN and rolls everything back. Exits with status 1 when a plan contains a sequential scan on
+one of the seeded tables, i.e. a FarmCore query shape is missing its index.
+
+Needs psycopg 3 (pip install "psycopg[binary]"); it is not a runtime dependency of the bot.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterator, List, Tuple
+
+MIGRATIONS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations", "*.sql")))
+
+SEEDED_TABLES = {
+    "farmers", "crops", "harvests", "deliveries", "payments", "expenses", "treatments",
+    "market_prices", "treatment_plans", "crop_ledger",
+}
+
+# Bulk load with plain SQL; farmbot.archiving makes the crop-ledger triggers skip each row
+# (crop_ledger_rebuild fills the ledger once at the end).
+SEED_SQL = """
+set local farmbot.archiving = 'on';
+insert into farmers (telegram_id, name, phone, village, language)
+select 100000 + g, 'Farmer ' || g, '03' || lpad(g::text, 6, '0'), 'Village ' || (g %% 80), case when g %% 3 = 0 then 'en' else 'ar' end
+from generate_series(1, %(farmers)s) g;
+
+insert into crops (farmer_id, name, planting_date, notes)
+select f.id, (array['Tomato', 'Potato', 'Cucumber', 'Olive', 'طماطم', 'بطاطا'])[1 + (g + f.telegram_id::int) %% 6],
+       current_date - ((g * 37 + f.telegram_id::int) %% 700),
+       case when g %% 4 = 0 then 'drip irrigation, sandy soil, row ' || g end
+from farmers f, generate_series(1, %(crops)s) g;
+
+insert into harvests (crop_id, harvest_date, quantity, unit, status)
+select c.id, c.planting_date + 60 + g * 9, 50 + (g * 13) %% 400, 'kg', case when g %% 4 = 0 then 'stored' else 'delivered' end
+from crops c, generate_series(1, %(harvests)s) g;
+
+insert into deliveries (harvest_id, delivery_date, collector_name)
+select h.id, h.harvest_date + 1, 'Collector ' || (h.quantity::int %% 20)
+from harvests h where h.status = 'delivered';
+
+insert into payments (delivery_id, expected_date, expected_amount, paid_amount, paid_date, status)
+select d.id, d.delivery_date + 7, 100000,
+       case when d.delivery_date < current_date - 30 then 100000 end,
+       case when d.delivery_date < current_date - 30 then d.delivery_date + 9 end,
+       case when d.delivery_date < current_date - 30 then 'paid' else 'pending' end
+from deliveries d;
+
+insert into expenses (farmer_id, crop_id, expense_date, category, amount)
+select c.farmer_id, c.id, c.planting_date + g * 11, (array['Seeds', 'Fertilizer', 'Transport', 'Other'])[1 + g %% 4], 25000
+from crops c, generate_series(1, %(expenses)s) g;
+
+insert into treatments (crop_id, treatment_date, product_name, cost, next_due_date, notes)
+select c.id, c.planting_date + g * 10, 'NPK', 20000,
+       case when g = %(expenses)s then current_date + (c.planting_date - date '2000-01-01') %% 30 end,
+       case when g %% 5 = 0 then 'sprayed copper against blight' end
+from crops c, generate_series(1, %(expenses)s) g;
+
+insert into treatment_plans (crop_id, product_name, interval_days, start_date)
+select c.id, 'Fungicide', 10, c.planting_date + 20 from crops c where c.name in ('Tomato', 'طماطم');
+
+insert into market_prices (crop_name, price_date, price_per_kg, source)
+select n, current_date - g, 1000 + g, s
+from unnest(array['Tomato', 'Potato', 'Cucumber', 'Olive']) n, generate_series(0, %(price_days)s) g,
+     unnest(array['admin', 'ministry']) s;
+
+select crop_ledger_rebuild();
+analyze;
+"""
+
+def query_shapes(p: Dict) -> Iterator[Tuple[str, Callable, str, str]]:
+    """
+    (name, FarmCore call, the PostgREST request that call sends, the SQL PostgREST compiles it to).
+    Embeds become lateral subqueries, as PostgREST 12 writes them. SQL parameters use %(name)s.
+    tests/test_query_shapes.py sends every call through the real postgrest client and fails when
+    a request differs from the one written here, or when a call sends a request no shape covers.
+    """
+    fid = p["farmer_id"]
+    yield ("get_farmer", lambda fc: fc.get_farmer(p["telegram_id"]),
+           f"GET farmers?select=*&telegram_id=eq.{p['telegram_id']}&limit=1",
+           "select farmers.* from farmers where farmers.telegram_id = %(telegram_id)s limit 1")
+    yield ("get_farmer_crops", lambda fc: fc.get_farmer_crops(fid),
+           f"GET crops?select=*&farmer_id=eq.{fid}&order=planting_date.asc",
+           "select crops.* from crops where crops.farmer_id = %(farmer_id)s order by crops.planting_date")
+    yield ("get_farmer_crops_page", lambda fc: fc.get_farmer_crops_page(fid, cursor=(p["since"], p["crop_id"])),
+           f"GET crops?select=*&farmer_id=eq.{fid}"
+           f"&or=(planting_date.gt.{p['since']},and(planting_date.eq.{p['since']},id.gt.{p['crop_id']}),planting_date.is.null)"
+           f"&order=planting_date.asc.nullslast,id.asc&limit=50", """
+        select crops.* from crops
+        where crops.farmer_id = %(farmer_id)s
+          and (crops.planting_date > %(since)s or (crops.planting_date = %(since)s and crops.id > %(crop_id)s)
+               or crops.planting_date is null)
+        order by crops.planting_date asc nulls last, crops.id limit 50""")
+    yield ("get_crop_ledger", lambda fc: fc.get_crop_ledger(p["crop_id"]),
+           f"GET crop_ledger?select=*&crop_id=eq.{p['crop_id']}&limit=1",
+           "select crop_ledger.* from crop_ledger where crop_ledger.crop_id = %(crop_id)s limit 1")
+    yield ("get_stored_harvests", lambda fc: fc.get_stored_harvests(fid),
+           f"GET harvests?select=*,crops!inner(*)&crops.farmer_id=eq.{fid}&status=eq.stored", """
+        select harvests.*, row_to_json(harvests_crops_1.*)::jsonb as crops from harvests
+        inner join lateral (
+            select crops_1.* from crops crops_1 where crops_1.id = harvests.crop_id and crops_1.farmer_id = %(farmer_id)s
+        ) harvests_crops_1 on true
+        where harvests.status = 'stored'""")
+    yield ("get_pending_payments", lambda fc: fc.get_pending_payments(fid),
+           f"GET payments?select=*,deliveries!inner(harvests!inner(crops!inner(farmer_id)))"
+           f"&deliveries.harvests.crops.farmer_id=eq.{fid}&status=eq.pending", """
+        select payments.*, row_to_json(payments_deliveries_1.*)::jsonb as deliveries from payments
+        inner join lateral (
+            select row_to_json(deliveries_harvests_2.*)::jsonb as harvests from deliveries deliveries_1
+            inner join lateral (
+                select row_to_json(harvests_crops_3.*)::jsonb as crops from harvests harvests_2
+                inner join lateral (
+                    select crops_3.farmer_id from crops crops_3
+                    where crops_3.id = harvests_2.crop_id and crops_3.farmer_id = %(farmer_id)s
+                ) harvests_crops_3 on true
+                where harvests_2.id = deliveries_1.harvest_id
+            ) deliveries_harvests_2 on true
+            where deliveries_1.id = payments.delivery_id
+        ) payments_deliveries_1 on true
+        where payments.status = 'pending'""")
+    yield ("get_upcoming_treatments", lambda fc: fc.get_upcoming_treatments(fid, days=7),
+           f"GET treatments?select=*,crops!inner(*)&crops.farmer_id=eq.{fid}"
+           f"&next_due_date=gte.{p['today']}&next_due_date=lte.{p['week_ahead']}&order=next_due_date.asc", """
+        select treatments.*, row_to_json(treatments_crops_1.*)::jsonb as crops from treatments
+        inner join lateral (
+            select crops_1.* from crops crops_1 where crops_1.id = treatments.crop_id and crops_1.farmer_id = %(farmer_id)s
+        ) treatments_crops_1 on true
+        where treatments.next_due_date >= %(today)s and treatments.next_due_date <= %(week_ahead)s
+        order by treatments.next_due_date""")
+    yield ("get_treatment_plans", lambda fc: fc.get_treatment_plans(fid, start=p["today"], end=p["week_ahead"]),
+           f"GET treatment_plans?select=*,crops!inner(name,farmer_id)&crops.farmer_id=eq.{fid}"
+           f"&start_date=lte.{p['week_ahead']}&or=(end_date.is.null,end_date.gte.{p['today']})&order=start_date.asc", """
+        select treatment_plans.*, row_to_json(treatment_plans_crops_1.*)::jsonb as crops from treatment_plans
+        inner join lateral (
+            select crops_1.name, crops_1.farmer_id from crops crops_1
+            where crops_1.id = treatment_plans.crop_id and crops_1.farmer_id = %(farmer_id)s
+        ) treatment_plans_crops_1 on true
+        where treatment_plans.start_date <= %(week_ahead)s
+          and (treatment_plans.end_date is null or treatment_plans.end_date >= %(today)s)
+        order by treatment_plans.start_date""")
+    yield ("get_weekly_summary.harvests", lambda fc: fc.get_weekly_summary(fid),
+           f"GET harvests?select=*,crops!inner(*)&crops.farmer_id=eq.{fid}"
+           f"&harvest_date=gte.{p['week_ago']}&harvest_date=lte.{p['today']}", """
+        select harvests.*, row_to_json(harvests_crops_1.*)::jsonb as crops from harvests
+        inner join lateral (
+            select crops_1.* from crops crops_1 where crops_1.id = harvests.crop_id and crops_1.farmer_id = %(farmer_id)s
+        ) harvests_crops_1 on true
+        where harvests.harvest_date >= %(week_ago)s and harvests.harvest_date <= %(today)s""")
+    yield ("get_weekly_summary.expenses", lambda fc: fc.get_weekly_summary(fid),
+           f"GET expenses?select=*&farmer_id=eq.{fid}&expense_date=gte.{p['week_ago']}&expense_date=lte.{p['today']}", """
+        select expenses.* from expenses
+        where expenses.farmer_id = %(farmer_id)s and expenses.expense_date >= %(week_ago)s and expenses.expense_date <= %(today)s""")
+    yield ("get_records_page.harvests", lambda fc: fc.get_records_page("harvests", fid),
+           f"GET harvests?select=*,crops!inner(name,farmer_id)&crops.farmer_id=eq.{fid}&order=harvest_date.asc.nullslast,id.asc&limit=100", """
+        select harvests.*, row_to_json(harvests_crops_1.*)::jsonb as crops from harvests
+        inner join lateral (
+            select crops_1.name, crops_1.farmer_id from crops crops_1
+            where crops_1.id = harvests.crop_id and crops_1.farmer_id = %(farmer_id)s
+        ) harvests_crops_1 on true
+        order by harvests.harvest_date asc nulls last, harvests.id limit 100""")
+    yield ("get_records_page.deliveries", lambda fc: fc.get_records_page("deliveries", fid),
+           f"GET deliveries?select=*,harvests!inner(quantity,unit,crops!inner(name,farmer_id))"
+           f"&harvests.crops.farmer_id=eq.{fid}&order=delivery_date.asc.nullslast,id.asc&limit=100", """
+        select deliveries.*, row_to_json(deliveries_harvests_1.*)::jsonb as harvests from deliveries
+        inner join lateral (
+            select harvests_1.quantity, harvests_1.unit, row_to_json(harvests_crops_2.*)::jsonb as crops from harvests harvests_1
+            inner join lateral (
+                select crops_2.name, crops_2.farmer_id from crops crops_2
+                where crops_2.id = harvests_1.crop_id and crops_2.farmer_id = %(farmer_id)s
+            ) harvests_crops_2 on true
+            where harvests_1.id = deliveries.harvest_id
+        ) deliveries_harvests_1 on true
+        order by deliveries.delivery_date asc nulls last, deliveries.id limit 100""")
+    yield ("get_records_page.payments", lambda fc: fc.get_records_page("payments", fid),
+           f"GET payments?select=*,deliveries!inner(harvests!inner(quantity,harvest_date,crop_id,crops!inner(name,farmer_id)))"
+           f"&deliveries.harvests.crops.farmer_id=eq.{fid}&order=expected_date.asc.nullslast,id.asc&limit=100", """
+        select payments.*, row_to_json(payments_deliveries_1.*)::jsonb as deliveries from payments
+        inner join lateral (
+            select row_to_json(deliveries_harvests_2.*)::jsonb as harvests from deliveries deliveries_1
+            inner join lateral (
+                select harvests_2.quantity, harvests_2.harvest_date, harvests_2.crop_id,
+                       row_to_json(harvests_crops_3.*)::jsonb as crops from harvests harvests_2
+                inner join lateral (
+                    select crops_3.name, crops_3.farmer_id from crops crops_3
+                    where crops_3.id = harvests_2.crop_id and crops_3.farmer_id = %(farmer_id)s
+                ) harvests_crops_3 on true
+                where harvests_2.id = deliveries_1.harvest_id
+            ) deliveries_harvests_2 on true
+            where deliveries_1.id = payments.delivery_id
+        ) payments_deliveries_1 on true
+        order by payments.expected_date asc nulls last, payments.id limit 100""")
+    yield ("get_records_page.expenses", lambda fc: fc.get_records_page("expenses", fid, start_date=p["since"]),
+           f"GET expenses?select=*,crops(name)&farmer_id=eq.{fid}&expense_date=gte.{p['since']}&order=expense_date.asc.nullslast,id.asc&limit=100", """
+        select expenses.*, row_to_json(expenses_crops_1.*)::jsonb as crops from expenses
+        left join lateral (
+            select crops_1.name from crops crops_1 where crops_1.id = expenses.crop_id
+        ) expenses_crops_1 on true
+        where expenses.farmer_id = %(farmer_id)s and expenses.expense_date >= %(since)s
+        order by expenses.expense_date asc nulls last, expenses.id limit 100""")
+    yield ("get_records_page.treatments", lambda fc: fc.get_records_page("treatments", fid, crop_id=p["crop_id"]),
+           f"GET treatments?select=*,crops!inner(name,farmer_id)&crops.farmer_id=eq.{fid}&crop_id=eq.{p['crop_id']}"
+           f"&order=treatment_date.asc.nullslast,id.asc&limit=100", """
+        select treatments.*, row_to_json(treatments_crops_1.*)::jsonb as crops from treatments
+        inner join lateral (
+            select crops_1.name, crops_1.farmer_id from crops crops_1
+            where crops_1.id = treatments.crop_id and crops_1.farmer_id = %(farmer_id)s
+        ) treatments_crops_1 on true
+        where treatments.crop_id = %(crop_id)s
+        order by treatments.treatment_date asc nulls last, treatments.id limit 100""")
+    yield ("get_market_prices", lambda fc: fc.get_market_prices(),
+           "GET market_prices?select=*&order=price_date.desc&limit=10",
+           "select market_prices.* from market_prices order by market_prices.price_date desc limit 10")
+    yield ("get_market_prices(crop)", lambda fc: fc.get_market_prices("Tomato"),
+           "GET market_prices?select=*&order=price_date.desc&limit=10&crop_name=eq.Tomato", """
+        select market_prices.* from market_prices where market_prices.crop_name = 'Tomato'
+        order by market_prices.price_date desc limit 10""")
+    yield ("get_farmers_growing_page", lambda fc: fc.get_farmers_growing_page(["Tomato", "طماطم"]),
+           'GET farmers?select=id,telegram_id,language,crops!inner(name)'
+           '&crops.or=(name.ilike."Tomato",name.ilike."طماطم")&order=id.asc&limit=200', """
+        select farmers.id, farmers.telegram_id, farmers.language, farmers_crops_1.crops from farmers
+        left join lateral (
+            select json_agg(crops_1.*)::jsonb as crops from (
+                select crops.name from crops
+                where crops.farmer_id = farmers.id and (crops.name ilike 'Tomato' or crops.name ilike 'طماطم')
+            ) crops_1
+        ) farmers_crops_1 on true
+        where farmers_crops_1.crops is not null
+        order by farmers.id limit 200""")
+    # an rpc: the shape is the query inside search_notes() (migration 007)
+    yield ("search_notes.crops", lambda fc: fc.search_notes(fid, "irrigation"),
+           "POST rpc/search_notes?", """
+        select c.id from crops c
+        where c.farmer_id = %(farmer_id)s and c.notes is not null
+          and ('irrigation' <%% farmbot_normalize(c.notes) or farmbot_normalize(c.notes) like '%%irrigation%%')""")
+
+def seq_scans(plan: Dict) -> List[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in SEEDED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.check_plans")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"), help="local Postgres (default: $DATABASE_URL)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the number of seeded farmers")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("pass --dsn or set DATABASE_URL")
+    try:
+        import psycopg
+    except ImportError:
+        print('psycopg is required: pip install "psycopg[binary]"', file=sys.stderr)
+        return 2
+
+    sizes = {"farmers": max(50, int(3000 * args.scale)), "crops": 8, "harvests": 6, "expenses": 6, "price_days": 1500}
+    failures = []
+    with psycopg.connect(args.dsn) as conn:
+        cur = psycopg.ClientCursor(conn)
+        try:
+            # stand-in for the publication Supabase creates (migrations 005/008 add tables to it)
+            cur.execute("""
+                do $$ begin
+                    if not exists (select 1 from pg_publication where pubname = 'supabase_realtime') then
+                        create publication supabase_realtime;
+                    end if;
+                end $$""")
+            for path in MIGRATIONS:
+                with open(path, encoding="utf-8") as f:
+                    cur.execute(f.read())
+            print(f"Applied {len(MIGRATIONS)} migrations; seeding {sizes['farmers']} farmers...")
+            cur.execute(SEED_SQL, sizes)
+
+            cur.execute("select c.farmer_id, f.telegram_id, c.id, c.planting_date from crops c join farmers f on f.id = c.farmer_id "
+                        "order by c.id limit 1 offset %(offset)s", {"offset": sizes["farmers"] * 2})
+            farmer_id, telegram_id, crop_id, planted = cur.fetchone()
+            today = date.today()
+            params = {
+                "farmer_id": farmer_id, "telegram_id": telegram_id, "crop_id": crop_id, "since": planted,
+                "today": today, "week_ago": today - timedelta(days=7), "week_ahead": today + timedelta(days=7),
+            }
+            for name, _call, _request, sql in query_shapes(params):
+                cur.execute("explain (format json) " + sql, params)
+                plan = cur.fetchone()[0]
+                plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+                scans = seq_scans(plan)
+                status = "SEQ SCAN on " + ", ".join(sorted(set(scans))) if scans else "ok"
+                print(f"{name:<32} {status}   (cost {plan['Total Cost']:.0f})")
+                if args.verbose or scans:
+                    cur.execute("explain " + sql, params)
+                    print("    " + "\n    ".join(r[0] for r in cur.fetchall()))
+                if scans:
+                    failures.append(name)
+        finally:
+            conn.rollback()  # nothing is kept: schema, data and statistics go away
+
+    if failures:
+        print(f"\n{len(failures)} query shape(s) fall back to sequential scans: {', '.join(failures)}")
+        return 1
+    print("\nEvery FarmCore query shape uses an index.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
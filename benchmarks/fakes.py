@@ -0,0 +1,356 @@
+# benchmarks/fakes.py
+"""
+In-memory stand-ins for the Supabase client and the Telegram objects handlers touch.
+
+FakeSupabase implements the subset of the postgrest query builder FarmCore uses (select with
+embedded resources, eq/gt/gte/lt/lte/or_, order, limit, insert/update/upsert/delete), resolving
+embeds through the foreign keys in FOREIGN_KEYS. It is a benchmarking backend, not a Postgres
+emulator: there are no indexes, so timings show how work scales with data size, not DB latency.
+"""
+import random
+import re
+import uuid
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# child table -> {parent table: fk column}
+FOREIGN_KEYS = {
+    "crops": {"farmers": "farmer_id"},
+    "harvests": {"crops": "crop_id"},
+    "deliveries": {"harvests": "harvest_id"},
+    "payments": {"deliveries": "delivery_id"},
+    "expenses": {"farmers": "farmer_id", "crops": "crop_id"},
+    "treatments": {"crops": "crop_id"},
+    "treatment_plans": {"crops": "crop_id"},
+    "crop_ledger": {"crops": "crop_id"},
+}
+
+def _split_top(text: str, sep: str = ","):
+    """Split on sep outside parentheses and double quotes."""
+    parts, depth, quoted, cur = [], 0, False, ""
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append(cur.strip())
+            cur = ""
+        else:
+            cur += ch
+    if cur.strip():
+        parts.append(cur.strip())
+    return parts
+
+def _parse_select(select: str):
+    """'*, crops!inner(name)' -> (columns, [(relation, inner, sub_select)])"""
+    columns, embeds = [], []
+    for token in _split_top(select or "*"):
+        m = re.match(r"^(\w+)(!inner)?\((.*)\)$", token, re.S)
+        if m:
+            embeds.append((m.group(1), bool(m.group(2)), m.group(3)))
+        else:
+            columns.append(token)
+    return columns, embeds
+
+def _coerce(row_value, value):
+    if isinstance(row_value, bool) or row_value is None:
+        return value
+    if isinstance(row_value, (int, float)) and not isinstance(value, (int, float)):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return value
+    if isinstance(row_value, str) and not isinstance(value, str):
+        return str(value)
+    return value
+
+def _compare(op: str, row_value, value) -> bool:
+    if op == "ilike":
+        pattern = "^" + re.escape(str(value).strip('"')).replace("%", ".*") + "$"
+        return row_value is not None and re.match(pattern, str(row_value), re.I) is not None
+    if op == "not":  # col.not.is.null -> ("not", "is.null")
+        inner_op, _, inner_value = str(value).partition(".")
+        return not _compare(inner_op, row_value, inner_value)
+    if op == "is":
+        return row_value is None if str(value) == "null" else row_value == value
+    if row_value is None:
+        return False
+    value = _coerce(row_value, value)
+    try:
+        return {
+            "eq": row_value == value, "neq": row_value != value,
+            "gt": row_value > value, "gte": row_value >= value,
+            "lt": row_value < value, "lte": row_value <= value,
+        }[op]
+    except TypeError:
+        return False
+
+def _parse_or(text: str):
+    """postgrest or/and filter text -> nested ('or'|'and', [...]) / (column, op, value) tree."""
+    conds = []
+    for part in _split_top(text):
+        m = re.match(r"^(and|or)\((.*)\)$", part, re.S)
+        if m:
+            conds.append((m.group(1), _parse_or(m.group(2))[1]))
+        else:
+            col, op, value = part.split(".", 2)
+            conds.append((col, op, value))
+    return ("or", conds)
+
+class FakeTable:
+    def __init__(self, db: "FakeSupabase", name: str):
+        self.db = db
+        self.name = name
+        self._select = "*"
+        self._filters = []       # (path, op, value)
+        self._or = []            # (tree, reference_table)
+        self._order = []
+        self._limit = None
+        self._action = "select"
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+
+    # --- builder ---
+    def select(self, columns: str = "*", **_):
+        self._select = columns
+        return self
+
+    def _filter(self, path, op, value):
+        self._filters.append((path, op, value))
+        return self
+
+    def eq(self, column, value): return self._filter(column, "eq", value)
+    def neq(self, column, value): return self._filter(column, "neq", value)
+    def gt(self, column, value): return self._filter(column, "gt", value)
+    def gte(self, column, value): return self._filter(column, "gte", value)
+    def lt(self, column, value): return self._filter(column, "lt", value)
+    def lte(self, column, value): return self._filter(column, "lte", value)
+    def ilike(self, column, value): return self._filter(column, "ilike", value)
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        self._or.append((_parse_or(filters), reference_table))
+        return self
+
+    def order(self, column: str, desc: bool = False, **_):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int, **_):
+        self._limit = size
+        return self
+
+    def insert(self, rows, **_):
+        self._action, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = "", ignore_duplicates: bool = False, **_):
+        self._action, self._payload = "upsert", rows
+        self._on_conflict = [c.strip() for c in on_conflict.split(",") if c.strip()] or ["id"]
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, data, **_):
+        self._action, self._payload = "update", data
+        return self
+
+    def delete(self, **_):
+        self._action = "delete"
+        return self
+
+    # --- evaluation ---
+    def _related(self, table: str, row: Dict[str, Any], relation: str):
+        """Many-to-one (row holds the fk) -> dict or None; one-to-many -> list."""
+        fk = FOREIGN_KEYS.get(table, {}).get(relation)
+        if fk:
+            return self.db.by_id(relation, row.get(fk))
+        back = FOREIGN_KEYS.get(relation, {}).get(table)
+        if back:
+            return [r for r in self.db.tables.get(relation, []) if r.get(back) == row.get("id")]
+        raise ValueError(f"no relationship between {table} and {relation}")
+
+    def _values(self, table: str, row, path: List[str]):
+        if len(path) == 1:
+            return [row.get(path[0])]
+        related = self._related(table, row, path[0])
+        items = related if isinstance(related, list) else [related] if related else []
+        out = []
+        for item in items:
+            out.extend(self._values(path[0], item, path[1:]))
+        return out
+
+    def _match(self, table, row, path: str, op: str, value) -> bool:
+        return any(_compare(op, v, value) for v in self._values(table, row, path.split(".")))
+
+    def _eval_tree(self, table, row, node) -> bool:
+        if len(node) == 2:
+            kind = node[0]
+            results = (self._eval_tree(table, row, child) for child in node[1])
+            return any(results) if kind == "or" else all(results)
+        return self._match(table, row, node[0], node[1], node[2])
+
+    def _passes(self, row) -> bool:
+        for path, op, value in self._filters:
+            if not self._match(self.name, row, path, op, value):
+                return False
+        for tree, reference in self._or:
+            if reference:
+                related = self._related(self.name, row, reference)
+                items = related if isinstance(related, list) else [related] if related else []
+                if not any(self._eval_tree(reference, item, tree) for item in items):
+                    return False
+            elif not self._eval_tree(self.name, row, tree):
+                return False
+        return True
+
+    def _project(self, table, row, select: str):
+        columns, embeds = _parse_select(select)
+        out = dict(row) if "*" in columns else {c: row.get(c) for c in columns}
+        for relation, inner, sub in embeds:
+            related = self._related(table, row, relation)
+            if isinstance(related, list):
+                value = [self._project(relation, r, sub) for r in related]
+                if inner and not value:
+                    return None
+            else:
+                value = self._project(relation, related, sub) if related else None
+                if inner and value is None:
+                    return None
+            out[relation] = value
+        return out
+
+    def _matching(self):
+        return [r for r in self.db.tables.setdefault(self.name, []) if self._passes(r)]
+
+    def execute(self):
+        rows = self.db.tables.setdefault(self.name, [])
+        if self._action == "insert":
+            data = [self.db.add(self.name, r) for r in (self._payload if isinstance(self._payload, list) else [self._payload])]
+        elif self._action == "upsert":
+            data = []
+            for r in (self._payload if isinstance(self._payload, list) else [self._payload]):
+                key = tuple(r.get(c) for c in self._on_conflict)
+                existing = next((x for x in rows if tuple(x.get(c) for c in self._on_conflict) == key and None not in key), None)
+                if existing is None:
+                    data.append(self.db.add(self.name, r))
+                elif not self._ignore_duplicates:
+                    existing.update(r)
+                    data.append(dict(existing))
+        elif self._action == "update":
+            data = []
+            for r in self._matching():
+                r.update(self._payload)
+                data.append(dict(r))
+        elif self._action == "delete":
+            data = self._matching()
+            for r in data:
+                rows.remove(r)
+                self.db.index.pop((self.name, r.get("id")), None)
+        else:
+            data = [p for p in (self._project(self.name, r, self._select) for r in self._matching()) if p is not None]
+            for column, desc in reversed(self._order):
+                data.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            if self._limit is not None:
+                data = data[: self._limit]
+        self.db.requests += 1
+        return SimpleNamespace(data=data)
+
+class FakeSupabase:
+    """Drop-in for supabase.Client in FarmCore(client=...)."""
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.index: Dict[tuple, Dict[str, Any]] = {}
+        self.requests = 0
+
+    def table(self, name: str) -> FakeTable:
+        return FakeTable(self, name)
+
+    def add(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(row)
+        row.setdefault("id", str(uuid.uuid4()))
+        self.tables.setdefault(table, []).append(row)
+        self.index[(table, row["id"])] = row
+        return dict(row)
+
+    def by_id(self, table: str, row_id):
+        return self.index.get((table, row_id)) if row_id is not None else None
+
+def seed(db: FakeSupabase, farmers: int, crops_per_farmer: int, rng: Optional[random.Random] = None) -> List[Dict[str, Any]]:
+    """
+    Fill db with `farmers` farmers, each with crops_per_farmer crops and, per crop, three recent
+    harvests (one delivered with a pending payment), two expenses and a treatment due soon.
+    Returns the farmer rows.
+    """
+    rng = rng or random.Random(42)
+    today = date.today()
+    names = ["Tomato", "Potato", "Cucumber", "Olive", "Wheat", "طماطم", "بطاطا", "خيار"]
+    out = []
+    for f in range(farmers):
+        farmer = db.add("farmers", {"telegram_id": 1000 + f, "name": f"Farmer {f}", "phone": "03000000",
+                                    "village": "Zahle", "language": "ar" if f % 2 else "en"})
+        out.append(farmer)
+        for c in range(crops_per_farmer):
+            crop = db.add("crops", {"farmer_id": farmer["id"], "name": rng.choice(names),
+                                    "planting_date": (today - timedelta(days=rng.randint(20, 400))).isoformat(),
+                                    "notes": "seeded crop " * rng.randint(0, 12)})
+            for h in range(3):
+                delivered = h == 0
+                harvest = db.add("harvests", {"crop_id": crop["id"], "harvest_date": (today - timedelta(days=rng.randint(0, 13))).isoformat(),
+                                              "quantity": rng.randint(10, 500), "unit": "kg", "notes": None,
+                                              "status": "delivered" if delivered else "stored"})
+                if delivered:
+                    delivery = db.add("deliveries", {"harvest_id": harvest["id"], "delivery_date": harvest["harvest_date"],
+                                                     "collector_name": "Abu Ali", "market": None})
+                    db.add("payments", {"delivery_id": delivery["id"], "expected_date": (today + timedelta(days=7)).isoformat(),
+                                        "expected_amount": rng.randint(100, 5000) * 1000, "status": "pending"})
+            for _ in range(2):
+                db.add("expenses", {"farmer_id": farmer["id"], "crop_id": crop["id"], "category": rng.choice(["Seeds", "Fertilizer", "Labor"]),
+                                    "amount": rng.randint(1, 100) * 10000, "expense_date": (today - timedelta(days=rng.randint(0, 30))).isoformat()})
+            db.add("treatments", {"crop_id": crop["id"], "treatment_date": (today - timedelta(days=3)).isoformat(),
+                                  "product_name": "Copper", "cost": 50000, "next_due_date": (today + timedelta(days=rng.randint(0, 6))).isoformat()})
+    for n in names:
+        db.add("market_prices", {"crop_name": n, "price_date": today.isoformat(), "price_per_kg": rng.randint(10, 90) * 1000, "source": "admin"})
+    return out
+
+# ----------------------
+# Telegram fakes
+# ----------------------
+class FakeMessage:
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.sent: List[str] = []
+
+    async def reply_text(self, text, **_):
+        self.sent.append(text)
+        return self
+
+    async def edit_text(self, text, **_):
+        self.sent.append(text)
+        return self
+
+class FakeCallbackQuery:
+    def __init__(self, user, data: str, message: FakeMessage):
+        self.from_user = user
+        self.data = data
+        self.message = message
+
+    async def answer(self, *_, **__):
+        return True
+
+    async def edit_message_text(self, text, **_):
+        self.message.sent.append(text)
+
+def make_update(telegram_id: int, text: str = "", callback_data: Optional[str] = None):
+    user = SimpleNamespace(id=telegram_id, first_name="Bench")
+    message = FakeMessage(text)
+    query = FakeCallbackQuery(user, callback_data, message) if callback_data else None
+    return SimpleNamespace(effective_user=user, message=None if query else message, callback_query=query,
+                           effective_message=message, update_id=random.randint(1, 1 << 30))
+
+def make_context():
+    return SimpleNamespace(user_data={}, chat_data={}, args=[], bot=None, application=None)
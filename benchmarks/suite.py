@@ -0,0 +1,149 @@
+# benchmarks/suite.py
+import asyncio
+import fnmatch
+import json
+import platform
+import statistics
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+import core_singleton
+from farmcore import FarmCore
+from benchmarks.fakes import FakeSupabase, make_context, make_update, seed
+
+FARMERS = 20  # farmers in the backend; every size is "crops per farmer"
+
+def _clear_caches(core: FarmCore) -> None:
+    # measure the backend round trip, not a TTL cache hit
+    for cache in core.caches.values():
+        cache.invalidate()
+
+def _time(fn: Callable[[], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+        "runs": repeat,
+    }
+
+def build_backend(size: int, client=None):
+    """FarmCore over a freshly seeded in-memory backend (or over `client`, already seeded)."""
+    if client is None:
+        client = FakeSupabase()
+        farmers = seed(client, FARMERS, size)
+    else:
+        farmers = client.table("farmers").select("*").limit(FARMERS).execute().data
+    core = FarmCore(client=client)
+    return core, farmers
+
+def farmcore_cases(core: FarmCore, farmer: Dict) -> Dict[str, Callable[[], object]]:
+    stored = core.get_stored_harvests(farmer["id"])
+    harvest_ids = [h["id"] for h in stored] or [None]
+    counter = {"i": 0}
+
+    def record_delivery():
+        # cycle through stored harvests; the fake backend does not enforce one delivery per harvest
+        counter["i"] += 1
+        core.record_delivery(harvest_ids[counter["i"] % len(harvest_ids)], date.today(), collector_name="Bench")
+
+    def uncached(fn):
+        def run():
+            _clear_caches(core)
+            return fn()
+        return run
+
+    return {
+        "get_farmer": uncached(lambda: core.get_farmer(farmer["telegram_id"])),
+        "get_farmer_crops": uncached(lambda: core.get_farmer_crops(farmer["id"])),
+        "get_pending_payments": lambda: core.get_pending_payments(farmer["id"]),
+        "get_weekly_summary": lambda: core.get_weekly_summary(farmer["id"]),
+        "record_delivery": record_delivery,
+    }
+
+def handler_cases(core: FarmCore, farmer: Dict) -> Dict[str, Callable[[], object]]:
+    """Full handler runs with fake Telegram objects; the backend is in memory, so this is mostly rendering."""
+    from aboutcrop import _send_crops_page
+    from aboutmoney import pending_payments, weekly_summary
+
+    core_singleton.farm_core = core
+    loop = asyncio.new_event_loop()
+
+    def run(handler):
+        def call():
+            update = make_update(farmer["telegram_id"], text="bench")
+            loop.run_until_complete(handler(update, make_context()))
+            return update.message.sent
+        return call
+
+    return {
+        "_send_crops_page": run(_send_crops_page),
+        "weekly_summary": run(weekly_summary),
+        "pending_payments": run(pending_payments),
+    }
+
+# cases that change the backend; every case gets its own freshly seeded fake backend, and with a
+# shared (Supabase) backend these run after the read-only cases so no read sees their writes
+MUTATING = ("farmcore.record_delivery",)
+
+def build_cases(size: int, client=None) -> Dict[str, Callable[[], object]]:
+    core, farmers = build_backend(size, client)
+    farmer = farmers[len(farmers) // 2]
+    cases = {f"farmcore.{k}": v for k, v in farmcore_cases(core, farmer).items()}
+    cases.update({f"handler.{k}": v for k, v in handler_cases(core, farmer).items()})
+    return cases
+
+def run_suite(sizes: List[int], repeat: int, only: Optional[str] = None, client=None) -> Dict:
+    results = {}
+    for size in sizes:
+        shared = build_cases(size, client)
+        names = sorted(shared, key=lambda n: n in MUTATING)  # stable: read-only cases keep their order
+        for name in names:
+            key = f"{name}[crops={size}]"
+            if only and not fnmatch.fnmatch(key, only):
+                continue
+            # the seed is deterministic, so every case measures the same dataset regardless of run order
+            fn = shared[name] if client is not None else build_cases(size)[name]
+            results[key] = _time(fn, repeat)
+            print(f"{key:<48} median {results[key]['median_ms']:>9.3f} ms   p95 {results[key]['p95_ms']:>9.3f} ms")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "farmers": FARMERS,
+            "sizes": sizes,
+            "repeat": repeat,
+            "backend": "fake" if client is None else "supabase",
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def compare(current: Dict, baseline: Dict, threshold: float, overrides: Dict[str, float]) -> List[str]:
+    """Return one line per benchmark whose median regressed past its threshold (fraction, 0.2 = +20%)."""
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if not base or not base.get("median_ms"):
+            continue
+        limit = next((t for pattern, t in overrides.items() if fnmatch.fnmatch(key, pattern)), threshold)
+        change = result["median_ms"] / base["median_ms"] - 1
+        if change > limit:
+            regressions.append(f"{key}: {base['median_ms']:.3f} -> {result['median_ms']:.3f} ms (+{change:.0%}, limit +{limit:.0%})")
+    return regressions
+
+def load(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save(path: str, data: Dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
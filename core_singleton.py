@@ -1,13 +1,18 @@
 # core_singleton.py
 import logging
-from typing import Optional
-from farmcore import FarmCore
+from typing import TYPE_CHECKING, Optional
+
+# farmcore pulls in the Supabase SDK; it is imported on first init so importing this module stays cheap
+if TYPE_CHECKING:
+    from farmcore import FarmCore
+    from outbox import WriteOutbox
 
 logger = logging.getLogger("core_singleton")
 
-farm_core: Optional[FarmCore] = None
+farm_core: Optional["FarmCore"] = None
+outbox: Optional["WriteOutbox"] = None
 
-def init_farm_core(supabase_url: str = None, supabase_key: str = None) -> FarmCore:
+def init_farm_core(supabase_url: str = None, supabase_key: str = None) -> "FarmCore":
     """
     Lazily initialize and return the global FarmCore instance.
     If FarmCore construction fails, this function will raise the underlying exception.
@@ -16,6 +21,7 @@ def init_farm_core(supabase_url: str = None, supabase_key: str = None) -> FarmCo
     if farm_core is not None:
         return farm_core
 
+    from farmcore import FarmCore
     try:
         farm_core = FarmCore(supabase_url=supabase_url, supabase_key=supabase_key)
         logger.info("core_singleton: FarmCore instance created")
@@ -25,7 +31,7 @@ def init_farm_core(supabase_url: str = None, supabase_key: str = None) -> FarmCo
         farm_core = None
         raise
 
-def get_farm_core() -> FarmCore:
+def get_farm_core() -> "FarmCore":
     """
     Return the initialized FarmCore instance.
     Raises RuntimeError if it is not yet initialized.
@@ -35,6 +41,20 @@ def get_farm_core() -> FarmCore:
         raise RuntimeError("FarmCore is not initialized yet. Call init_farm_core() first (usually in main.on_startup).")
     return farm_core
 
+def init_outbox(path: str) -> "WriteOutbox":
+    """Open (or reuse) the global write-behind outbox stored at `path`."""
+    global outbox
+    if outbox is None:
+        from outbox import WriteOutbox
+        outbox = WriteOutbox(path)
+    return outbox
+
+def get_outbox() -> "WriteOutbox":
+    """Return the initialized WriteOutbox. Raises RuntimeError if init_outbox() was not called."""
+    if outbox is None:
+        raise RuntimeError("Outbox is not initialized yet. Call init_outbox() first (usually in main.on_startup).")
+    return outbox
+
 
 
 
@@ -0,0 +1,92 @@
+# dedup.py
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger("dedup")
+
+DEDUP_WINDOW = 3600        # seconds; Telegram gives up redelivering well before this
+DEDUP_MAX_ENTRIES = 50000  # memory bound for the in-process set
+PRUNE_EVERY = 500          # prune the shared table every N claims
+BUSY_TIMEOUT = 0.1         # seconds to wait on a locked shared table; claim() runs on the event loop
+
+class UpdateDeduplicator:
+    """
+    Time-windowed, bounded set of seen Telegram update_ids.
+    claim(update_id) returns True the first time an id is seen and False for redeliveries;
+    release(update_id) undoes a claim when the update could not be enqueued.
+    With `path` set, ids are claimed in a shared SQLite table so every worker on the host
+    agrees on who handles an update; otherwise the set is per process. A shared table that
+    stays locked longer than BUSY_TIMEOUT fails open to the in-process claim.
+    """
+
+    def __init__(self, window: float = DEDUP_WINDOW, max_entries: int = DEDUP_MAX_ENTRIES, path: Optional[str] = None):
+        self.window = window
+        self.max_entries = max_entries
+        self.duplicates = 0
+        self._seen: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._claims = 0
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=BUSY_TIMEOUT)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS seen_updates (update_id INTEGER PRIMARY KEY, seen_at REAL NOT NULL)")
+            logger.info("Update dedup shared through %s", path)
+
+    def _claim_local(self, update_id: int, now: float) -> bool:
+        # expire from the oldest end, then enforce the size bound
+        while self._seen:
+            oldest_id, seen_at = next(iter(self._seen.items()))
+            if now - seen_at <= self.window and len(self._seen) < self.max_entries:
+                break
+            self._seen.popitem(last=False)
+        if update_id in self._seen:
+            return False
+        self._seen[update_id] = now
+        return True
+
+    def _claim_shared(self, update_id: int, now: float) -> bool:
+        self._claims += 1
+        if self._claims % PRUNE_EVERY == 0:
+            self._conn.execute("DELETE FROM seen_updates WHERE seen_at < ?", (now - self.window,))
+        cur = self._conn.execute("INSERT OR IGNORE INTO seen_updates (update_id, seen_at) VALUES (?, ?)", (update_id, now))
+        return cur.rowcount == 1
+
+    def claim(self, update_id: int) -> bool:
+        now = time.time()
+        with self._lock:
+            if not self._claim_local(update_id, now):
+                first = False
+            elif self._conn is not None:
+                try:
+                    first = self._claim_shared(update_id, now)
+                except sqlite3.Error:
+                    # the shared store is an optimisation; fall back to this process's view
+                    logger.exception("Shared update dedup failed; using in-process set only")
+                    first = True
+            else:
+                first = True
+            if not first:
+                self.duplicates += 1
+        return first
+
+    def release(self, update_id: int) -> None:
+        """Forget a claimed id whose update could not be handed to the bot, so its redelivery is processed."""
+        with self._lock:
+            self._seen.pop(update_id, None)
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM seen_updates WHERE update_id = ?", (update_id,))
+                except sqlite3.Error:
+                    logger.exception("Could not release update %s in the shared dedup table", update_id)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
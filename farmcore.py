@@ -1,47 +1,145 @@
 # farmcore.py
+import heapq
 import os
-from supabase import create_client, Client
-from datetime import date, timedelta
-from typing import List, Dict, Any, Optional
+import re
+import unicodedata
+from supabase import create_client, Client, ClientOptions
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from dotenv import load_dotenv
 import logging
+from resilience import CALL_TIMEOUT, CircuitBreaker, TTLCache, cap_request_timeout, resilient
 
 # Load .env in case you run locally (harmless on platforms that already provide env vars)
 load_dotenv()
 
 logger = logging.getLogger("farmcore")
 
+# Arabic short vowels / tatweel are dropped and letter variants folded so that
+# "طماطم", "طَماطِم" and "Tomato"/"tomato " compare equal to what farmers typed.
+_ARABIC_MARKS = re.compile(r"[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_FOLD_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+    "،": ",", "؛": ";", "٫": ".",
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+})
+
+def normalize_text(text: Optional[str]) -> str:
+    """Fold case, Arabic letter variants and digits so names can be matched loosely."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _ARABIC_MARKS.sub("", text).translate(_FOLD_MAP).casefold()
+    return " ".join(text.split())
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, (date,)) else value
+
+def canonical_crop_name(name: Optional[str]) -> str:
+    """Display form used when storing shared names (market prices): trimmed, no Arabic marks, Latin title-cased."""
+    name = " ".join(_ARABIC_MARKS.sub("", unicodedata.normalize("NFKC", name or "")).split())
+    return name.title() if name.isascii() else name
+
+def nested(row, *path):
+    """Walk embedded PostgREST objects (dict or single-item list) and return the leaf or None."""
+    cur = row
+    for key in path:
+        if isinstance(cur, list):
+            cur = cur[0] if cur else None
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(key)
+    return cur
+
+# "12.5", "1,200" / "1,200.5" (thousands), "12,5" / "12,50" (decimal comma, 1-2 digits after it)
+_PLAIN_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_THOUSANDS_NUMBER = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?")
+_DECIMAL_COMMA_NUMBER = re.compile(r"\d+,\d{1,2}")
+
+def parse_number(text) -> float:
+    """
+    Read a number typed or uploaded by a farmer (Arabic digits and separators allowed).
+    Raises ValueError for anything else, including commas that are neither a thousands
+    separator nor a decimal comma ("1,2345"), rather than guessing.
+    """
+    text = normalize_text(str(text if text is not None else "")).replace("٬", ",").replace(" ", "")
+    if _PLAIN_NUMBER.fullmatch(text):
+        return float(text)
+    if _THOUSANDS_NUMBER.fullmatch(text):
+        return float(text.replace(",", ""))
+    if _DECIMAL_COMMA_NUMBER.fullmatch(text):
+        return float(text.replace(",", "."))
+    raise ValueError(f"unclear number '{text}'")
+
 class FarmCore:
-    def __init__(self, supabase_url: Optional[str] = None, supabase_key: Optional[str] = None):
+    # record kind -> (table, select, sort/date column, column holding the farmer id)
+    RECORD_SOURCES = {
+        "harvests": ("harvests", "*, crops!inner(name, farmer_id)", "harvest_date", "crops.farmer_id"),
+        "deliveries": ("deliveries", "*, harvests!inner(quantity, unit, crops!inner(name, farmer_id))", "delivery_date", "harvests.crops.farmer_id"),
+        "payments": ("payments", "*, deliveries!inner(harvests!inner(quantity, harvest_date, crop_id, crops!inner(name, farmer_id)))", "expected_date", "deliveries.harvests.crops.farmer_id"),
+        "expenses": ("expenses", "*, crops(name)", "expense_date", "farmer_id"),
+        "treatments": ("treatments", "*, crops!inner(name, farmer_id)", "treatment_date", "crops.farmer_id"),
+    }
+    # cold tier (migration 009); embeds are aliased so rows have the same shape as hot ones
+    ARCHIVE_SOURCES = {
+        "harvests": ("harvests_archive", "*, crops!inner(name, farmer_id)", "harvest_date", "crops.farmer_id"),
+        "deliveries": ("deliveries_archive", "*, harvests:harvests_archive!inner(quantity, unit, crops!inner(name, farmer_id))", "delivery_date", "harvests.crops.farmer_id"),
+        "payments": ("payments_archive", "*, deliveries:deliveries_archive!inner(harvests:harvests_archive!inner(quantity, harvest_date, crop_id, crops!inner(name, farmer_id)))", "expected_date", "deliveries.harvests.crops.farmer_id"),
+        "expenses": ("expenses_archive", "*, crops(name)", "expense_date", "farmer_id"),
+        "treatments": ("treatments_archive", "*, crops!inner(name, farmer_id)", "treatment_date", "crops.farmer_id"),
+    }
+
+    def __init__(self, supabase_url: Optional[str] = None, supabase_key: Optional[str] = None, client: Optional[Client] = None):
         """
         Initialize FarmCore with explicit supabase_url and supabase_key if provided.
         Otherwise fallback to environment variables SUPABASE_URL and SUPABASE_KEY.
+        A ready-made `client` (e.g. the in-memory one in benchmarks/) skips all of that.
         Raises ValueError on missing credentials.
         """
-        supabase_url = supabase_url or os.getenv("SUPABASE_URL")
-        supabase_key = supabase_key or os.getenv("SUPABASE_KEY")
+        if client is not None:
+            self.supabase = client
+        else:
+            supabase_url = supabase_url or os.getenv("SUPABASE_URL")
+            supabase_key = supabase_key or os.getenv("SUPABASE_KEY")
 
-        if not supabase_url or not supabase_key:
-            raise ValueError("Supabase URL and Key must be provided (via args or SUPABASE_URL / SUPABASE_KEY env vars).")
+            if not supabase_url or not supabase_key:
+                raise ValueError("Supabase URL and Key must be provided (via args or SUPABASE_URL / SUPABASE_KEY env vars).")
 
-        # create_client will raise if keys are wrong; allow that to bubble up
-        self.supabase: Client = create_client(supabase_url, supabase_key)
-        logger.info("FarmCore: Supabase client created")
+            # create_client will raise if keys are wrong; allow that to bubble up
+            self.supabase: Client = create_client(
+                supabase_url, supabase_key, options=ClientOptions(postgrest_client_timeout=CALL_TIMEOUT)
+            )
+            # bound every HTTP attempt by what is left of the calling method's CALL_DEADLINE
+            self.supabase.postgrest.session.event_hooks["request"].append(cap_request_timeout)
+            logger.info("FarmCore: Supabase client created")
 
-    # --- DB helper methods (unchanged) ---
+        # shared by every @resilient method; caches may serve stale entries while Supabase is down
+        self.breaker = CircuitBreaker()
+        self.caches = {
+            "farmers": TTLCache(ttl=60, stale_for=3600),
+            "crops": TTLCache(ttl=30, stale_for=3600),
+            "market_prices": TTLCache(ttl=300, stale_for=86400),
+        }
+
+    @resilient()
+    def ping(self) -> None:
+        """Cheapest possible round trip to the database (used by the readiness prober)."""
+        self.supabase.table("farmers").select("id").limit(1).execute()
+
+    # --- DB helper methods ---
+    # None means "no such farmer"; outages raise FarmCoreUnavailable (see resilience.py)
+    @resilient(retry=True, cache="farmers", allow_stale=True)
     def get_farmer(self, telegram_id: int) -> Optional[Dict[str, Any]]:
-        try:
-            response = (
-                self.supabase.table("farmers")
-                .select("*")
-                .eq("telegram_id", telegram_id)
-                .single()
-                .execute()
-            )
-            return response.data
-        except Exception:
-            return None
+        response = (
+            self.supabase.table("farmers")
+            .select("*")
+            .eq("telegram_id", telegram_id)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0] if response.data else None
 
+    @resilient()
     def create_farmer(
         self,
         telegram_id: int,
@@ -58,20 +156,28 @@ class FarmCore:
             "language": language,
         }
         response = self.supabase.table("farmers").insert(farmer_data).execute()
+        self.caches["farmers"].invalidate("get_farmer", telegram_id)
         return response.data[0] if response.data else None
 
-    def add_crop(
-        self, farmer_id: str, name: str, planting_date: date, notes: str = None
-    ) -> Dict[str, Any]:
-        crop_data = {
+    @staticmethod
+    def crop_row(farmer_id: str, name: str, planting_date: date, notes: str = None) -> Dict[str, Any]:
+        return {
             "farmer_id": farmer_id,
             "name": name,
-            "planting_date": planting_date.isoformat() if isinstance(planting_date, (date,)) else planting_date,
+            "planting_date": _iso(planting_date),
             "notes": notes,
         }
+
+    @resilient()
+    def add_crop(
+        self, farmer_id: str, name: str, planting_date: date, notes: str = None
+    ) -> Dict[str, Any]:
+        crop_data = self.crop_row(farmer_id, name, planting_date, notes)
         response = self.supabase.table("crops").insert(crop_data).execute()
+        self.caches["crops"].invalidate("get_farmer_crops", farmer_id)
         return response.data[0] if response.data else None
 
+    @resilient(retry=True, cache="crops", allow_stale=True)
     def get_farmer_crops(self, farmer_id: str) -> List[Dict[str, Any]]:
         response = (
             self.supabase.table("crops")
@@ -82,6 +188,24 @@ class FarmCore:
         )
         return response.data or []
 
+    @resilient(retry=True)
+    def get_farmer_crops_page(self, farmer_id: str, cursor: Optional[Tuple[Any, Any]] = None, limit: int = 50, backward: bool = False) -> List[Dict[str, Any]]:
+        """One page of crops ordered by (planting_date, id); ask for page size + 1 to learn if more exist."""
+        query = self.supabase.table("crops").select("*").eq("farmer_id", farmer_id)
+        return self._keyset_page(query, "planting_date", cursor=cursor, limit=limit, backward=backward)
+
+    @resilient(retry=True)
+    def get_crop(self, crop_id: str) -> Optional[Dict[str, Any]]:
+        response = self.supabase.table("crops").select("*").eq("id", crop_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    @resilient(retry=True)
+    def get_crop_ledger(self, crop_id: str) -> Optional[Dict[str, Any]]:
+        """Running totals for a crop (cost, harvested/delivered qty, paid amount), kept by DB triggers."""
+        response = self.supabase.table("crop_ledger").select("*").eq("crop_id", crop_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    @resilient(retry=True)
     def update_crop(self, crop_id: str, **updates) -> Optional[Dict[str, Any]]:
         if not updates:
             return None
@@ -93,8 +217,10 @@ class FarmCore:
             .eq("id", crop_id)
             .execute()
         )
+        self.caches["crops"].invalidate("get_farmer_crops")
         return response.data[0] if response.data else None
 
+    @resilient(retry=True)
     def delete_crop(self, crop_id: str) -> bool:
         response = (
             self.supabase.table("crops")
@@ -102,20 +228,36 @@ class FarmCore:
             .eq("id", crop_id)
             .execute()
         )
+        self.caches["crops"].invalidate("get_farmer_crops")
         return bool(response.data)
 
-    def record_harvest(self, crop_id: str, harvest_date: date, quantity: float, unit: str = "kg", notes: str = None, status: str = "stored") -> Dict[str, Any]:
-        harvest_data = {
+    @staticmethod
+    def harvest_row(crop_id: str, harvest_date: date = None, quantity: float = None, unit: str = "kg", notes: str = None, status: str = "stored") -> Dict[str, Any]:
+        return {
             "crop_id": crop_id,
-            "harvest_date": harvest_date.isoformat(),
+            "harvest_date": _iso(harvest_date or date.today()),
             "quantity": quantity,
-            "unit": unit,
+            "unit": unit or "kg",
             "notes": notes,
-            "status": status,
+            "status": status or "stored",
         }
+
+    @resilient()
+    def record_harvest(self, crop_id: str, harvest_date: date, quantity: float, unit: str = "kg", notes: str = None, status: str = "stored") -> Dict[str, Any]:
+        harvest_data = self.harvest_row(crop_id, harvest_date, quantity, unit, notes, status)
         response = self.supabase.table("harvests").insert(harvest_data).execute()
         return response.data[0] if response.data else None
 
+    @resilient()
+    def bulk_record_harvests(self, harvests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert many harvests with a single request. Each item takes the record_harvest arguments."""
+        rows = [self.harvest_row(**h) for h in harvests]
+        if not rows:
+            return []
+        response = self.supabase.table("harvests").insert(rows).execute()
+        return response.data or []
+
+    @resilient(retry=True)
     def get_stored_harvests(self, farmer_id: str) -> List[Dict[str, Any]]:
         response = (
             self.supabase.table("harvests")
@@ -126,6 +268,7 @@ class FarmCore:
         )
         return response.data or []
 
+    @resilient()
     def record_delivery(self, harvest_id: str, delivery_date: date, collector_name: str = None, market: str = None) -> Dict[str, Any]:
         self.supabase.table("harvests").update({"status": "delivered"}).eq("id", harvest_id).execute()
         delivery_data = {
@@ -142,6 +285,7 @@ class FarmCore:
             self.supabase.table("payments").insert(payment_data).execute()
         return delivery
 
+    @resilient(retry=True)
     def get_pending_payments(self, farmer_id: str) -> List[Dict[str, Any]]:
         response = (
             self.supabase.table("payments")
@@ -152,24 +296,107 @@ class FarmCore:
         )
         return response.data or []
 
+    @resilient(retry=True)
     def record_payment(self, payment_id: str, paid_amount: float, paid_date: date) -> Dict[str, Any]:
         payment_data = {"paid_amount": paid_amount, "paid_date": paid_date.isoformat(), "status": "paid"}
         response = self.supabase.table("payments").update(payment_data).eq("id", payment_id).execute()
         return response.data[0] if response.data else None
 
-    def add_treatment(self, crop_id: str, treatment_date: date, product_name: str, cost: float = None, next_due_date: date = None, notes: str = None) -> Dict[str, Any]:
-        treatment_data = {
+    @staticmethod
+    def treatment_row(crop_id: str, treatment_date: date, product_name: str, cost: float = None, next_due_date: date = None, notes: str = None) -> Dict[str, Any]:
+        return {
             "crop_id": crop_id,
-            "treatment_date": treatment_date.isoformat(),
+            "treatment_date": _iso(treatment_date),
             "product_name": product_name,
             "cost": cost,
-            "next_due_date": next_due_date.isoformat() if next_due_date else None,
+            "next_due_date": _iso(next_due_date) if next_due_date else None,
             "notes": notes,
         }
+
+    @resilient()
+    def add_treatment(self, crop_id: str, treatment_date: date, product_name: str, cost: float = None, next_due_date: date = None, notes: str = None) -> Dict[str, Any]:
+        treatment_data = self.treatment_row(crop_id, treatment_date, product_name, cost, next_due_date, notes)
         response = self.supabase.table("treatments").insert(treatment_data).execute()
         return response.data[0] if response.data else None
 
+    @staticmethod
+    def treatment_plan_row(crop_id: str, product_name: str, interval_days: int, start_date: date, end_date: date = None, cost: float = None, notes: str = None) -> Dict[str, Any]:
+        if int(interval_days) < 1:
+            raise ValueError("interval_days must be at least 1")
+        return {
+            "crop_id": crop_id,
+            "product_name": product_name,
+            "interval_days": int(interval_days),
+            "start_date": _iso(start_date),
+            "end_date": _iso(end_date) if end_date else None,
+            "cost": cost,
+            "notes": notes,
+        }
+
+    @resilient()
+    def add_treatment_plan(self, crop_id: str, product_name: str, interval_days: int, start_date: date, end_date: date = None, cost: float = None, notes: str = None) -> Dict[str, Any]:
+        """A recurring treatment: due on start_date and every interval_days after it, until end_date (if any)."""
+        plan_data = self.treatment_plan_row(crop_id, product_name, interval_days, start_date, end_date, cost, notes)
+        response = self.supabase.table("treatment_plans").insert(plan_data).execute()
+        return response.data[0] if response.data else None
+
+    @resilient(retry=True)
+    def get_treatment_plans(self, farmer_id: str, start: date = None, end: date = None) -> List[Dict[str, Any]]:
+        """Plans of the farmer's crops; with start/end only those that can have an occurrence in that window."""
+        query = (
+            self.supabase.table("treatment_plans")
+            .select("*, crops!inner(name, farmer_id)")
+            .eq("crops.farmer_id", farmer_id)
+        )
+        if end is not None:
+            query = query.lte("start_date", end.isoformat())
+        if start is not None:
+            query = query.or_(f"end_date.is.null,end_date.gte.{start.isoformat()}")
+        response = query.order("start_date").execute()
+        return response.data or []
+
+    @resilient(retry=True)
+    def end_treatment_plan(self, plan_id: str, last_date: date = None) -> Optional[Dict[str, Any]]:
+        """Stop a plan; by default nothing is due from today on."""
+        last_date = last_date or date.today() - timedelta(days=1)
+        response = self.supabase.table("treatment_plans").update({"end_date": last_date.isoformat()}).eq("id", plan_id).execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    def plan_occurrences(plan: Dict[str, Any], start: date, end: date) -> Iterator[date]:
+        """Due dates of a plan within [start, end], computed on the fly (occurrences are never stored)."""
+        first = date.fromisoformat(str(plan["start_date"])[:10])
+        step = int(plan["interval_days"])
+        if plan.get("end_date"):
+            end = min(end, date.fromisoformat(str(plan["end_date"])[:10]))
+        # jump straight to the first occurrence on or after `start`
+        k = max(0, -(-(start - first).days // step))
+        due = first + timedelta(days=k * step)
+        while due <= end:
+            yield due
+            due += timedelta(days=step)
+
+    @classmethod
+    def _plan_due_items(cls, plan: Dict[str, Any], start: date, end: date) -> Iterator[Dict[str, Any]]:
+        """Plan occurrences shaped like treatment rows, so they can be listed next to one-off entries."""
+        for due in cls.plan_occurrences(plan, start, end):
+            yield {
+                "plan_id": plan["id"],
+                "crop_id": plan["crop_id"],
+                "product_name": plan["product_name"],
+                "cost": plan.get("cost"),
+                "notes": plan.get("notes"),
+                "next_due_date": due.isoformat(),
+                "crops": plan.get("crops"),
+                "recurring": True,
+            }
+
+    @resilient(retry=True)
     def get_upcoming_treatments(self, farmer_id: str, days: int = 7) -> List[Dict[str, Any]]:
+        """
+        One-off treatments whose next_due_date falls in the next `days` days, merged in date order
+        with the occurrences of recurring plans. Plan occurrences carry plan_id and recurring=True.
+        """
         today = date.today()
         end_date = today + timedelta(days=days)
         response = (
@@ -178,15 +405,63 @@ class FarmCore:
             .eq("crops.farmer_id", farmer_id)
             .gte("next_due_date", today.isoformat())
             .lte("next_due_date", end_date.isoformat())
+            .order("next_due_date")
             .execute()
         )
-        return response.data or []
+        one_off = response.data or []
+        streams = [self._plan_due_items(plan, today, end_date) for plan in self.get_treatment_plans(farmer_id, today, end_date)]
+        # every stream is already in date order, so a k-way merge keeps this linear
+        return list(heapq.merge(one_off, *streams, key=lambda t: str(t["next_due_date"])[:10]))
 
+    @staticmethod
+    def expense_row(farmer_id: str, expense_date: date, category: str, amount: float, crop_id: str = None, notes: str = None) -> Dict[str, Any]:
+        return {"farmer_id": farmer_id, "expense_date": _iso(expense_date or date.today()), "category": category, "amount": amount, "crop_id": crop_id, "notes": notes}
+
+    @resilient()
     def add_expense(self, farmer_id: str, expense_date: date, category: str, amount: float, crop_id: str = None, notes: str = None) -> Dict[str, Any]:
-        expense_data = {"farmer_id": farmer_id, "expense_date": expense_date.isoformat(), "category": category, "amount": amount, "crop_id": crop_id, "notes": notes}
+        expense_data = self.expense_row(farmer_id, expense_date, category, amount, crop_id, notes)
         response = self.supabase.table("expenses").insert(expense_data).execute()
         return response.data[0] if response.data else None
 
+    @resilient()
+    def bulk_add_expenses(self, expenses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert many expenses with a single request. Each item takes the add_expense arguments."""
+        rows = [self.expense_row(**e) for e in expenses]
+        if not rows:
+            return []
+        response = self.supabase.table("expenses").insert(rows).execute()
+        return response.data or []
+
+    @resilient(retry=True)
+    def insert_idempotent(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert rows carrying an idempotency_key; rows whose key already exists are skipped,
+        so replaying the same batch (e.g. from the write outbox) never duplicates data.
+        """
+        if not rows:
+            return []
+        response = (
+            self.supabase.table(table)
+            .upsert(rows, on_conflict="idempotency_key", ignore_duplicates=True)
+            .execute()
+        )
+        if table == "crops":
+            for farmer_id in {r.get("farmer_id") for r in rows}:
+                self.caches["crops"].invalidate("get_farmer_crops", farmer_id)
+        return response.data or []
+
+    @resilient(retry=True)
+    def search_notes(self, farmer_id: str, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Ranked search over the farmer's crop, harvest and treatment notes (search_notes RPC,
+        migration 007). Rows: kind, id, crop_id, crop_name, notes, record_date, score.
+        """
+        if not normalize_text(query):
+            return []
+        response = self.supabase.rpc("search_notes", {"p_farmer_id": farmer_id, "p_query": query, "p_limit": limit}).execute()
+        return response.data or []
+
+    @resilient(retry=True)
     def get_weekly_summary(self, farmer_id: str) -> Dict[str, Any]:
         start_date = date.today() - timedelta(days=7)
         end_date = date.today()
@@ -225,6 +500,114 @@ class FarmCore:
             "pending_payments": pending_payments,
         }
 
+    # --- keyset pagination ---
+    @staticmethod
+    def _keyset_page(query, sort_col: str, cursor: Optional[Tuple[Any, Any]] = None, limit: int = 100, backward: bool = False) -> List[Dict[str, Any]]:
+        """
+        Order by (sort_col, id) with NULL sort values last and return the rows strictly after
+        cursor (or before it when backward=True, newest first). cursor is the (sort value, id)
+        of the edge row; its sort value may be None.
+        """
+        if cursor:
+            value, last_id = cursor
+            op = "lt" if backward else "gt"
+            if value is None:
+                # NULLs sort after every value: going back also covers all dated rows
+                after = f"and({sort_col}.is.null,id.{op}.{last_id})"
+                query = query.or_(f"{sort_col}.not.is.null,{after}" if backward else after)
+            else:
+                after = f"{sort_col}.{op}.{value},and({sort_col}.eq.{value},id.{op}.{last_id})"
+                query = query.or_(after if backward else f"{after},{sort_col}.is.null")
+        response = (
+            query.order(sort_col, desc=backward, nullsfirst=backward)
+            .order("id", desc=backward)
+            .limit(limit)
+            .execute()
+        )
+        return response.data or []
+
+    @resilient(retry=True)
+    def get_records_page(
+        self,
+        kind: str,
+        farmer_id: str,
+        cursor: Optional[Tuple[Any, Any]] = None,
+        limit: int = 100,
+        backward: bool = False,
+        crop_id: str = None,
+        start_date: date = None,
+        end_date: date = None,
+        category: str = None,
+        include_archived: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Keyset page of one record kind, optionally narrowed to a crop, a date range and (expenses) a category.
+        Reads the hot tables only unless include_archived is set; archived rows are then merged in
+        (same ordering, same cursor) and carry archived=True.
+        """
+        sources = [self.RECORD_SOURCES[kind]] + ([self.ARCHIVE_SOURCES[kind]] if include_archived else [])
+        rows = []
+        for tier, (table, select, sort_col, farmer_col) in enumerate(sources):
+            query = self.supabase.table(table).select(select).eq(farmer_col, farmer_id)
+            if crop_id:
+                query = query.eq("crop_id", crop_id)
+            if start_date:
+                query = query.gte(sort_col, start_date.isoformat())
+            if end_date:
+                query = query.lte(sort_col, end_date.isoformat())
+            if category:
+                query = query.eq("category", category)
+            page = self._keyset_page(query, sort_col, cursor=cursor, limit=limit, backward=backward)
+            if tier:
+                for row in page:
+                    row["archived"] = True
+            rows.extend(page)
+        if len(sources) > 1:
+            # uuid order in Postgres is the order of their lowercase hex strings
+            rows.sort(key=lambda r: (r.get(sort_col) is None, str(r.get(sort_col)), str(r["id"])), reverse=backward)
+            rows = rows[:limit]
+        return rows
+
+    def iter_records(self, kind: str, farmer_id: str, page_size: int = 500, include_archived: bool = False) -> Iterator[Dict[str, Any]]:
+        """Yield every record of a kind for a farmer, one keyset page in memory at a time."""
+        sort_col = self.RECORD_SOURCES[kind][2]
+        cursor = None
+        while True:
+            rows = self.get_records_page(kind, farmer_id, cursor=cursor, limit=page_size, include_archived=include_archived)
+            yield from rows
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1][sort_col], rows[-1]["id"])
+
+    @resilient()
+    def archive_closed_records(self, cutoff: date = None) -> Dict[str, int]:
+        """
+        Move closed records dated before cutoff (default: 18 months ago) to the cold tier, via the
+        archive_closed_records function of migration 009. Returns rows moved per table; empty when
+        another worker is already archiving.
+        """
+        params = {"p_cutoff": cutoff.isoformat()} if cutoff else {}
+        response = self.supabase.rpc("archive_closed_records", params).execute()
+        return {r["kind"]: r["moved"] for r in response.data or []}
+
+    @resilient(retry=True)
+    def get_rows_page(
+        self,
+        table: str,
+        select: str,
+        sort_col: str,
+        cursor: Optional[Tuple[Any, Any]] = None,
+        limit: int = 50,
+        backward: bool = False,
+        **filters,
+    ) -> List[Dict[str, Any]]:
+        """Generic keyset page over one table (read-only API); filters are column=value equalities."""
+        query = self.supabase.table(table).select(select)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        return self._keyset_page(query, sort_col, cursor=cursor, limit=limit, backward=backward)
+
+    @resilient(retry=True, cache="market_prices", allow_stale=True)
     def get_market_prices(self, crop_name: str = None, limit: int = 10) -> List[Dict[str, Any]]:
         query = (
             self.supabase.table("market_prices")
@@ -237,7 +620,63 @@ class FarmCore:
         response = query.execute()
         return response.data or []
 
+    # --- broadcasts ---
+    @resilient(retry=True)
+    def get_farmers_growing_page(self, crop_names: List[str], after_id: str = None, limit: int = 200) -> List[Dict[str, Any]]:
+        """Farmers with at least one crop named like any of crop_names (case-insensitive), keyset-paged by id."""
+        names = ",".join(f'name.ilike."{n}"' for n in crop_names)
+        query = (
+            self.supabase.table("farmers")
+            .select("id, telegram_id, language, crops!inner(name)")
+            .or_(names, reference_table="crops")
+        )
+        if after_id:
+            query = query.gt("id", after_id)
+        response = query.order("id").limit(limit).execute()
+        return response.data or []
+
+    @resilient()
+    def create_broadcast(self, crop_name: str, price_per_kg: float, price_date: date) -> Dict[str, Any]:
+        data = {"crop_name": crop_name, "price_per_kg": price_per_kg, "price_date": price_date.isoformat(), "status": "running"}
+        response = self.supabase.table("broadcasts").insert(data).execute()
+        return response.data[0] if response.data else None
+
+    @resilient(retry=True)
+    def get_broadcast(self, broadcast_id: str) -> Optional[Dict[str, Any]]:
+        response = self.supabase.table("broadcasts").select("*").eq("id", broadcast_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    @resilient(retry=True)
+    def update_broadcast(self, broadcast_id: str, **updates) -> Optional[Dict[str, Any]]:
+        updates["updated_at"] = datetime.now(timezone.utc).isoformat()
+        response = self.supabase.table("broadcasts").update(updates).eq("id", broadcast_id).execute()
+        return response.data[0] if response.data else None
+
+    @resilient(retry=True)
+    def bulk_upsert_market_prices(self, prices: List[Dict[str, Any]]) -> int:
+        """
+        Write many prices in one request; rows with an existing (crop_name, price_date, source)
+        are updated in place. Callers should pass rows already deduplicated on that key.
+        """
+        rows = [
+            {
+                "crop_name": p["crop_name"],
+                "price_date": p["price_date"].isoformat() if isinstance(p["price_date"], (date,)) else p["price_date"],
+                "price_per_kg": p["price_per_kg"],
+                "source": p.get("source") or "admin",
+            }
+            for p in prices
+        ]
+        if not rows:
+            return 0
+        response = self.supabase.table("market_prices").upsert(rows, on_conflict="crop_name,price_date,source").execute()
+        self.caches["market_prices"].invalidate()
+        return len(response.data or [])
+
+    @resilient(retry=True)
     def add_market_price(self, crop_name: str, price_date: date, price_per_kg: float, source: str = "admin") -> Dict[str, Any]:
+        """Record a price; a second price for the same crop, day and source replaces the first."""
         price_data = {"crop_name": crop_name, "price_date": price_date.isoformat(), "price_per_kg": price_per_kg, "source": source}
-        response = self.supabase.table("market_prices").insert(price_data).execute()
+        response = self.supabase.table("market_prices").upsert(price_data, on_conflict="crop_name,price_date,source").execute()
+        self.caches["market_prices"].invalidate()
         return response.data[0] if response.data else None
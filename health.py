@@ -0,0 +1,99 @@
+# health.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("health")
+
+PROBE_INTERVAL = 15          # seconds between dependency checks
+PROBE_TIMEOUT = 5            # seconds per check
+MAX_QUEUE_DEPTH = 500        # pending updates before we stop accepting traffic
+MAX_LOOP_LAG = 1.0           # seconds of event-loop delay before we stop accepting traffic
+LAG_SAMPLE_EVERY = 0.5
+
+class HealthProber:
+    """
+    Checks Supabase latency, Telegram API reachability, update-queue depth and event-loop lag
+    in the background and keeps the last result, so /ready answers without doing any I/O.
+    """
+
+    def __init__(self, get_farm_core, get_telegram_app, interval: float = PROBE_INTERVAL):
+        self.get_farm_core = get_farm_core
+        self.get_telegram_app = get_telegram_app
+        self.interval = interval
+        self.loop_lag = 0.0
+        self.result: Dict[str, Any] = {"ready": False, "checks": {}, "checked_at": None}
+        self._tasks = []
+
+    async def _check_db(self) -> Dict[str, Any]:
+        farm_core = self.get_farm_core()
+        if farm_core is None:
+            return {"ok": False, "error": "not initialized"}
+        started = time.perf_counter()
+        await asyncio.wait_for(asyncio.to_thread(farm_core.ping), PROBE_TIMEOUT)
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1), "circuit": farm_core.breaker.state}
+
+    async def _check_telegram(self) -> Dict[str, Any]:
+        application = self.get_telegram_app()
+        if application is None:
+            return {"ok": False, "error": "not started"}
+        started = time.perf_counter()
+        await asyncio.wait_for(application.bot.get_me(), PROBE_TIMEOUT)
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    def _check_queue(self) -> Dict[str, Any]:
+        application = self.get_telegram_app()
+        depth = application.update_queue.qsize() if application is not None else 0
+        return {"ok": depth <= MAX_QUEUE_DEPTH, "depth": depth}
+
+    def _check_loop(self) -> Dict[str, Any]:
+        return {"ok": self.loop_lag <= MAX_LOOP_LAG, "lag_ms": round(self.loop_lag * 1000, 1)}
+
+    async def probe_once(self) -> Dict[str, Any]:
+        checks = {}
+        for name, coro in (("database", self._check_db()), ("telegram", self._check_telegram())):
+            try:
+                checks[name] = await coro
+            except Exception as e:
+                checks[name] = {"ok": False, "error": str(e) or e.__class__.__name__}
+        checks["update_queue"] = self._check_queue()
+        checks["event_loop"] = self._check_loop()
+        self.result = {
+            "ready": all(c["ok"] for c in checks.values()),
+            "checks": checks,
+            "checked_at": time.time(),
+        }
+        if not self.result["ready"]:
+            logger.warning("Not ready: %s", {k: v for k, v in checks.items() if not v["ok"]})
+        return self.result
+
+    async def _probe_loop(self) -> None:
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(self.interval)
+
+    async def _lag_loop(self) -> None:
+        # a sleep that overshoots its target means something blocked the loop for that long
+        while True:
+            expected = time.perf_counter() + LAG_SAMPLE_EVERY
+            await asyncio.sleep(LAG_SAMPLE_EVERY)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.loop_lag = lag if lag > self.loop_lag else self.loop_lag * 0.8 + lag * 0.2
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._probe_loop()), asyncio.create_task(self._lag_loop())]
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def snapshot(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """Last probe result; reported as not ready if it is older than max_age (the prober stalled)."""
+        result = dict(self.result)
+        checked_at = result.get("checked_at")
+        if max_age is not None and (checked_at is None or time.time() - checked_at > max_age):
+            result["ready"] = False
+            result["stale"] = True
+        return result
@@ -0,0 +1,233 @@
+# invalidation.py
+import abc
+import asyncio
+import logging
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("invalidation")
+
+# table -> (cache name, cached FarmCore method, its filter parameter, parameter position, row column)
+CACHED_READS = {
+    "farmers": ("farmers", "get_farmer", "telegram_id", 0, "telegram_id"),
+    "crops": ("crops", "get_farmer_crops", "farmer_id", 0, "farmer_id"),
+    "market_prices": ("market_prices", "get_market_prices", "crop_name", 0, "crop_name"),
+}
+
+# tables whose changes bump a version counter (read by the dashboard API for ETags)
+VERSIONED_TABLES = ("farmers", "crops", "market_prices", "harvests", "deliveries", "payments")
+
+# while change events are flowing, cached reads can live this long (seconds); see _set_connected
+LONG_TTLS = {
+    "farmers": int(os.getenv("FARMERS_CACHE_TTL", "3600")),
+    "crops": int(os.getenv("CROPS_CACHE_TTL", "3600")),
+    "market_prices": int(os.getenv("MARKET_PRICES_CACHE_TTL", "21600")),
+}
+
+# how often RealtimeInvalidationBus checks that its websocket is still being read (seconds)
+WATCH_INTERVAL = float(os.getenv("REALTIME_WATCH_INTERVAL", "5"))
+
+def _call_arg(key: Tuple, position: int, name: str) -> Any:
+    """Value of a parameter inside a @resilient cache key: (method, *args, *sorted kwargs items)."""
+    for part in key[1:]:
+        if isinstance(part, tuple) and len(part) == 2 and part[0] == name:
+            return part[1]
+    if len(key) > position + 1 and not isinstance(key[position + 1], tuple):
+        return key[position + 1]
+    return None  # all three filters default to None
+
+def evict(farm_core, table: str, rows: Iterable[Optional[Dict[str, Any]]]) -> int:
+    """
+    Drop exactly the cache entries the changed rows (new and old versions) could have fed.
+    Entries without a filter (e.g. get_market_prices() over all crops) always go. If a row lacks
+    the column (old rows without REPLICA IDENTITY FULL), every entry of that method goes.
+    """
+    read = CACHED_READS.get(table)
+    if read is None:
+        return 0
+    cache_name, method, param, position, column = read
+    values, unknown = set(), False
+    for row in rows:
+        if row is None:
+            continue
+        if row.get(column) is None:
+            unknown = True
+        else:
+            values.add(row[column])
+
+    def affected(key: Tuple) -> bool:
+        if key[0] != method:
+            return False
+        arg = _call_arg(key, position, param)
+        return unknown or arg is None or arg in values
+
+    return farm_core.caches[cache_name].invalidate_where(affected)
+
+class InvalidationBus(abc.ABC):
+    """
+    Applies row-change events for farmers/crops/market_prices to the TTL caches of attached
+    FarmCore instances. While the bus is connected the caches use LONG_TTLS; when it drops,
+    the original TTLs come back (events may be missed), and on every (re)connect the caches
+    are cleared once.
+
+    Every event also bumps a per-table version. Versions are only meaningful while connected;
+    each (re)connect starts a new epoch so versions from before a gap are never reused.
+    """
+
+    def __init__(self):
+        self.cores: List[Any] = []
+        self._base_ttls: List[Dict[str, float]] = []
+        self.connected = False
+        self.epoch = uuid.uuid4().hex[:8]
+        self.versions: Dict[str, int] = {}
+        self.events = 0
+        self.evicted = 0
+
+    def attach(self, farm_core) -> None:
+        self.cores.append(farm_core)
+        self._base_ttls.append({name: farm_core.caches[name].ttl for name in LONG_TTLS})
+
+    def handle(self, table: str, record: Optional[Dict[str, Any]] = None, old_record: Optional[Dict[str, Any]] = None) -> int:
+        self.events += 1
+        self.versions[table] = self.versions.get(table, 0) + 1
+        dropped = sum(evict(core, table, (record, old_record)) for core in self.cores)
+        self.evicted += dropped
+        return dropped
+
+    def _set_connected(self, connected: bool, resync: bool = False) -> None:
+        """resync=True clears the caches and starts a new epoch even if already connected."""
+        if connected == self.connected and not (connected and resync):
+            return
+        self.connected = connected
+        if connected:
+            self.epoch, self.versions = uuid.uuid4().hex[:8], {}
+        for core, base in zip(self.cores, self._base_ttls):
+            for name, ttl in base.items():
+                cache = core.caches[name]
+                if connected:
+                    cache.invalidate()  # whatever was cached before may have missed events
+                    cache.ttl = max(ttl, LONG_TTLS[name])
+                else:
+                    cache.ttl = ttl
+        logger.info("Cache invalidation bus %s", "connected" if connected else "disconnected, using short TTLs")
+
+    def version(self, tables: Iterable[str]) -> Optional[str]:
+        """Combined version of some tables, or None when changes may have been missed (disconnected)."""
+        if not self.connected:
+            return None
+        return self.epoch + "." + ".".join(str(self.versions.get(t, 0)) for t in tables)
+
+    @abc.abstractmethod
+    async def start(self) -> None:
+        """Begin delivering change events; the bus reports connected once they flow."""
+
+    async def stop(self) -> None:
+        self._set_connected(False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"connected": self.connected, "events": self.events, "evicted": self.evicted}
+
+class LocalInvalidationBus(InvalidationBus):
+    """In-process stand-in for tests and single-worker runs: publish() delivers immediately."""
+
+    async def start(self) -> None:
+        self._set_connected(True)
+
+    def publish(self, table: str, record: Optional[Dict[str, Any]] = None, old_record: Optional[Dict[str, Any]] = None) -> int:
+        return self.handle(table, record, old_record)
+
+class RealtimeInvalidationBus(InvalidationBus):
+    """
+    Subscribes to Supabase Realtime postgres_changes on VERSIONED_TABLES (migrations 005 and 008
+    add them to the supabase_realtime publication; the cached ones with REPLICA IDENTITY FULL).
+    A watchdog notices dropped sockets (see _watch) and subscribes again on a new client.
+    """
+
+    def __init__(self, supabase_url: str, supabase_key: str):
+        super().__init__()
+        self.url = supabase_url.rstrip("/") + "/realtime/v1"
+        self.key = supabase_key
+        self.client = None
+        self._listener: Optional[asyncio.Task] = None  # the client's read loop we last saw subscribed
+        self._watchdog: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self._subscribe()
+        self._watchdog = asyncio.create_task(self._watch())
+
+    async def _subscribe(self) -> None:
+        from realtime import AsyncRealtimeClient
+
+        self.client = AsyncRealtimeClient(self.url, self.key)
+        await self.client.connect()
+        if not hasattr(self.client, "_listen_task"):
+            # _watch reads this private read-loop task (requirements.txt pins realtime for it); without
+            # it dropped sockets go unnoticed while the caches run on LONG_TTLS, so do not start at all
+            logger.error("realtime client has no _listen_task (check the pinned realtime version); "
+                         "cache invalidation disabled, caches keep their short TTLs")
+            await self._close_client()
+            raise RuntimeError("unsupported realtime client")
+        self._listener = self._listen_task()
+        channel = self.client.channel("farmbot-cache-invalidation")
+        for table in VERSIONED_TABLES:
+            channel.on_postgres_changes("*", callback=self._on_change, table=table, schema="public")
+        await channel.subscribe(self._on_state)
+
+    def _listen_task(self) -> Optional[asyncio.Task]:
+        return getattr(self.client, "_listen_task", None)
+
+    async def _watch(self) -> None:
+        """
+        realtime tells the channel callback neither about a clean close (its read loop just ends)
+        nor about its own reconnects (the rejoin is silent until SUBSCRIBED comes back), so watch
+        the client's read loop: a finished or replaced loop means events may have been missed.
+        """
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            listener = self._listen_task()
+            alive = listener is not None and not listener.done()
+            if alive and listener is self._listener and self.client.is_connected:
+                continue
+            self._set_connected(False)
+            if alive:
+                continue  # realtime is reconnecting; the rejoin's SUBSCRIBED resyncs in _on_state
+            logger.warning("Realtime connection closed, subscribing again")
+            await self._close_client()
+            try:
+                await self._subscribe()
+            except Exception as e:
+                logger.warning("Realtime resubscribe failed, retrying in %ss: %s", WATCH_INTERVAL, e)
+
+    def _on_change(self, payload: Dict[str, Any]) -> None:
+        data = payload.get("data", payload)
+        try:
+            self.handle(data.get("table"), data.get("record"), data.get("old_record"))
+        except Exception:
+            logger.exception("Failed to apply change event for %s", data.get("table"))
+
+    def _on_state(self, state, error: Optional[Exception]) -> None:
+        state = getattr(state, "value", state)
+        if error is not None:
+            logger.warning("Realtime channel %s: %s", state, error)
+        subscribed = state == "SUBSCRIBED"
+        if subscribed:
+            self._listener = self._listen_task()
+        # every (re)join may follow a gap, so SUBSCRIBED always clears and starts a new epoch
+        self._set_connected(subscribed, resync=True)
+
+    async def _close_client(self) -> None:
+        if self.client is not None:
+            try:
+                await self.client.close()
+            except Exception:
+                logger.exception("Error closing the Realtime connection")
+            self.client = None
+        self._listener = None
+
+    async def stop(self) -> None:
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        await super().stop()
+        await self._close_client()
@@ -0,0 +1,198 @@
+# logging_setup.py
+import atexit
+import contextvars
+import functools
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import time
+from typing import Optional
+
+# Set per update (TypeHandler in group -1) and per callback (wrap_callbacks); copied into
+# to_thread workers and non-blocking handler tasks by asyncio.
+update_id_var: contextvars.ContextVar = contextvars.ContextVar("update_id", default=None)
+handler_var: contextvars.ContextVar = contextvars.ContextVar("handler", default=None)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", "farmbot.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "10"))
+HTTPX_SAMPLE_EVERY = int(os.getenv("HTTPX_LOG_SAMPLE", "20"))  # keep 1 in N successful httpx request lines
+LOG_QUEUE_SIZE = 10000
+
+_REDACTIONS = [
+    # Telegram bot tokens, in API URLs (/bot<token>/) or anywhere else
+    (re.compile(r"(?<!\d)\d{6,12}:[A-Za-z0-9_-]{30,}"), "<bot-token>"),
+    # Supabase keys and other JWTs
+    (re.compile(r"\beyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+"), "<jwt>"),
+    (re.compile(r"\b(sb_(?:secret|publishable)_)[A-Za-z0-9_-]+"), r"\1<redacted>"),
+    (re.compile(r"(?i)\b(bearer\s+)[^\s'\",]+"), r"\1<redacted>"),
+    (re.compile(r"(?i)\b(apikey|api_key|token|secret|password)(['\"]?\s*[=:]\s*['\"]?)[^\s'\",&]+"), r"\1\2<redacted>"),
+]
+
+def redact(text: str) -> str:
+    for pattern, replacement in _REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+class _ContextFilter(logging.Filter):
+    """Runs on the caller's side of the queue: captures context vars and redacts the final message."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.update_id = update_id_var.get()
+        record.handler = handler_var.get()
+        record.msg = redact(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = redact(logging.Formatter().formatException(record.exc_info))
+        record.exc_info = None
+        return True
+
+class _HttpxSampler(logging.Filter):
+    """httpx logs one INFO line per request; keep errors and every Nth success."""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self.count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not record.name.startswith(("httpx", "httpcore")) or record.levelno > logging.INFO:
+            return True
+        if " 2" not in record.getMessage().rsplit('"HTTP/', 1)[-1]:
+            return True  # non-2xx status
+        self.count += 1
+        return self.count % self.every == 1 or self.every == 1
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "update_id", None) is not None:
+            entry["update_id"] = record.update_id
+        if getattr(record, "handler", None):
+            entry["handler"] = record.handler
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """When the queue is full the record is dropped and counted; logging must never block or spam stderr."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # the queue may be full at shutdown; wait for the listener to make room instead of raising
+        self.queue.put(self._sentinel)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[_DroppingQueueHandler] = None
+
+def dropped_records() -> int:
+    """Log records discarded because the listener fell LOG_QUEUE_SIZE records behind (shown in /metrics)."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+def setup_logging(level: str = LOG_LEVEL, log_file: Optional[str] = LOG_FILE) -> None:
+    """
+    Route all logging through a bounded queue: the event loop only redacts and enqueues,
+    a listener thread formats JSON lines and writes them to stderr and a gzip-rotated file.
+    Records that arrive while the queue is full are dropped and counted.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    formatter = JsonFormatter()
+    targets = [logging.StreamHandler()]
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+        file_handler.namer = lambda name: name + ".gz"
+        file_handler.rotator = _gzip_rotator
+        targets.append(file_handler)
+    for target in targets:
+        target.setFormatter(formatter)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = _queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(_HttpxSampler(HTTPX_SAMPLE_EVERY))
+    queue_handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = _QueueListener(log_queue, *targets, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Flush and stop the listener thread (called at exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+# ----------------------
+# Telegram wiring
+# ----------------------
+async def bind_update_context(update, context) -> None:
+    """TypeHandler callback (group -1): tag every log line of this update with its update_id."""
+    update_id_var.set(getattr(update, "update_id", None))
+
+def iter_callback_handlers(handlers):
+    """Yield every handler with a callback, descending into ConversationHandlers."""
+    for handler in handlers:
+        if hasattr(handler, "entry_points"):
+            nested = list(handler.entry_points) + list(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                nested.extend(state_handlers)
+            yield from iter_callback_handlers(nested)
+        elif hasattr(handler, "callback"):
+            yield handler
+
+def _with_handler_name(callback):
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        token = handler_var.set(callback.__name__)
+        try:
+            return await callback(update, context)
+        finally:
+            handler_var.reset(token)
+    return wrapper
+
+def wrap_callbacks(application) -> None:
+    """Wrap registered callbacks so their log lines carry handler=<function name>."""
+    seen = {}
+    for group in application.handlers.values():
+        for handler in iter_callback_handlers(group):
+            if getattr(handler.callback, "__wrapped__", None) is not None:
+                continue
+            original = handler.callback
+            if original not in seen:
+                seen[original] = _with_handler_name(original)
+            handler.callback = seen[original]
@@ -1,11 +1,14 @@
 import os
 import logging
 import asyncio
-from typing import Optional
+import hmac
+import random
+import time
+from typing import TYPE_CHECKING, Optional
 
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 import uvicorn
-import httpx
 
 from telegram import Update
 from telegram.ext import (
@@ -16,78 +19,34 @@ from telegram.ext import (
     ConversationHandler,
     CallbackQueryHandler,
     ContextTypes,
+    TypeHandler,
 )
 
 # IMPORTANT: import the module, not the names, so we can read/update its farm_core variable.
 import core_singleton
-from farmcore import FarmCore  # for type annotation only
+from dedup import UpdateDeduplicator
+from logging_setup import setup_logging, bind_update_context, dropped_records, wrap_callbacks
 
 from keyboards import get_main_keyboard
-from onboarding import start, language_selection, get_name, get_phone, get_village, ONBOARD_STATES
-from aboutcrop import (
-    add_crop_start_callback,
-    add_crop_name_handler,
-    add_crop_date_handler,
-    add_crop_notes_handler,
-    addcrop_skip_notes_callback,
-    CROP_STATES,
-    my_crops,
-    crops_callback_handler,
-    crop_manage_callback,
-    crop_delete_callback,
-    confirm_delete_callback,
-    crop_edit_entry_callback,
-    edit_field_choice_callback,
-    edit_name_handler,
-    edit_date_handler,
-    edit_notes_handler,
-    EDIT_STATES,
-    record_harvest,
-    harvest_select_callback,
-    harvest_date_callback,
-    harvest_date,
-    harvest_quantity,
-    harvest_delivery_callback,
-    harvest_delivery_collector,
-    harvest_delivery_market,
-    harvest_skip_callback,
-    HARVEST_STATES,
-)
-from aboutmoney import (
-    add_expense,
-    expense_crop,
-    expense_category,
-    expense_amount,
-    expense_date,
-    pending_payments,
-    mark_paid_callback,
-    payment_amount,
-    create_pending_callback,
-    EXPENSE_STATES,
-    PAYMENT_STATES,
-)
-from abouttreatment import (
-    add_treatment,
-    treatment_crop,
-    treatment_product,
-    treatment_date,
-    treatment_date_callback,
-    treatment_cost,
-    treatment_next_date,
-    treatment_skip_callback,
-    TREATMENT_STATES,
-)
 
-# Logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+# farmcore/api/batching pull in the Supabase SDK (and postgrest through resilience); they are imported
+# by _init_farm_core and _build_telegram_app in worker threads, so cold start does not wait for them
+if TYPE_CHECKING:
+    from farmcore import FarmCore
+    from health import HealthProber
+    from invalidation import InvalidationBus
+
+# Logging: JSON lines through a background queue, secrets redacted (see logging_setup.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Global shared objects (will be set during startup)
-farm_core: Optional[FarmCore] = None
+farm_core: Optional["FarmCore"] = None
 telegram_app: Optional[Application] = None
+outbox_task: Optional[asyncio.Task] = None
+update_dedup: Optional[UpdateDeduplicator] = None
+prober: Optional["HealthProber"] = None
+invalidation_bus: Optional["InvalidationBus"] = None
 
 # -------------------------
 # Helper command handlers
@@ -129,6 +88,12 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "• 💸 مصاريف: تسجيل المصاريف\n"
         "• 📈 الأسعار بالسوق: عرض أسعار السوق\n"
         "• 📊 ملخص الاسبوع: عرض ملخص الأسبوع\n"
+        "• 📄 أرسل ملف CSV/XLSX لاستيراد المصاريف والحصاد\n"
+        "• /export: تنزيل كل سجلاتك (/export xlsx لملف Excel)\n"
+        "• /history: تصفح سجلات الحصاد والمصاريف والعلاجات\n"
+        "• /report: الربحية لكل محصول وموسم\n"
+        "• /upcoming: العلاجات المستحقة قريبًا (ومنها المتكررة)\n"
+        "• /search: البحث في ملاحظات المحاصيل والحصاد والعلاجات\n"
     ) if lang == 'ar' else (
         "❓ Help:\n\n"
         "• 🇱🇧 My Account: View account information\n"
@@ -139,6 +104,12 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "• 💸 Expenses: Record expenses\n"
         "• 📈 Market Prices: View market prices\n"
         "• 📊 Weekly Summary: View weekly summary\n"
+        "• 📄 Send a CSV/XLSX file to import expenses and harvests\n"
+        "• /export: Download all your records (/export xlsx for Excel)\n"
+        "• /history: Browse past harvests, expenses and treatments\n"
+        "• /report: Profitability per crop and season\n"
+        "• /upcoming: Treatments due soon, including recurring ones\n"
+        "• /search: Search your crop, harvest and treatment notes\n"
     )
     if update.message:
         await update.message.reply_text(help_text, reply_markup=get_main_keyboard(lang))
@@ -179,6 +150,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if text in ["🇱🇧 حسابي", "🇱🇧 My Account"]:
         await my_account(update, context)
     elif text in ["🌾 محاصيلي", "🌾 My Crops"]:
+        from aboutcrop import my_crops
         await my_crops(update, context)
     elif text in ["📈 الأسعار بالسوق", "📈 Market Prices"]:
         from aboutmoney import market_prices
@@ -189,10 +161,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     elif text in ["❓مساعدة", "❓Help"]:
         await help_command(update, context)
     elif text in ["💸 مصاريف", "💸 Expenses"]:
+        from aboutmoney import add_expense
         await add_expense(update, context)
     elif text in ["💵 المدفوعات المعلقة", "💵 Pending Payments"]:
+        from aboutmoney import pending_payments
         await pending_payments(update, context)
     elif text in ["🗓️ التسميد/علاج", "🗓️ Fertilize & Treat"]:
+        from abouttreatment import add_treatment
         await add_treatment(update, context)
     else:
         await update.message.reply_text("أمر غير معروف. استخدم /help" if lang == 'ar' else "Unknown command. Use /help", reply_markup=get_main_keyboard(lang))
@@ -201,6 +176,18 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 # Error handler
 # -------------------------
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from resilience import FarmCoreUnavailable
+    if isinstance(context.error, FarmCoreUnavailable):
+        # database outage / open circuit: not the farmer's fault and nothing to "create" again
+        logger.warning(f"Update {update} hit a database outage: {context.error!r}")
+        message = update.effective_message if isinstance(update, Update) else None
+        if message:
+            lang = context.user_data.get('language', 'ar') if context.user_data is not None else 'ar'
+            await message.reply_text(
+                "الخدمة غير متاحة مؤقتًا، يرجى المحاولة بعد دقيقة. بياناتك محفوظة." if lang == 'ar' else
+                "The service is temporarily unavailable, please try again in a minute. Your data is safe."
+            )
+        return
     logger.error(f"Update {update} caused error: {context.error}")
     if update and update.message:
         lang = context.user_data.get('language', 'ar')
@@ -213,6 +200,82 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 # Handlers registration
 # -------------------------
 def register_handlers(application: Application):
+    # Handler modules (and their heavier dependencies) are imported here rather than at module
+    # level, so on_startup can run this in a worker thread while the network init proceeds.
+    from onboarding import start, language_selection, get_name, get_phone, get_village, ONBOARD_STATES
+    from aboutcrop import (
+        add_crop_start_callback,
+        add_crop_name_handler,
+        add_crop_date_handler,
+        add_crop_notes_handler,
+        addcrop_skip_notes_callback,
+        CROP_STATES,
+        my_crops,
+        crops_callback_handler,
+        crop_manage_callback,
+        crop_delete_callback,
+        confirm_delete_callback,
+        crop_edit_entry_callback,
+        edit_field_choice_callback,
+        edit_name_handler,
+        edit_date_handler,
+        edit_notes_handler,
+        EDIT_STATES,
+        record_harvest,
+        harvest_select_callback,
+        harvest_date_callback,
+        harvest_date,
+        harvest_quantity,
+        harvest_delivery_callback,
+        harvest_delivery_collector,
+        harvest_delivery_market,
+        harvest_skip_callback,
+        harvest_bulk_start_callback,
+        harvest_bulk_input,
+        harvest_bulk_confirm_callback,
+        HARVEST_STATES,
+    )
+    from aboutmoney import (
+        add_expense,
+        expense_crop,
+        expense_category,
+        expense_amount,
+        expense_date,
+        pending_payments,
+        mark_paid_callback,
+        payment_amount,
+        create_pending_callback,
+        EXPENSE_STATES,
+        PAYMENT_STATES,
+    )
+    from aboutdata import import_document, export_ledger, history_command, history_callback, search_command
+    from aboutreport import season_report
+    from aboutadmin import (
+        broadcast_price_command,
+        broadcast_resume_command,
+        broadcast_status_command,
+        import_prices_document,
+        ingest_prices,
+        archive_job,
+        ARCHIVE_INTERVAL,
+    )
+    from profiling import profile_command
+    from sessions import CONVERSATION_TIMEOUT, SWEEP_INTERVAL, conversation_timed_out, sessions
+    from abouttreatment import (
+        add_treatment,
+        treatment_crop,
+        treatment_product,
+        treatment_date,
+        treatment_date_callback,
+        treatment_cost,
+        treatment_next_date,
+        treatment_skip_callback,
+        treatment_interval,
+        upcoming_treatments,
+        plan_end_callback,
+        TREATMENT_STATES,
+    )
+
     reg_conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
@@ -220,8 +283,10 @@ def register_handlers(application: Application):
             ONBOARD_STATES['NAME']: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_name)],
             ONBOARD_STATES['PHONE']: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_phone)],
             ONBOARD_STATES['VILLAGE']: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_village)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timed_out)],
         },
-        fallbacks=[CommandHandler("cancel", cancel)]
+        fallbacks=[CommandHandler("cancel", cancel)],
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     add_crop_conv = ConversationHandler(
@@ -230,9 +295,11 @@ def register_handlers(application: Application):
             CROP_STATES['CROP_NAME']: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_crop_name_handler)],
             CROP_STATES['CROP_PLANTING_DATE']: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_crop_date_handler)],
             CROP_STATES['CROP_NOTES']: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_crop_notes_handler)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timed_out)],
         },
         fallbacks=[CommandHandler("cancel", cancel), CallbackQueryHandler(addcrop_skip_notes_callback, pattern=r"^addcrop_skip_notes$")],
         allow_reentry=True,
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     harvest_conv_handler = ConversationHandler(
@@ -240,6 +307,7 @@ def register_handlers(application: Application):
         states={
             HARVEST_STATES['HARVEST_CROP']: [
                 CallbackQueryHandler(harvest_select_callback, pattern=r"^harvest_select:"),
+                CallbackQueryHandler(harvest_bulk_start_callback, pattern=r"^harvest_bulk:start$"),
             ],
             HARVEST_STATES['HARVEST_DATE']: [
                 CallbackQueryHandler(harvest_date_callback, pattern=r"^harvest_date:"),
@@ -259,9 +327,17 @@ def register_handlers(application: Application):
                 CallbackQueryHandler(harvest_skip_callback, pattern=r"^harvest_skip:market$"),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, harvest_delivery_market)
             ],
+            HARVEST_STATES['HARVEST_BULK_INPUT']: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, harvest_bulk_input)
+            ],
+            HARVEST_STATES['HARVEST_BULK_CONFIRM']: [
+                CallbackQueryHandler(harvest_bulk_confirm_callback, pattern=r"^harvest_bulk:(confirm|cancel)$"),
+            ],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timed_out)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
         allow_reentry=True,
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     edit_conv = ConversationHandler(
@@ -271,9 +347,11 @@ def register_handlers(application: Application):
             EDIT_STATES['EDIT_NAME']: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_name_handler)],
             EDIT_STATES['EDIT_PLANTING_DATE']: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_date_handler)],
             EDIT_STATES['EDIT_NOTES']: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_notes_handler)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timed_out)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
         allow_reentry=True,
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     expense_conv = ConversationHandler(
@@ -292,18 +370,22 @@ def register_handlers(application: Application):
                 CallbackQueryHandler(expense_date, pattern=r"^expense_date:"),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, expense_date)
             ],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timed_out)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
         allow_reentry=True,
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     payment_conv = ConversationHandler(
         entry_points=[CallbackQueryHandler(mark_paid_callback, pattern=r"^paid_")],
         states={
-            PAYMENT_STATES['PAYMENT_AMOUNT']: [MessageHandler(filters.TEXT & ~filters.COMMAND, payment_amount)]
+            PAYMENT_STATES['PAYMENT_AMOUNT']: [MessageHandler(filters.TEXT & ~filters.COMMAND, payment_amount)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timed_out)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
         allow_reentry=True,
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     treatment_conv = ConversationHandler(
@@ -324,12 +406,15 @@ def register_handlers(application: Application):
             ],
             TREATMENT_STATES['TREATMENT_NEXT_DATE']: [
                 CallbackQueryHandler(treatment_skip_callback, pattern=r"^treatment_skip:next$"),
-                CallbackQueryHandler(treatment_skip_callback, pattern=r"^treatment_next:pick$"),
+                CallbackQueryHandler(treatment_skip_callback, pattern=r"^treatment_next:(pick|repeat)$"),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, treatment_next_date)
             ],
+            TREATMENT_STATES['TREATMENT_INTERVAL']: [MessageHandler(filters.TEXT & ~filters.COMMAND, treatment_interval)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timed_out)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
         allow_reentry=True,
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     application.add_handler(reg_conv_handler)
@@ -341,6 +426,9 @@ def register_handlers(application: Application):
     application.add_handler(treatment_conv)
 
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    # imports can take a while; block=False keeps other farmers' updates flowing meanwhile
+    application.add_handler(MessageHandler(filters.Document.ALL & filters.CaptionRegex(r"(?i)^/?prices\b"), import_prices_document, block=False))
+    application.add_handler(MessageHandler(filters.Document.ALL, import_document, block=False))
     application.add_handler(CallbackQueryHandler(crops_callback_handler, pattern=r"^crop_page:"))
     application.add_handler(CallbackQueryHandler(crops_callback_handler, pattern=r"^prefcrop:"))
     application.add_handler(CallbackQueryHandler(crop_manage_callback, pattern=r"^crop_manage:"))
@@ -348,6 +436,19 @@ def register_handlers(application: Application):
     application.add_handler(CallbackQueryHandler(confirm_delete_callback, pattern=r"^confirm_delete:"))
     application.add_handler(CallbackQueryHandler(crop_edit_entry_callback, pattern=r"^crop_edit:"))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("export", export_ledger, block=False))
+    application.add_handler(CommandHandler("history", history_command))
+    application.add_handler(CommandHandler("report", season_report))
+    application.add_handler(CommandHandler("upcoming", upcoming_treatments))
+    application.add_handler(CommandHandler("search", search_command))
+    application.add_handler(CallbackQueryHandler(plan_end_callback, pattern=r"^plan_end:"))
+
+    # admin-only commands (ADMIN_IDS)
+    application.add_handler(CommandHandler("broadcast_price", broadcast_price_command))
+    application.add_handler(CommandHandler("broadcast_resume", broadcast_resume_command))
+    application.add_handler(CommandHandler("broadcast_status", broadcast_status_command))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CallbackQueryHandler(history_callback, pattern=r"^hist_"))
     application.add_handler(CommandHandler("cancel", cancel))
 
     application.add_handler(CallbackQueryHandler(harvest_select_callback, pattern=r"^harvest_select:"))
@@ -363,6 +464,19 @@ def register_handlers(application: Application):
     application.add_handler(CallbackQueryHandler(treatment_skip_callback, pattern=r"^treatment_skip:"))
     application.add_handler(CallbackQueryHandler(treatment_skip_callback, pattern=r"^treatment_next:"))
 
+    # tag log lines with update_id (group -1 runs before every other handler) and handler name
+    application.add_handler(TypeHandler(Update, bind_update_context), group=-1)
+    # session memory: note who is active; a periodic sweep drops idle/oversized user_data
+    # (own group: PTB runs only the first matching handler of each group, and -1 is taken above)
+    application.add_handler(TypeHandler(Update, sessions.track), group=-2)
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(sessions.sweep, interval=SWEEP_INTERVAL, first=SWEEP_INTERVAL)
+        # closed seasons move to the cold tier; workers race harmlessly (advisory lock in SQL)
+        application.job_queue.run_repeating(archive_job, interval=ARCHIVE_INTERVAL, first=600)
+    else:
+        logger.warning("No JobQueue (install python-telegram-bot[job-queue]): conversation timeouts, session sweeps and archival are off")
+    wrap_callbacks(application)
+
     # Add error handler
     application.add_error_handler(error_handler)
 
@@ -370,43 +484,62 @@ def register_handlers(application: Application):
 # FastAPI app + Telegram Application
 # -------------------------
 app = FastAPI()
+app.state.invalidation_bus = None
+# the dashboard API (/api) is mounted by on_startup once _init_farm_core has imported it
 
 telegram_app: Optional[Application] = None
 
 @app.get("/health")
 async def health():
+    """Liveness: the process is up. Use /ready for dependency status."""
     return {"ok": True}
 
-@app.post("/")
-async def webhook(request: Request):
-    global telegram_app
-    if telegram_app is None:
-        logger.warning("Received webhook while telegram_app is not ready.")
-        return Response(status_code=503, content="Telegram app not ready")
-
+@app.get("/ready")
+async def ready():
+    """Readiness from the background prober's last result; never touches the DB or Telegram itself."""
+    if prober is None:
+        return JSONResponse(status_code=503, content={"ready": False, "checks": {}, "error": "starting"})
+    from health import PROBE_INTERVAL
+    result = prober.snapshot(max_age=3 * PROBE_INTERVAL)
+    return JSONResponse(status_code=200 if result["ready"] else 503, content=result)
+
+@app.get("/metrics")
+async def metrics():
+    """Outbox depth (queued writes), lag (age of the oldest queued write) and flush counters."""
+    if core_singleton.outbox is None:
+        return Response(status_code=503, content="Outbox not ready")
+    stats = {"outbox": await asyncio.to_thread(core_singleton.outbox.stats)}
+    if farm_core is not None:
+        stats["supabase_circuit"] = farm_core.breaker.state
+    if invalidation_bus is not None:
+        stats["cache_invalidation"] = invalidation_bus.stats()
+    if update_dedup is not None:
+        stats["duplicate_updates"] = update_dedup.duplicates
+    stats["dropped_log_records"] = dropped_records()
+    if telegram_app is not None:
+        from sessions import sessions
+        stats["sessions"] = sessions.stats()
+    return stats
+
+@app.post("/admin/prices")
+async def admin_prices(request: Request):
+    """Bulk price ingestion: JSON list (or {"prices": [...]}) of crop_name/price_date/price_per_kg/source."""
+    token = os.getenv("ADMIN_API_TOKEN")
+    if not token or not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        return Response(status_code=401, content="Unauthorized")
+    if farm_core is None:
+        return Response(status_code=503, content="FarmCore not ready")
     try:
-        data = await request.json()
+        payload = await request.json()
     except Exception:
-        logger.exception("Failed to parse JSON from request")
         return Response(status_code=400, content="Invalid JSON")
+    items = payload.get("prices") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        return Response(status_code=400, content="Expected a list of price objects")
+    from aboutadmin import ingest_prices
+    written, dupes, rejected, errors = await asyncio.to_thread(ingest_prices, enumerate(items, start=1))
+    return {"ok": True, "written": written, "duplicates": dupes, "rejected": rejected, "errors": errors}
 
-    try:
-        update = Update.de_json(data, telegram_app.bot)
-    except Exception:
-        logger.exception("Failed to build Update from JSON")
-        return Response(status_code=400, content="Invalid update")
-
-    try:
-        await telegram_app.update_queue.put(update)
-    except Exception:
-        logger.exception("Failed to enqueue update")
-        return Response(status_code=500, content="Failed to process update")
-
-    return {"ok": True}
-
-# -------------------------
-# Lifecycle: create/start/stop telegram_app
-# -------------------------
 @app.post("/")
 async def webhook(request: Request):
     global telegram_app
@@ -420,16 +553,28 @@ async def webhook(request: Request):
         logger.exception("Failed to parse JSON from request")
         return Response(status_code=400, content="Invalid JSON")
 
+    # Telegram redelivers updates it thinks we missed; acknowledge repeats without re-running handlers
+    # (claimed before enqueueing so concurrent redeliveries cannot both pass; released on failure)
+    update_id = data.get("update_id") if isinstance(data, dict) else None
+    claimed = update_dedup is not None and isinstance(update_id, int)
+    if claimed and not update_dedup.claim(update_id):
+        logger.info(f"Duplicate update {update_id} acknowledged without processing")
+        return {"ok": True}
+
     try:
         update = Update.de_json(data, telegram_app.bot)
     except Exception:
         logger.exception("Failed to build Update from JSON")
+        if claimed:
+            update_dedup.release(update_id)
         return Response(status_code=400, content="Invalid update")
 
     try:
         await telegram_app.update_queue.put(update)
     except Exception:
         logger.exception("Failed to enqueue update")
+        if claimed:
+            update_dedup.release(update_id)
         return Response(status_code=500, content="Failed to process update")
 
     return {"ok": True}
@@ -437,9 +582,72 @@ async def webhook(request: Request):
 # -------------------------
 # Lifecycle: create/start/stop telegram_app
 # -------------------------
+# updates the handlers actually use; anything else is not worth a webhook call
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+WEBHOOK_RETRIES = 3
+
+async def _timed(timings: dict, name: str, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = time.perf_counter() - started
+
+def _init_farm_core(supabase_url: str, supabase_key: str) -> "FarmCore":
+    """Create FarmCore (inside core_singleton) and the write-behind outbox; runs in a worker thread."""
+    core = core_singleton.init_farm_core(supabase_url=supabase_url, supabase_key=supabase_key)
+    if core is None:
+        raise RuntimeError("Failed to initialize FarmCore")
+    core_singleton.init_outbox(os.getenv("OUTBOX_PATH", "farmbot_outbox.db"))
+    import api  # noqa: F401  (imported here, off the event loop; mounted by _mount_api)
+    return core
+
+def _mount_api() -> None:
+    from api import router
+    # a second startup of the same app (tests, reloads) must not register the routes twice
+    if not any(getattr(route, "path", "").startswith(router.prefix + "/") for route in app.router.routes):
+        app.include_router(router)
+
+def _build_telegram_app(token: str) -> Application:
+    from batching import PerUserUpdateProcessor
+    # farmers' updates run concurrently (one at a time per farmer) so their inserts can be batched
+    application = Application.builder().token(token).concurrent_updates(PerUserUpdateProcessor()).build()
+    register_handlers(application)
+    return application
+
+async def _start_invalidation_bus(bus: "InvalidationBus") -> None:
+    # runs in the background: a slow or unreachable Realtime endpoint must not delay startup
+    try:
+        await asyncio.wait_for(bus.start(), 10)
+    except Exception as e:
+        logger.warning("Cache invalidation bus not started: %s", e)
+
+async def _ensure_webhook(bot, url: str) -> bool:
+    """Call setWebhook only when Telegram's current URL or allowed updates differ. Returns True if it was set."""
+    for attempt in range(WEBHOOK_RETRIES):
+        try:
+            info = await bot.get_webhook_info()
+            if info.url == url and set(info.allowed_updates or ()) == set(ALLOWED_UPDATES):
+                logger.info("Telegram webhook already up to date")
+                return False
+            logger.info(f"Setting Telegram webhook to {url}...")
+            if await bot.set_webhook(url=url, allowed_updates=ALLOWED_UPDATES):
+                logger.info("Telegram webhook set successfully")
+                return True
+            logger.error(f"Failed to set webhook (attempt {attempt + 1})")
+        except Exception as e:
+            logger.error(f"Error setting Telegram webhook (attempt {attempt + 1}): {str(e)}")
+            if attempt == WEBHOOK_RETRIES - 1:
+                raise RuntimeError(f"Webhook setup failed: {str(e)}")
+        # short jittered backoff instead of a fixed second
+        await asyncio.sleep(random.uniform(0, 0.25 * 2 ** attempt))
+    raise RuntimeError("Failed to set Telegram webhook after retries")
+
 @app.on_event("startup")
 async def on_startup():
-    global telegram_app, farm_core
+    global telegram_app, farm_core, outbox_task, update_dedup, prober, invalidation_bus
+    started = time.perf_counter()
+    timings = {}
 
     # Read env vars explicitly and log masked presence
     SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -452,74 +660,83 @@ async def on_startup():
     if not SUPABASE_URL or not SUPABASE_KEY:
         logger.error("Missing SUPABASE_URL or SUPABASE_KEY environment variables")
         raise RuntimeError("Supabase configuration missing")
-
-    logger.info("Initializing FarmCore...")
-    try:
-        # initialize inside core_singleton (this sets core_singleton.farm_core)
-        core_singleton.init_farm_core(supabase_url=SUPABASE_URL, supabase_key=SUPABASE_KEY)
-
-        # IMPORTANT: update this module's farm_core reference to the newly-created instance
-        farm_core = core_singleton.farm_core
-
-        if farm_core is None:
-            logger.error("FarmCore initialization failed: farm_core is None")
-            raise RuntimeError("Failed to initialize FarmCore")
-        logger.info("FarmCore initialized successfully.")
-    except Exception as e:
-        logger.exception("Failed to initialize FarmCore: (see above)")
-        raise
-
     if not TELEGRAM_TOKEN:
         logger.error("Missing TELEGRAM_TOKEN environment variable")
         raise RuntimeError("Telegram bot token is required")
-
-    logger.info("Creating Telegram Application...")
-    try:
-        telegram_app = Application.builder().token(TELEGRAM_TOKEN).build()
-    except Exception as e:
-        logger.error(f"Failed to create Telegram Application: {str(e)}")
-        raise
-
-    logger.info("Registering handlers...")
-    register_handlers(telegram_app)
-
-    logger.info("Initializing Telegram Application...")
-    await telegram_app.initialize()
-
     if not WEBHOOK_URL:
         logger.error("Missing WEBHOOK_URL environment variable")
         raise RuntimeError("Webhook URL is required")
 
-    logger.info(f"Setting Telegram webhook to {WEBHOOK_URL}...")
-    async with httpx.AsyncClient() as client:
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = await client.post(
-                    f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/setWebhook",
-                    json={"url": WEBHOOK_URL}
-                )
-                result = response.json()
-                if result.get("ok"):
-                    logger.info("Telegram webhook set successfully")
-                    break
-                else:
-                    logger.error(f"Failed to set webhook (attempt {attempt + 1}): {result}")
-                    if attempt == max_retries - 1:
-                        raise RuntimeError("Failed to set Telegram webhook after retries")
-            except Exception as e:
-                logger.error(f"Error setting Telegram webhook (attempt {attempt + 1}): {str(e)}")
-                if attempt == max_retries - 1:
-                    raise RuntimeError(f"Webhook setup failed: {str(e)}")
-            await asyncio.sleep(1)
+    async def telegram_side() -> Application:
+        # handler imports + registration happen off the event loop, then getMe and the webhook check
+        application = await _timed(timings, "handlers", asyncio.to_thread(_build_telegram_app, TELEGRAM_TOKEN))
+        await _timed(timings, "telegram_init", application.initialize())
+        await _timed(timings, "webhook", _ensure_webhook(application.bot, WEBHOOK_URL))
+        return application
+
+    # the Supabase client and the Telegram side do not depend on each other
+    logger.info("Initializing FarmCore and Telegram Application...")
+    results = await asyncio.gather(
+        _timed(timings, "farm_core", asyncio.to_thread(_init_farm_core, SUPABASE_URL, SUPABASE_KEY)),
+        telegram_side(),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error("Startup failed", exc_info=result)
+            raise result
+    # IMPORTANT: keep this module's farm_core reference pointing at the core_singleton instance
+    farm_core, application = results
+    _mount_api()
+
+    # Durable write-behind outbox: handlers queue writes locally, this task replays them to Supabase
+    outbox_task = asyncio.create_task(core_singleton.outbox.run(farm_core))
+    # DEDUP_PATH (a SQLite file) shares seen update_ids between workers on this host
+    update_dedup = UpdateDeduplicator(path=os.getenv("DEDUP_PATH"))
+    # row changes made by other workers or directly in the database evict our cached reads;
+    # without the subscription the caches simply keep their short TTLs
+    if os.getenv("CACHE_INVALIDATION", "realtime") == "realtime":
+        from invalidation import RealtimeInvalidationBus
+        invalidation_bus = RealtimeInvalidationBus(SUPABASE_URL, SUPABASE_KEY)
+        invalidation_bus.attach(farm_core)
+        app.state.invalidation_bus = invalidation_bus  # table versions for the API's ETags
+        asyncio.create_task(_start_invalidation_bus(invalidation_bus))
 
     logger.info("Starting Telegram Application...")
-    await telegram_app.start()
-    logger.info("Telegram Application started.")
+    await _timed(timings, "telegram_start", application.start())
+    telegram_app = application
+    from health import HealthProber
+    prober = HealthProber(lambda: farm_core, lambda: telegram_app)
+    prober.start()
+    logger.info(
+        "Telegram Application started in %.2fs (%s)",
+        time.perf_counter() - started,
+        ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items()),
+    )
 
 @app.on_event("shutdown")
 async def on_shutdown():
-    global telegram_app
+    global telegram_app, outbox_task, update_dedup, prober, invalidation_bus
+    if prober is not None:
+        prober.stop()
+        prober = None
+    if invalidation_bus is not None:
+        await invalidation_bus.stop()
+        invalidation_bus = None
+        app.state.invalidation_bus = None
+    if update_dedup is not None:
+        update_dedup.close()
+        update_dedup = None
+    if outbox_task is not None:
+        outbox_task.cancel()
+        outbox_task = None
+        try:
+            # last attempt to push queued writes; anything left stays on disk for the next start
+            await asyncio.to_thread(core_singleton.outbox.flush_once, farm_core)
+        except Exception:
+            logger.exception("Final outbox flush failed")
+        core_singleton.outbox.close()
+        core_singleton.outbox = None
     if telegram_app is None:
         return
 
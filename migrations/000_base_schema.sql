@@ -0,0 +1,86 @@
+-- 000_base_schema.sql
+-- The tables the bot started with, as FarmCore uses them. The hosted project already has them
+-- (every statement is "if not exists"); this file lets a local or CI Postgres be built from
+-- migrations alone, e.g. for benchmarks/check_plans.py.
+
+create table if not exists farmers (
+    id uuid primary key default gen_random_uuid(),
+    telegram_id bigint not null,
+    name text,
+    phone text,
+    village text,
+    language text not null default 'ar',
+    created_at timestamptz not null default now(),
+    constraint farmers_telegram_id_key unique (telegram_id)
+);
+
+create table if not exists crops (
+    id uuid primary key default gen_random_uuid(),
+    farmer_id uuid not null references farmers (id) on delete cascade,
+    name text not null,
+    planting_date date,
+    notes text,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists harvests (
+    id uuid primary key default gen_random_uuid(),
+    crop_id uuid not null references crops (id) on delete cascade,
+    harvest_date date not null default current_date,
+    quantity numeric not null,
+    unit text not null default 'kg',
+    notes text,
+    status text not null default 'stored',     -- stored | delivered
+    created_at timestamptz not null default now()
+);
+
+create table if not exists deliveries (
+    id uuid primary key default gen_random_uuid(),
+    harvest_id uuid not null references harvests (id) on delete cascade,
+    delivery_date date not null default current_date,
+    collector_name text,
+    market text,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists payments (
+    id uuid primary key default gen_random_uuid(),
+    delivery_id uuid not null references deliveries (id) on delete cascade,
+    expected_date date,
+    expected_amount numeric,
+    paid_amount numeric,
+    paid_date date,
+    status text not null default 'pending',    -- pending | paid
+    created_at timestamptz not null default now()
+);
+
+create table if not exists expenses (
+    id uuid primary key default gen_random_uuid(),
+    farmer_id uuid not null references farmers (id) on delete cascade,
+    crop_id uuid references crops (id) on delete set null,
+    expense_date date not null default current_date,
+    category text,
+    amount numeric not null,
+    notes text,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists treatments (
+    id uuid primary key default gen_random_uuid(),
+    crop_id uuid not null references crops (id) on delete cascade,
+    treatment_date date not null default current_date,
+    product_name text,
+    cost numeric,
+    next_due_date date,
+    notes text,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists market_prices (
+    id uuid primary key default gen_random_uuid(),
+    crop_name text not null,
+    price_date date not null default current_date,
+    price_per_kg numeric not null,
+    source text,
+    created_at timestamptz not null default now()
+);
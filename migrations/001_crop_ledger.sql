@@ -0,0 +1,127 @@
+-- 001_crop_ledger.sql
+-- Per-crop running totals so "how much has this crop cost and earned" is a single-row read.
+-- Maintained by row triggers on expenses, treatments, harvests and payments; safe to re-run.
+-- Apply with: psql "$DATABASE_URL" -f migrations/001_crop_ledger.sql (or the Supabase SQL editor).
+
+create table if not exists crop_ledger (
+    crop_id uuid primary key references crops(id) on delete cascade,
+    total_cost numeric not null default 0,     -- expenses.amount + treatments.cost
+    harvested_qty numeric not null default 0,  -- all harvests.quantity
+    delivered_qty numeric not null default 0,  -- harvests.quantity where status = 'delivered'
+    paid_amount numeric not null default 0,    -- payments.paid_amount where status = 'paid'
+    updated_at timestamptz not null default now()
+);
+
+-- Add deltas to a crop's ledger row. Skips crops that no longer exist (e.g. during a cascading crop delete).
+create or replace function crop_ledger_apply(
+    p_crop_id uuid, p_cost numeric, p_harvested numeric, p_delivered numeric, p_paid numeric
+) returns void language sql as $$
+    insert into crop_ledger as l (crop_id, total_cost, harvested_qty, delivered_qty, paid_amount)
+    select p_crop_id, p_cost, p_harvested, p_delivered, p_paid
+    where p_crop_id is not null
+      and (p_cost <> 0 or p_harvested <> 0 or p_delivered <> 0 or p_paid <> 0)
+      and exists (select 1 from crops where id = p_crop_id)
+    on conflict (crop_id) do update set
+        total_cost = l.total_cost + excluded.total_cost,
+        harvested_qty = l.harvested_qty + excluded.harvested_qty,
+        delivered_qty = l.delivered_qty + excluded.delivered_qty,
+        paid_amount = l.paid_amount + excluded.paid_amount,
+        updated_at = now();
+$$;
+
+create or replace function crop_ledger_on_expense() returns trigger language plpgsql as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform crop_ledger_apply(old.crop_id, -coalesce(old.amount, 0), 0, 0, 0);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform crop_ledger_apply(new.crop_id, coalesce(new.amount, 0), 0, 0, 0);
+    end if;
+    return null;
+end $$;
+
+create or replace function crop_ledger_on_treatment() returns trigger language plpgsql as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform crop_ledger_apply(old.crop_id, -coalesce(old.cost, 0), 0, 0, 0);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform crop_ledger_apply(new.crop_id, coalesce(new.cost, 0), 0, 0, 0);
+    end if;
+    return null;
+end $$;
+
+create or replace function crop_ledger_on_harvest() returns trigger language plpgsql as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform crop_ledger_apply(
+            old.crop_id, 0, -coalesce(old.quantity, 0),
+            case when old.status = 'delivered' then -coalesce(old.quantity, 0) else 0 end, 0);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform crop_ledger_apply(
+            new.crop_id, 0, coalesce(new.quantity, 0),
+            case when new.status = 'delivered' then coalesce(new.quantity, 0) else 0 end, 0);
+    end if;
+    return null;
+end $$;
+
+create or replace function crop_ledger_on_payment() returns trigger language plpgsql as $$
+declare
+    v_crop_id uuid;
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.status = 'paid' then
+        select h.crop_id into v_crop_id
+        from deliveries d join harvests h on h.id = d.harvest_id
+        where d.id = old.delivery_id;
+        perform crop_ledger_apply(v_crop_id, 0, 0, 0, -coalesce(old.paid_amount, 0));
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.status = 'paid' then
+        select h.crop_id into v_crop_id
+        from deliveries d join harvests h on h.id = d.harvest_id
+        where d.id = new.delivery_id;
+        perform crop_ledger_apply(v_crop_id, 0, 0, 0, coalesce(new.paid_amount, 0));
+    end if;
+    return null;
+end $$;
+
+drop trigger if exists crop_ledger_expenses on expenses;
+create trigger crop_ledger_expenses after insert or update of amount, crop_id or delete on expenses
+    for each row execute function crop_ledger_on_expense();
+
+drop trigger if exists crop_ledger_treatments on treatments;
+create trigger crop_ledger_treatments after insert or update of cost, crop_id or delete on treatments
+    for each row execute function crop_ledger_on_treatment();
+
+drop trigger if exists crop_ledger_harvests on harvests;
+create trigger crop_ledger_harvests after insert or update of quantity, status, crop_id or delete on harvests
+    for each row execute function crop_ledger_on_harvest();
+
+drop trigger if exists crop_ledger_payments on payments;
+create trigger crop_ledger_payments after insert or update of paid_amount, status or delete on payments
+    for each row execute function crop_ledger_on_payment();
+
+-- Recompute every ledger row from the source tables (initial backfill, or to reconcile after manual fixes).
+create or replace function crop_ledger_rebuild() returns void language sql as $$
+    insert into crop_ledger (crop_id, total_cost, harvested_qty, delivered_qty, paid_amount, updated_at)
+    select c.id,
+           coalesce((select sum(amount) from expenses where crop_id = c.id), 0)
+             + coalesce((select sum(cost) from treatments where crop_id = c.id), 0),
+           coalesce((select sum(quantity) from harvests where crop_id = c.id), 0),
+           coalesce((select sum(quantity) from harvests where crop_id = c.id and status = 'delivered'), 0),
+           coalesce((select sum(p.paid_amount)
+                     from payments p
+                     join deliveries d on d.id = p.delivery_id
+                     join harvests h on h.id = d.harvest_id
+                     where h.crop_id = c.id and p.status = 'paid'), 0),
+           now()
+    from crops c
+    on conflict (crop_id) do update set
+        total_cost = excluded.total_cost,
+        harvested_qty = excluded.harvested_qty,
+        delivered_qty = excluded.delivered_qty,
+        paid_amount = excluded.paid_amount,
+        updated_at = excluded.updated_at;
+$$;
+
+select crop_ledger_rebuild();
@@ -0,0 +1,15 @@
+-- 002_broadcasts.sql
+-- Progress of admin market-price broadcasts so an interrupted fan-out can resume where it stopped.
+
+create table if not exists broadcasts (
+    id uuid primary key default gen_random_uuid(),
+    crop_name text not null,             -- one or more crop names separated by '|', e.g. 'Tomato|طماطم'
+    price_per_kg numeric not null,
+    price_date date not null default current_date,
+    status text not null default 'running',   -- running | done | failed
+    last_farmer_id uuid,                 -- keyset cursor: every farmer with a smaller id has been handled
+    sent integer not null default 0,
+    failed integer not null default 0,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
@@ -0,0 +1,13 @@
+-- 003_market_prices_unique.sql
+-- One price per (crop_name, price_date, source) so bulk ingestion can upsert instead of piling up duplicates.
+
+-- keep the most recently inserted row of any existing duplicates
+delete from market_prices a
+using market_prices b
+where a.crop_name = b.crop_name
+  and a.price_date = b.price_date
+  and a.source is not distinct from b.source
+  and a.ctid < b.ctid;
+
+create unique index if not exists market_prices_crop_date_source_key
+    on market_prices (crop_name, price_date, source);
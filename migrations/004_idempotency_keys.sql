@@ -0,0 +1,11 @@
+-- 004_idempotency_keys.sql
+-- Client-generated keys that let the bot's write outbox replay inserts safely (upsert ... ignore duplicates).
+
+alter table crops add column if not exists idempotency_key uuid;
+alter table expenses add column if not exists idempotency_key uuid;
+alter table treatments add column if not exists idempotency_key uuid;
+
+-- plain unique indexes (NULLs never conflict), usable as the ON CONFLICT target
+create unique index if not exists crops_idempotency_key_key on crops (idempotency_key);
+create unique index if not exists expenses_idempotency_key_key on expenses (idempotency_key);
+create unique index if not exists treatments_idempotency_key_key on treatments (idempotency_key);
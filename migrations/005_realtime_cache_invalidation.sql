@@ -0,0 +1,21 @@
+-- 005_realtime_cache_invalidation.sql
+-- Stream row changes of the cached tables to the bot workers (invalidation.py) over Supabase Realtime.
+
+-- DELETE/UPDATE events must carry the old row, otherwise workers cannot tell which cache keys it fed
+alter table farmers replica identity full;
+alter table crops replica identity full;
+alter table market_prices replica identity full;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['farmers', 'crops', 'market_prices'] loop
+        if not exists (
+            select 1 from pg_publication_tables
+            where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = t
+        ) then
+            execute format('alter publication supabase_realtime add table public.%I', t);
+        end if;
+    end loop;
+end $$;
@@ -0,0 +1,20 @@
+-- 006_treatment_plans.sql
+-- Recurring treatments ("spray every 10 days"). Only the rule is stored; FarmCore computes the
+-- due dates for whatever window it is asked about (plan_occurrences).
+
+create table if not exists treatment_plans (
+    id uuid primary key default gen_random_uuid(),
+    crop_id uuid not null references crops (id) on delete cascade,
+    product_name text not null,
+    interval_days integer not null check (interval_days > 0),
+    start_date date not null,
+    end_date date,
+    cost numeric,
+    notes text,
+    idempotency_key uuid,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists treatment_plans_crop_id_idx on treatment_plans (crop_id, start_date);
+-- the write outbox replays plans with upsert ... on conflict (idempotency_key) do nothing
+create unique index if not exists treatment_plans_idempotency_key_key on treatment_plans (idempotency_key);
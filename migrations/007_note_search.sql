@@ -0,0 +1,60 @@
+-- 007_note_search.sql
+-- Ranked search over crops/harvests/treatments notes (FarmCore.search_notes, /search).
+-- Trigram GIN indexes on the normalized text are maintained by Postgres on every write.
+
+create extension if not exists pg_trgm;
+
+-- SQL twin of farmcore.normalize_text: NFKC, drop Arabic marks/tatweel, fold letter variants
+-- and Arabic-Indic digits, lower-case, collapse whitespace. Must stay immutable for the indexes.
+create or replace function farmbot_normalize(t text) returns text
+language sql immutable parallel safe as $$
+    select btrim(regexp_replace(
+        lower(translate(
+            regexp_replace(normalize(coalesce(t, ''), NFKC), '[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]', '', 'g'),
+            'أإآٱىئؤة،؛٫٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹',
+            'ااااييوه,;.01234567890123456789'
+        )),
+        '\s+', ' ', 'g'
+    ))
+$$;
+
+create index if not exists crops_notes_trgm_idx
+    on crops using gin (farmbot_normalize(notes) gin_trgm_ops) where notes is not null;
+create index if not exists harvests_notes_trgm_idx
+    on harvests using gin (farmbot_normalize(notes) gin_trgm_ops) where notes is not null;
+create index if not exists treatments_notes_trgm_idx
+    on treatments using gin (farmbot_normalize(notes) gin_trgm_ops) where notes is not null;
+
+-- Fuzzy word match (typos, partial words) or plain substring (short queries), best matches first.
+create or replace function search_notes(p_farmer_id uuid, p_query text, p_limit integer default 20)
+returns table (kind text, id uuid, crop_id uuid, crop_name text, notes text, record_date date, score real)
+language sql stable
+set pg_trgm.word_similarity_threshold = 0.4
+as $$
+    with q as (
+        select farmbot_normalize(p_query) as q,
+               '%' || replace(replace(replace(farmbot_normalize(p_query), '\', '\\'), '%', '\%'), '_', '\_') || '%' as pattern
+    )
+    select r.* from (
+        select 'crop'::text as kind, c.id, c.id as crop_id, c.name as crop_name, c.notes, c.planting_date as record_date,
+               word_similarity(q.q, farmbot_normalize(c.notes)) as score
+        from crops c, q
+        where c.farmer_id = p_farmer_id and c.notes is not null
+          and (q.q <% farmbot_normalize(c.notes) or farmbot_normalize(c.notes) like q.pattern)
+        union all
+        select 'harvest', h.id, h.crop_id, c.name, h.notes, h.harvest_date,
+               word_similarity(q.q, farmbot_normalize(h.notes))
+        from harvests h join crops c on c.id = h.crop_id, q
+        where c.farmer_id = p_farmer_id and h.notes is not null
+          and (q.q <% farmbot_normalize(h.notes) or farmbot_normalize(h.notes) like q.pattern)
+        union all
+        select 'treatment', t.id, t.crop_id, c.name, t.notes, t.treatment_date,
+               word_similarity(q.q, farmbot_normalize(t.notes))
+        from treatments t join crops c on c.id = t.crop_id, q
+        where c.farmer_id = p_farmer_id and t.notes is not null
+          and (q.q <% farmbot_normalize(t.notes) or farmbot_normalize(t.notes) like q.pattern)
+    ) r
+    where exists (select 1 from q where q.q <> '')
+    order by r.score desc, r.record_date desc nulls last
+    limit least(greatest(p_limit, 1), 100)
+$$;
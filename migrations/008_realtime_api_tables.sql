@@ -0,0 +1,18 @@
+-- 008_realtime_api_tables.sql
+-- The dashboard API (api.py) derives ETags from per-table change counters kept by the
+-- invalidation bus, so it needs change events for these tables too. Only the fact that a
+-- row changed matters here, so the default replica identity is enough.
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['harvests', 'deliveries', 'payments'] loop
+        if not exists (
+            select 1 from pg_publication_tables
+            where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = t
+        ) then
+            execute format('alter publication supabase_realtime add table public.%I', t);
+        end if;
+    end loop;
+end $$;
@@ -0,0 +1,152 @@
+-- 009_cold_archive.sql
+-- Hot/cold tiering: closed records move out of harvests/deliveries/payments/expenses/treatments
+-- into *_archive tables with the same columns. FarmCore reads the hot tables by default and
+-- reads the archive only when asked (include_archived=True: /export, /report, history "All").
+--
+-- Declarative range partitioning is not used: deliveries and payments reference harvests(id)
+-- and deliveries(id), and a foreign key into a partitioned table needs the partition key in
+-- the referenced unique key, i.e. changing every primary key to (id, date).
+
+create table if not exists harvests_archive (like harvests including defaults including constraints including indexes);
+create table if not exists deliveries_archive (like deliveries including defaults including constraints including indexes);
+create table if not exists payments_archive (like payments including defaults including constraints including indexes);
+create table if not exists expenses_archive (like expenses including defaults including constraints including indexes);
+create table if not exists treatments_archive (like treatments including defaults including constraints including indexes);
+
+-- same relationships as the hot tables, so PostgREST can embed crops / the delivery chain
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'harvests_archive_crop_id_fkey') then
+        alter table harvests_archive add constraint harvests_archive_crop_id_fkey
+            foreign key (crop_id) references crops (id) on delete cascade;
+        alter table deliveries_archive add constraint deliveries_archive_harvest_id_fkey
+            foreign key (harvest_id) references harvests_archive (id) on delete cascade;
+        alter table payments_archive add constraint payments_archive_delivery_id_fkey
+            foreign key (delivery_id) references deliveries_archive (id) on delete cascade;
+        alter table expenses_archive add constraint expenses_archive_farmer_id_fkey
+            foreign key (farmer_id) references farmers (id) on delete cascade;
+        alter table expenses_archive add constraint expenses_archive_crop_id_fkey
+            foreign key (crop_id) references crops (id) on delete set null;
+        alter table treatments_archive add constraint treatments_archive_crop_id_fkey
+            foreign key (crop_id) references crops (id) on delete cascade;
+    end if;
+end $$;
+
+create index if not exists harvests_archive_crop_date_idx on harvests_archive (crop_id, harvest_date, id);
+create index if not exists deliveries_archive_harvest_idx on deliveries_archive (harvest_id);
+create index if not exists payments_archive_delivery_idx on payments_archive (delivery_id);
+create index if not exists expenses_archive_farmer_date_idx on expenses_archive (farmer_id, expense_date, id);
+create index if not exists treatments_archive_crop_date_idx on treatments_archive (crop_id, treatment_date, id);
+
+-- Archiving is a move, not a deletion: the crop ledger keeps lifetime totals, so its triggers
+-- skip deletes made while farmbot.archiving is set (only archive_closed_records sets it).
+drop trigger if exists crop_ledger_expenses on expenses;
+create trigger crop_ledger_expenses after insert or update of amount, crop_id or delete on expenses
+    for each row when (current_setting('farmbot.archiving', true) is distinct from 'on')
+    execute function crop_ledger_on_expense();
+
+drop trigger if exists crop_ledger_treatments on treatments;
+create trigger crop_ledger_treatments after insert or update of cost, crop_id or delete on treatments
+    for each row when (current_setting('farmbot.archiving', true) is distinct from 'on')
+    execute function crop_ledger_on_treatment();
+
+drop trigger if exists crop_ledger_harvests on harvests;
+create trigger crop_ledger_harvests after insert or update of quantity, status, crop_id or delete on harvests
+    for each row when (current_setting('farmbot.archiving', true) is distinct from 'on')
+    execute function crop_ledger_on_harvest();
+
+drop trigger if exists crop_ledger_payments on payments;
+create trigger crop_ledger_payments after insert or update of paid_amount, status or delete on payments
+    for each row when (current_setting('farmbot.archiving', true) is distinct from 'on')
+    execute function crop_ledger_on_payment();
+
+-- Move closed records dated before p_cutoff to the archive:
+--   * a delivered harvest together with its deliveries and payments, once every payment is paid
+--     before the cutoff (a harvest still waiting for money stays hot);
+--   * expenses, and treatments with no follow-up due after the cutoff.
+-- Only one caller runs at a time (advisory lock); the others return no rows.
+create or replace function archive_closed_records(p_cutoff date default (current_date - interval '18 months')::date)
+returns table (kind text, moved bigint)
+language plpgsql as $$
+declare
+    v_harvests bigint; v_deliveries bigint; v_payments bigint; v_expenses bigint; v_treatments bigint;
+begin
+    if not pg_try_advisory_xact_lock(hashtext('farmbot.archive_closed_records')) then
+        return;
+    end if;
+    perform set_config('farmbot.archiving', 'on', true);
+
+    create temporary table closed_harvests on commit drop as
+    select h.id from harvests h
+    where h.harvest_date < p_cutoff
+      and h.status = 'delivered'
+      and exists (select 1 from deliveries d where d.harvest_id = h.id)
+      and not exists (
+          select 1 from deliveries d join payments p on p.delivery_id = d.id
+          where d.harvest_id = h.id and (p.status <> 'paid' or p.paid_date is null or p.paid_date >= p_cutoff)
+      )
+      and not exists (
+          select 1 from deliveries d
+          where d.harvest_id = h.id and not exists (select 1 from payments p where p.delivery_id = d.id)
+      );
+
+    -- parents first into the archive (its foreign keys point at archived rows), children first out of the hot tables
+    insert into harvests_archive select h.* from harvests h join closed_harvests c using (id);
+    get diagnostics v_harvests = row_count;
+    insert into deliveries_archive select d.* from deliveries d join closed_harvests c on c.id = d.harvest_id;
+    get diagnostics v_deliveries = row_count;
+    insert into payments_archive
+    select p.* from payments p join deliveries d on d.id = p.delivery_id join closed_harvests c on c.id = d.harvest_id;
+    get diagnostics v_payments = row_count;
+
+    delete from payments p using deliveries d, closed_harvests c where p.delivery_id = d.id and d.harvest_id = c.id;
+    delete from deliveries d using closed_harvests c where d.harvest_id = c.id;
+    delete from harvests h using closed_harvests c where h.id = c.id;
+
+    with moved_rows as (delete from expenses where expense_date < p_cutoff returning *)
+    insert into expenses_archive select * from moved_rows;
+    get diagnostics v_expenses = row_count;
+
+    with moved_rows as (
+        delete from treatments
+        where treatment_date < p_cutoff and (next_due_date is null or next_due_date < p_cutoff)
+        returning *
+    )
+    insert into treatments_archive select * from moved_rows;
+    get diagnostics v_treatments = row_count;
+
+    return query values ('harvests', v_harvests), ('deliveries', v_deliveries), ('payments', v_payments),
+                        ('expenses', v_expenses), ('treatments', v_treatments);
+end $$;
+
+-- Ledger rebuilds must count both tiers now.
+create or replace function crop_ledger_rebuild() returns void language sql as $$
+    insert into crop_ledger (crop_id, total_cost, harvested_qty, delivered_qty, paid_amount, updated_at)
+    select c.id,
+           coalesce((select sum(amount) from (select amount from expenses where crop_id = c.id
+                                              union all select amount from expenses_archive where crop_id = c.id) e), 0)
+             + coalesce((select sum(cost) from (select cost from treatments where crop_id = c.id
+                                                union all select cost from treatments_archive where crop_id = c.id) t), 0),
+           coalesce((select sum(quantity) from (select quantity from harvests where crop_id = c.id
+                                                union all select quantity from harvests_archive where crop_id = c.id) h), 0),
+           coalesce((select sum(quantity) from (select quantity from harvests where crop_id = c.id and status = 'delivered'
+                                                union all select quantity from harvests_archive where crop_id = c.id and status = 'delivered') h), 0),
+           coalesce((select sum(paid_amount) from (
+                        select p.paid_amount from payments p
+                        join deliveries d on d.id = p.delivery_id
+                        join harvests h on h.id = d.harvest_id
+                        where h.crop_id = c.id and p.status = 'paid'
+                        union all
+                        select p.paid_amount from payments_archive p
+                        join deliveries_archive d on d.id = p.delivery_id
+                        join harvests_archive h on h.id = d.harvest_id
+                        where h.crop_id = c.id and p.status = 'paid') p), 0),
+           now()
+    from crops c
+    on conflict (crop_id) do update set
+        total_cost = excluded.total_cost,
+        harvested_qty = excluded.harvested_qty,
+        delivered_qty = excluded.delivered_qty,
+        paid_amount = excluded.paid_amount,
+        updated_at = excluded.updated_at;
+$$;
@@ -0,0 +1,44 @@
+-- 010_query_indexes.sql
+-- Composite and partial indexes for the filters/orderings FarmCore actually sends
+-- (checked with: python -m benchmarks.check_plans). On a large live project consider running
+-- each statement by hand as "create index concurrently" instead, outside a transaction.
+
+-- get_farmer: telegram_id equality; usually already covered by a unique constraint
+do $$
+begin
+    if not exists (
+        select 1 from pg_index i join pg_attribute a on a.attrelid = i.indrelid and a.attnum = i.indkey[0]
+        where i.indrelid = 'farmers'::regclass and a.attname = 'telegram_id'
+    ) then
+        create index farmers_telegram_id_idx on farmers (telegram_id);
+    end if;
+end $$;
+
+-- get_farmer_crops / get_farmer_crops_page: farmer_id = ? order by planting_date, id
+create index if not exists crops_farmer_planting_idx on crops (farmer_id, planting_date, id);
+
+-- get_farmers_growing_page (broadcast targeting): crops.name ilike ..., no farmer filter;
+-- a btree cannot serve ilike, pg_trgm (007) can
+create index if not exists crops_name_trgm_idx on crops using gin (name gin_trgm_ops);
+
+-- every farmer-scoped harvest read goes crops(farmer_id) -> harvests(crop_id), ordered by date
+-- (history, export, report, weekly summary)
+create index if not exists harvests_crop_date_idx on harvests (crop_id, harvest_date, id);
+-- get_stored_harvests: status = 'stored' + crops.farmer_id
+create index if not exists harvests_stored_crop_idx on harvests (crop_id) where status = 'stored';
+
+-- deliveries/payments are reached through their parent (embeds, ledger trigger, pending payments)
+create index if not exists deliveries_harvest_date_idx on deliveries (harvest_id, delivery_date);
+-- (payments_delivery_expected_idx also serves get_pending_payments: status = 'pending' is filtered per delivery)
+create index if not exists payments_delivery_expected_idx on payments (delivery_id, expected_date);
+
+-- expenses by farmer and date (weekly summary, history, export); crop_id for the ledger and FK
+create index if not exists expenses_farmer_date_idx on expenses (farmer_id, expense_date, id);
+create index if not exists expenses_crop_idx on expenses (crop_id);
+
+-- treatments: history by date, and get_upcoming_treatments' next_due_date range
+create index if not exists treatments_crop_date_idx on treatments (crop_id, treatment_date, id);
+create index if not exists treatments_crop_next_due_idx on treatments (crop_id, next_due_date) where next_due_date is not null;
+
+-- get_market_prices() without a crop: newest first (per-crop reads use the 003 unique index)
+create index if not exists market_prices_date_idx on market_prices (price_date desc, id);
@@ -0,0 +1,202 @@
+# outbox.py
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from postgrest.exceptions import APIError
+from farmcore import FarmCore
+from resilience import FarmCoreUnavailable
+
+logger = logging.getLogger("outbox")
+
+# outbox method -> (table, FarmCore row builder)
+WRITE_METHODS = {
+    "add_crop": ("crops", FarmCore.crop_row),
+    "add_harvest": ("harvests", FarmCore.harvest_row),
+    "add_expense": ("expenses", FarmCore.expense_row),
+    "add_treatment": ("treatments", FarmCore.treatment_row),
+    "add_treatment_plan": ("treatment_plans", FarmCore.treatment_plan_row),
+}
+
+FLUSH_INTERVAL = 0.5     # seconds between flush attempts when idle
+FLUSH_BATCH_SIZE = 200   # rows read per flush
+MAX_ATTEMPTS = 20        # after this many failed replays a row is parked as dead
+RETRY_BASE = 2.0         # a failed row waits RETRY_BASE * 2**(attempts - 1) seconds before its next replay,
+RETRY_MAX = 3600.0       # capped at RETRY_MAX: 20 attempts span about 10 hours
+
+class WriteOutbox:
+    """
+    Durable write-behind queue for farmer writes, stored in SQLite (WAL mode).
+    Handlers submit() and confirm immediately; a background flusher replays entries in
+    order, batching consecutive rows for the same table into one idempotent insert.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._flushed_total = 0
+        self._failed_flushes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                dead INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if "next_attempt_at" not in columns:  # outbox files created before retries backed off
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN next_attempt_at REAL NOT NULL DEFAULT 0")
+        logger.info("Outbox opened at %s (depth=%s)", path, self.stats()["depth"])
+
+    def submit(self, method: str, **kwargs) -> str:
+        """Queue a FarmCore write (e.g. submit("add_expense", farmer_id=..., ...)); returns its idempotency key."""
+        table, build_row = WRITE_METHODS[method]
+        row = build_row(**kwargs)
+        row["idempotency_key"] = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outbox (tbl, payload, created_at) VALUES (?, ?, ?)",
+                (table, json.dumps(row, default=str), time.time()),
+            )
+        if self._wake is not None:
+            self._wake.set()
+        return row["idempotency_key"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            depth, oldest = self._conn.execute("SELECT COUNT(*), MIN(created_at) FROM outbox WHERE dead = 0").fetchone()
+            dead = self._conn.execute("SELECT COUNT(*) FROM outbox WHERE dead = 1").fetchone()[0]
+            retrying = self._conn.execute("SELECT COUNT(*) FROM outbox WHERE dead = 0 AND attempts > 0").fetchone()[0]
+        return {
+            "depth": depth,
+            "retrying": retrying,
+            "lag_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+            "dead": dead,
+            "flushed_total": self._flushed_total,
+            "failed_flushes": self._failed_flushes,
+        }
+
+    def flush_once(self, farm_core: FarmCore, batch_size: int = FLUSH_BATCH_SIZE) -> int:
+        """
+        Replay up to batch_size queued rows in order. Stops at an outage. When the database
+        rejects a batch, its rows are replayed one by one and only the rejected row is charged
+        an attempt, so one bad row neither blocks nor dead-letters the rows queued behind it.
+        A charged row is skipped until its backoff (see RETRY_BASE) has passed.
+        Returns rows flushed.
+        """
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT id, tbl, payload FROM outbox WHERE dead = 0 AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), batch_size),
+            ).fetchall()
+        flushed = 0
+        i = 0
+        while i < len(entries):
+            table = entries[i][1]
+            run: List = []
+            while i < len(entries) and entries[i][1] == table:
+                run.append(entries[i])
+                i += 1
+            try:
+                farm_core.insert_idempotent(table, [json.loads(e[2]) for e in run])
+            except FarmCoreUnavailable as e:
+                # outage: keep the rows as they are and try again later, without spending attempts
+                self._failed_flushes += 1
+                logger.info("Outbox flush postponed, Supabase unavailable: %s", e)
+                break
+            except APIError as e:
+                self._failed_flushes += 1
+                if len(run) == 1:
+                    self._charge_attempt(run[0][0], e)
+                    continue
+                logger.warning("Outbox flush of %d %s rows rejected (%s); replaying row by row", len(run), table, e)
+                done, complete = self._flush_rows(farm_core, table, run)
+                flushed += done
+                if not complete:
+                    break
+                continue
+            except Exception as e:
+                self._failed_flushes += 1
+                logger.warning("Outbox flush of %d %s rows failed: %s", len(run), table, e)
+                for entry in run:
+                    self._charge_attempt(entry[0], e)
+                break
+            self._delete([e[0] for e in run])
+            flushed += len(run)
+        self._flushed_total += flushed
+        return flushed
+
+    def _flush_rows(self, farm_core: FarmCore, table: str, run: List) -> Tuple[int, bool]:
+        """Replay a rejected run one row at a time. Returns (rows flushed, False if an outage cut it short)."""
+        flushed = 0
+        for entry_id, _, payload in run:
+            try:
+                farm_core.insert_idempotent(table, [json.loads(payload)])
+            except FarmCoreUnavailable as e:
+                logger.info("Outbox flush postponed, Supabase unavailable: %s", e)
+                return flushed, False
+            except APIError as e:
+                self._charge_attempt(entry_id, e)
+                continue
+            self._delete([entry_id])
+            flushed += 1
+        return flushed, True
+
+    def _charge_attempt(self, entry_id: int, error: Exception) -> None:
+        with self._lock:
+            row = self._conn.execute("SELECT attempts, tbl, payload FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return
+            attempts, table, payload = row[0] + 1, row[1], row[2]
+            dead = attempts >= MAX_ATTEMPTS
+            delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+            self._conn.execute(
+                "UPDATE outbox SET attempts = ?, last_error = ?, dead = ?, next_attempt_at = ? WHERE id = ?",
+                (attempts, str(error)[:500], int(dead), time.time() + delay, entry_id),
+            )
+        if dead:
+            # the farmer was told this write succeeded; it now needs a person
+            logger.error("Outbox row %s for %s dead after %d attempts (%s): %s", entry_id, table, attempts, error, payload)
+        else:
+            logger.warning("Outbox row %s rejected (attempt %d, retry in %.0fs): %s", entry_id, attempts, delay, error)
+
+    def _delete(self, ids: List[int]) -> None:
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            self._conn.execute(f"DELETE FROM outbox WHERE id IN ({marks})", ids)
+
+    async def run(self, farm_core: FarmCore, interval: float = FLUSH_INTERVAL) -> None:
+        """Background flusher: drains the queue, then sleeps until interval passes or a new write arrives."""
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                flushed = await asyncio.to_thread(self.flush_once, farm_core)
+            except Exception:
+                logger.exception("Outbox flusher error")
+                flushed = 0
+            if flushed >= FLUSH_BATCH_SIZE:
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,185 @@
+# profiling.py
+import asyncio
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import tempfile
+import time
+from typing import Dict, Optional, Set
+from telegram import Update
+from telegram.ext import ContextTypes
+from aboutadmin import is_admin
+from logging_setup import iter_callback_handlers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 300   # seconds a /profile session stays on unless stopped earlier
+MAX_WINDOW = 3600
+SUMMARY_LINES = 25
+
+class _Session:
+    """One /profile start..stop window: its own profile, call counts and count of callbacks in flight."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.calls: Dict[str, int] = {}
+        self.active = 0
+
+class HandlerProfiler:
+    """
+    Deterministic (cProfile) profiling of registered handler callbacks, switched on for a time window.
+    Callbacks are swapped for profiling wrappers only while a session is active and restored
+    afterwards, so a disabled profiler adds no work to any update.
+
+    The event loop is single-threaded: the profiler is enabled while at least one selected callback
+    is running, so coroutines interleaved with it show up too. Work sent to asyncio.to_thread runs
+    on other threads and is not captured. Each wrapper keeps a reference to its own session, so
+    callbacks still in flight after stop() finish against the profile they enabled.
+    """
+
+    def __init__(self):
+        self.session: Optional[_Session] = None
+        self.names: Set[str] = set()
+        self.started_at: Optional[float] = None
+        self._originals = {}
+        self._timer = None
+
+    @property
+    def running(self) -> bool:
+        return self.started_at is not None
+
+    @property
+    def busy(self) -> bool:
+        """A session is running, or a stopped one still has callbacks in flight (only one profiler can be enabled)."""
+        return self.running or (self.session is not None and self.session.active > 0)
+
+    @staticmethod
+    def _wrap(callback, session: _Session):
+        @functools.wraps(callback)
+        async def profiled(update, context):
+            session.calls[callback.__name__] = session.calls.get(callback.__name__, 0) + 1
+            if session.active == 0:
+                session.profile.enable()
+            session.active += 1
+            try:
+                return await callback(update, context)
+            finally:
+                session.active -= 1
+                if session.active == 0:
+                    session.profile.disable()
+        return profiled
+
+    def start(self, application, seconds: float = DEFAULT_WINDOW, names: Optional[Set[str]] = None) -> int:
+        """
+        Begin a session for all callbacks (or only those named). Returns how many handlers were wrapped.
+        Raises RuntimeError while another session is busy.
+        """
+        if self.busy:
+            raise RuntimeError("A profiling session is already running")
+        session = _Session()
+        self.names = set(names or ())
+        wrappers = {}
+        for group in application.handlers.values():
+            for handler in iter_callback_handlers(group):
+                name = getattr(handler.callback, "__name__", "")
+                if name == "profile_command" or (self.names and name not in self.names):
+                    continue
+                self._originals[handler] = handler.callback
+                if handler.callback not in wrappers:
+                    wrappers[handler.callback] = self._wrap(handler.callback, session)
+                handler.callback = wrappers[handler.callback]
+        if not self._originals:
+            return 0
+        self.session = session
+        self.started_at = time.time()
+        self._timer = asyncio.get_running_loop().call_later(seconds, self.stop)
+        logger.info("Profiling %d handlers for %ss", len(self._originals), seconds)
+        return len(self._originals)
+
+    def stop(self) -> None:
+        """End the session and restore the original callbacks; collected stats are kept for dump()."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for handler, callback in self._originals.items():
+            handler.callback = callback
+        if self._originals:
+            logger.info("Profiling stopped")
+        self._originals = {}
+        self.started_at = None
+
+    def _collected(self) -> bool:
+        # pstats needs a profile that is not enabled and has seen at least one callback
+        return self.session is not None and self.session.calls and self.session.active == 0
+
+    def summary(self, limit: int = SUMMARY_LINES) -> str:
+        if self.session is not None and self.session.active:
+            return "Callbacks are running; try again in a moment."
+        if not self._collected():
+            return "No profile collected yet."
+        out = io.StringIO()
+        stats = pstats.Stats(self.session.profile, stream=out)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+        calls = ", ".join(f"{n}×{c}" for n, c in sorted(self.session.calls.items(), key=lambda kv: -kv[1]))
+        return f"Calls: {calls}\n\n{out.getvalue()}"
+
+    def dump(self, path: str) -> bool:
+        """Write the aggregated stats as a pstats file (load with pstats.Stats / snakeviz)."""
+        if not self._collected():
+            return False
+        pstats.Stats(self.session.profile).dump_stats(path)
+        return True
+
+profiler = HandlerProfiler()
+
+# ----------------------
+# /profile (admin only)
+# ----------------------
+PROFILE_USAGE = (
+    "Usage:\n"
+    "/profile start [seconds] [handler ...] — profile all or the named handlers\n"
+    "/profile stop — stop early\n"
+    "/profile status — summary of what was collected\n"
+    "/profile dump — download the pstats file"
+)
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not is_admin(update.effective_user.id):
+        return
+    args = context.args or []
+    action = args[0].lower() if args else "status"
+
+    if action == "start":
+        seconds, names = DEFAULT_WINDOW, args[1:]
+        if names and names[0].isdigit():
+            seconds, names = min(int(names[0]), MAX_WINDOW), names[1:]
+        if profiler.busy:
+            await update.message.reply_text("A profiling session is already running. /profile stop first.")
+            return
+        count = profiler.start(context.application, seconds, set(names))
+        if not count:
+            await update.message.reply_text("No registered handler matches those names.")
+            return
+        await update.message.reply_text(f"Profiling {count} handlers for {seconds}s. /profile dump when done.")
+    elif action == "stop":
+        profiler.stop()
+        await update.message.reply_text("Profiling stopped. /profile dump to download.")
+    elif action == "status":
+        state = f"running since {time.strftime('%H:%M:%S', time.localtime(profiler.started_at))}" if profiler.running else "not running"
+        await update.message.reply_text(f"Profiler {state}.\n\n{profiler.summary()}"[:4000])
+    elif action == "dump":
+        fd, path = tempfile.mkstemp(suffix=".pstats")
+        os.close(fd)
+        try:
+            if not profiler.dump(path):
+                await update.message.reply_text("No profile collected yet.")
+                return
+            with open(path, "rb") as f:
+                await update.message.reply_document(f, filename=f"farmbot_{int(time.time())}.pstats")
+        finally:
+            os.remove(path)
+    else:
+        await update.message.reply_text(PROFILE_USAGE)
@@ -0,0 +1,247 @@
+# resilience.py
+import asyncio
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger("resilience")
+
+CALL_TIMEOUT = float(os.getenv("SUPABASE_CALL_TIMEOUT", "5"))   # seconds per HTTP request
+CALL_DEADLINE = float(os.getenv("SUPABASE_CALL_DEADLINE", "8"))  # seconds per FarmCore call, retries included
+READ_ATTEMPTS = 3
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 2.0
+BREAKER_THRESHOLD = 5      # consecutive outage errors before the circuit opens
+BREAKER_RESET_AFTER = 30   # seconds before a trial call is let through
+
+# PostgREST codes meaning "the database is not reachable", plus gateway statuses
+# (postgrest reports the HTTP status as the code when the body is not JSON)
+_UNAVAILABLE_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003", "500", "502", "503", "504"}
+_TIMEOUT_CODES = {"57014"}  # statement_timeout / query_canceled
+
+# ----------------------
+# Errors
+# ----------------------
+class FarmCoreError(Exception):
+    """Base class for FarmCore infrastructure errors (not raised for "row not found")."""
+
+class FarmCoreUnavailable(FarmCoreError):
+    """Supabase could not be reached or answered with a server/gateway error."""
+
+class FarmCoreTimeout(FarmCoreUnavailable):
+    """The call did not finish within its deadline."""
+
+class CircuitOpenError(FarmCoreUnavailable):
+    """Recent calls kept failing; the call was rejected without contacting Supabase."""
+
+def classify(exc: BaseException) -> Optional[FarmCoreUnavailable]:
+    """Map transport / server errors to FarmCoreUnavailable; None for errors that are the caller's fault."""
+    if isinstance(exc, FarmCoreUnavailable):
+        return exc
+    if isinstance(exc, httpx.TimeoutException):
+        return FarmCoreTimeout(str(exc) or "request timed out")
+    if isinstance(exc, httpx.TransportError):
+        return FarmCoreUnavailable(str(exc) or exc.__class__.__name__)
+    if isinstance(exc, APIError):
+        if exc.code in _TIMEOUT_CODES:
+            return FarmCoreTimeout(exc.message or "statement timeout")
+        if exc.code in _UNAVAILABLE_CODES:
+            return FarmCoreUnavailable(f"{exc.code}: {exc.message}")
+    return None
+
+# ----------------------
+# Circuit breaker
+# ----------------------
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `reset_after` seconds one trial call decides."""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_after: float = BREAKER_RESET_AFTER):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_after or self._trial_running:
+                raise CircuitOpenError("Supabase circuit is open")
+            self._trial_running = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Supabase circuit closed")
+            self.failures, self.opened_at, self._trial_running = 0, None, False
+
+    def release_trial(self) -> None:
+        """The trial call failed for a reason unrelated to Supabase; let the next call try instead."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning("Supabase circuit opened after %d failures", self.failures)
+                self.opened_at = time.monotonic()
+
+# ----------------------
+# TTL cache with a stale window
+# ----------------------
+class TTLCache:
+    """
+    Entries are fresh for `ttl` seconds and may be served as stale for `stale_for` more seconds
+    when Supabase is unavailable. Keys are tuples; invalidate() drops every key with a given prefix.
+    """
+
+    def __init__(self, ttl: float, stale_for: float = 0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.stale_for = stale_for
+        self.max_entries = max_entries
+        self._data: Dict[Tuple, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, allow_stale: bool = False) -> Tuple[bool, Any]:
+        with self._lock:
+            hit = self._data.get(key)
+        if hit is None:
+            return False, None
+        age = time.monotonic() - hit[0]
+        if age <= self.ttl or (allow_stale and age <= self.ttl + self.stale_for):
+            return True, hit[1]
+        return False, None
+
+    def set(self, key: Tuple, value: Any) -> None:
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                # drop the oldest tenth rather than tracking LRU order
+                for k, _ in sorted(self._data.items(), key=lambda kv: kv[1][0])[: self.max_entries // 10 or 1]:
+                    del self._data[k]
+            self._data[key] = (time.monotonic(), value)
+
+    def invalidate(self, *prefix: Hashable) -> None:
+        with self._lock:
+            for k in [k for k in self._data if k[: len(prefix)] == prefix]:
+                del self._data[k]
+
+    def invalidate_where(self, predicate: Callable[[Tuple], bool]) -> int:
+        """Drop every key the predicate accepts; returns how many were dropped."""
+        with self._lock:
+            doomed = [k for k in self._data if predicate(k)]
+            for k in doomed:
+                del self._data[k]
+        return len(doomed)
+
+# ----------------------
+# Decorator for FarmCore methods
+# ----------------------
+def _backoff(attempt: int) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+# deadline of the FarmCore call running on this thread; read by cap_request_timeout()
+_call_deadline = threading.local()
+
+def cap_request_timeout(request: httpx.Request) -> None:
+    """
+    httpx request hook (installed on the PostgREST session by FarmCore): each HTTP attempt gets
+    at most the time left before the surrounding call's deadline, so retries cannot stretch a
+    call past CALL_DEADLINE.
+    """
+    deadline = getattr(_call_deadline, "value", None)
+    if deadline is None:
+        return
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise FarmCoreTimeout("call deadline exceeded")
+    request.extensions["timeout"] = httpx.Timeout(min(CALL_TIMEOUT, remaining)).as_dict()
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+def resilient(retry: bool = False, cache: Optional[str] = None, allow_stale: bool = False) -> Callable:
+    """
+    Wrap a FarmCore method: circuit breaker, per-call deadline, jittered retries (only when
+    `retry` is set, i.e. for idempotent calls) and, if `cache` names one of FarmCore.caches,
+    cached results keyed on (method, args). Outage errors surface as FarmCoreUnavailable;
+    when `allow_stale` is set a stale cache entry is returned instead.
+
+    Retries only happen off the event loop (asyncio.to_thread, the outbox flusher, the API):
+    a call made directly from a handler gets one attempt, so a backoff never freezes the bot.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            store = self.caches[cache] if cache else None
+            key = (fn.__name__,) + args + tuple(sorted(kwargs.items()))
+            if store is not None:
+                found, value = store.get(key)
+                if found:
+                    return value
+            deadline = time.monotonic() + CALL_DEADLINE
+            may_retry = retry and not _on_event_loop()
+            outer = getattr(_call_deadline, "value", None)
+            _call_deadline.value = deadline if outer is None else min(outer, deadline)
+            try:
+                attempt = 0
+                while True:
+                    try:
+                        self.breaker.before_call()
+                        result = fn(self, *args, **kwargs)
+                    except Exception as e:
+                        err = classify(e)
+                        if err is None:
+                            if isinstance(e, APIError):
+                                # Supabase answered (bad request, constraint violation...): not an outage
+                                self.breaker.record_success()
+                            else:
+                                self.breaker.release_trial()
+                            raise
+                        if not isinstance(e, CircuitOpenError):
+                            self.breaker.record_failure()
+                        attempt += 1
+                        delay = _backoff(attempt)
+                        if may_retry and attempt < READ_ATTEMPTS and not isinstance(err, CircuitOpenError) \
+                                and time.monotonic() + delay < deadline:
+                            logger.info("%s failed (%s), retry %d in %.2fs", fn.__name__, err, attempt, delay)
+                            time.sleep(delay)
+                            continue
+                        if store is not None and allow_stale:
+                            found, value = store.get(key, allow_stale=True)
+                            if found:
+                                logger.warning("%s: serving stale cache entry (%s)", fn.__name__, err)
+                                return value
+                        if err is e:
+                            raise
+                        raise err from e
+                    self.breaker.record_success()
+                    if store is not None and result is not None:
+                        store.set(key, result)
+                    return result
+            finally:
+                _call_deadline.value = outer
+        return wrapper
+    return decorator
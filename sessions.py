@@ -0,0 +1,124 @@
+# sessions.py
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger("sessions")
+
+CONVERSATION_TIMEOUT = int(os.getenv("CONVERSATION_TIMEOUT", "900"))          # abandoned wizard -> END after 15 min
+SESSION_IDLE_TTL = int(os.getenv("SESSION_IDLE_TTL", "1800"))                 # drop user_data after 30 min idle
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024)))       # per farmer
+SESSIONS_MAX_BYTES = int(os.getenv("SESSIONS_MAX_BYTES", str(64 * 1024 * 1024)))  # all farmers together
+SWEEP_INTERVAL = 60
+
+# keys the conversation wizards leave in user_data; none of them is needed once a flow ends
+WIZARD_KEYS = (
+    "crop_name", "planting_date", "crop_id", "edit_crop_id",
+    "harvest_id", "harvest_date", "harvest_quantity", "collector_name", "bulk_harvest",
+    "category", "amount", "payment_id", "payment_type",
+    "product_name", "treatment_date", "treatment_cost",
+    "name", "phone", "village",
+)
+
+def deep_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Approximate memory held by obj and everything it references (containers and scalars)."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(i, seen) for i in obj)
+    return size
+
+def clear_wizard_keys(user_data: Dict) -> None:
+    for key in WIZARD_KEYS:
+        user_data.pop(key, None)
+
+class SessionManager:
+    """
+    Keeps per-farmer session memory bounded: tracks when each user was last active (LRU order),
+    and a periodic sweep drops user_data of idle users, trims users over SESSION_MAX_BYTES to
+    their non-wizard keys, and evicts least recently active users while the total is over
+    SESSIONS_MAX_BYTES.
+    """
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL, max_user_bytes: int = SESSION_MAX_BYTES,
+                 max_total_bytes: int = SESSIONS_MAX_BYTES):
+        self.idle_ttl = idle_ttl
+        self.max_user_bytes = max_user_bytes
+        self.max_total_bytes = max_total_bytes
+        self.last_seen: "OrderedDict[int, float]" = OrderedDict()
+        self.sizes: Dict[int, int] = {}
+        self.evicted = 0
+
+    async def track(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """TypeHandler callback (group -2, before everything else): mark the sender as active."""
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is not None:
+            self.last_seen[user.id] = time.monotonic()
+            self.last_seen.move_to_end(user.id)
+
+    def _drop(self, application, user_id: int) -> None:
+        application.drop_user_data(user_id)
+        self.last_seen.pop(user_id, None)
+        self.sizes.pop(user_id, None)
+        self.evicted += 1
+
+    def sweep_application(self, application) -> Dict[str, int]:
+        now = time.monotonic()
+        dropped = trimmed = 0
+        for user_id in list(application.user_data):
+            seen = self.last_seen.get(user_id)
+            # users unknown to the tracker (e.g. loaded before it started) count as idle
+            if seen is None or now - seen > self.idle_ttl:
+                self._drop(application, user_id)
+                dropped += 1
+        # the tracker itself stays bounded too: oldest entries first, stop at the first recent one
+        while self.last_seen:
+            user_id, seen = next(iter(self.last_seen.items()))
+            if now - seen <= self.idle_ttl:
+                break
+            self.last_seen.popitem(last=False)
+            self.sizes.pop(user_id, None)
+        total = 0
+        for user_id, data in list(application.user_data.items()):
+            size = deep_size(data)
+            if size > self.max_user_bytes:
+                clear_wizard_keys(data)
+                size = deep_size(data)
+                trimmed += 1
+            self.sizes[user_id] = size
+            total += size
+        # over the global cap: evict least recently active first
+        for user_id in list(self.last_seen):
+            if total <= self.max_total_bytes:
+                break
+            if user_id in application.user_data:
+                total -= self.sizes.get(user_id, 0)
+                self._drop(application, user_id)
+                dropped += 1
+        if dropped or trimmed:
+            logger.info("Session sweep: dropped=%d trimmed=%d users=%d bytes=%d", dropped, trimmed, len(application.user_data), total)
+        return {"dropped": dropped, "trimmed": trimmed, "total_bytes": total}
+
+    async def sweep(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """JobQueue callback."""
+        self.sweep_application(context.application)
+
+    def stats(self) -> Dict[str, int]:
+        return {"users": len(self.sizes), "total_bytes": sum(self.sizes.values()), "evicted": self.evicted}
+
+sessions = SessionManager()
+
+async def conversation_timed_out(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """ConversationHandler.TIMEOUT handler: the flow was abandoned, forget what it collected."""
+    if context.user_data is not None:
+        clear_wizard_keys(context.user_data)
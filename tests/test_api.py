@@ -0,0 +1,81 @@
+# tests/test_api.py
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import core_singleton
+from api import decode_cursor, encode_cursor, router
+from benchmarks.fakes import FakeSupabase
+from farmcore import FarmCore
+from invalidation import LocalInvalidationBus
+
+AUTH = {"Authorization": "Bearer dash-token"}
+PLANTED = ["2026-03-01", None, "2026-01-10", None, "2025-12-24"]
+
+@pytest.fixture
+def bus():
+    bus = LocalInvalidationBus()
+    asyncio.run(bus.start())
+    return bus
+
+@pytest.fixture
+def client(monkeypatch, bus):
+    monkeypatch.setenv("DASHBOARD_API_TOKENS", "other-token, dash-token")
+    db = FakeSupabase()
+    for i, planted in enumerate(PLANTED):
+        db.add("crops", {"id": f"c{i}", "farmer_id": "f1", "name": f"Crop {i}", "planting_date": planted, "notes": None})
+    monkeypatch.setattr(core_singleton, "farm_core", FarmCore(client=db))
+    app = FastAPI()
+    app.state.invalidation_bus = bus
+    app.include_router(router)
+    return TestClient(app)
+
+@pytest.mark.parametrize("headers", [{}, {"Authorization": "Bearer wrong"}, {"Authorization": "Basic dash-token"}])
+def test_requests_without_a_dashboard_token_are_rejected(client, headers):
+    response = client.get("/api/crops", headers=headers)
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+
+def test_cursor_pages_cover_undated_rows_once(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "fields": "name"} | ({"cursor": cursor} if cursor else {})
+        body = client.get("/api/crops", params=params, headers=AUTH).json()
+        seen.extend(row["id"] for row in body["data"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    expected = sorted(range(len(PLANTED)), key=lambda i: (PLANTED[i] is None, PLANTED[i] or "", i))
+    assert seen == [f"c{i}" for i in expected]
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("2026-03-01", "c0")) == ("2026-03-01", "c0")
+    assert decode_cursor(encode_cursor(None, "c1")) == (None, "c1")
+    assert decode_cursor(encode_cursor(12.5, 7)) == (12.5, 7)
+
+@pytest.mark.parametrize("value, row_id", [
+    ("2026-03-01", None), ("2026-03-01", ""), (None, True), ({"a": 1}, "c1"), (["x"], "c1"), ("a,b", "c1"), ("x", "c1)"),
+])
+def test_malformed_cursors_are_rejected(client, value, row_id):
+    response = client.get("/api/crops", params={"cursor": encode_cursor(value, row_id)}, headers=AUTH)
+    assert response.status_code == 400
+    assert client.get("/api/crops", params={"cursor": "not base64 json"}, headers=AUTH).status_code == 400
+
+def test_etag_answers_304_until_the_table_changes(client, bus):
+    first = client.get("/api/crops", headers=AUTH)
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    repeat = client.get("/api/crops", headers=AUTH | {"If-None-Match": etag})
+    assert repeat.status_code == 304 and repeat.headers["etag"] == etag
+
+    bus.publish("crops", {"farmer_id": "f1"})
+    changed = client.get("/api/crops", headers=AUTH | {"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+def test_no_etag_while_the_bus_is_disconnected(client, bus):
+    asyncio.run(bus.stop())
+    response = client.get("/api/crops", headers=AUTH | {"If-None-Match": "*"})
+    assert response.status_code == 200 and "etag" not in response.headers
@@ -0,0 +1,51 @@
+# tests/test_bulk_harvest.py
+import pytest
+
+from aboutcrop import _parse_bulk_harvest
+from farmcore import parse_number
+
+CROPS = [
+    {"id": "c1", "name": "Tomato"},
+    {"id": "c2", "name": "Cucumber"},
+    {"id": "c3", "name": "باذنجان"},
+    {"id": "c4", "name": "Potato"},
+    {"id": "c5", "name": "potato"},
+]
+
+def _quantities(text):
+    items, rejected, ambiguous = _parse_bulk_harvest(text, CROPS)
+    return {i["crop_id"]: i["quantity"] for i in items}, rejected, ambiguous
+
+@pytest.mark.parametrize("text, expected", [
+    ("12.5", 12.5),
+    ("12,5", 12.5),
+    ("12,50", 12.5),
+    ("1,200", 1200.0),
+    ("1,200,000.5", 1200000.5),
+    ("١٢٫٥", 12.5),
+    ("١٬٢٠٠", 1200.0),
+    (" 40 ", 40.0),
+])
+def test_parse_number(text, expected):
+    assert parse_number(text) == expected
+
+@pytest.mark.parametrize("text", ["1,2345", "12,", ",5", "1.2.3", "-5", "abc", ""])
+def test_parse_number_rejects_unclear_values(text):
+    with pytest.raises(ValueError):
+        parse_number(text)
+
+def test_decimal_comma_stays_inside_the_quantity():
+    quantities, rejected, ambiguous = _quantities("tomato 12,5, cucumber 40kg; 35 باذنجان")
+    assert quantities == {"c1": 12.5, "c2": 40.0, "c3": 35.0}
+    assert rejected == [] and ambiguous == []
+
+def test_thousands_separator_and_arabic_separators():
+    quantities, rejected, _ = _quantities("tomato 1,200، cucumber ٣٫٥")
+    assert quantities == {"c1": 1200.0, "c2": 3.5}
+    assert rejected == []
+
+def test_unknown_zero_unclear_and_ambiguous_fragments():
+    quantities, rejected, ambiguous = _quantities("okra 10, tomato 0, cucumber 1,2345\npotato 7")
+    assert quantities == {}
+    assert rejected == ["okra 10", "tomato 0", "cucumber 1,2345"]
+    assert ambiguous == ["potato 7"]
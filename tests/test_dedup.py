@@ -0,0 +1,36 @@
+# tests/test_dedup.py
+import sqlite3
+import time
+
+import pytest
+
+from dedup import BUSY_TIMEOUT, UpdateDeduplicator
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "dedup.db")
+
+def test_workers_sharing_a_table_claim_each_update_once(path):
+    a, b = UpdateDeduplicator(path=path), UpdateDeduplicator(path=path)
+    try:
+        assert a.claim(1) and not b.claim(1)
+        a.release(1)  # a could not enqueue it: its redelivery is processed again
+        assert a.claim(1)
+        assert (a.duplicates, b.duplicates) == (0, 1)
+    finally:
+        a.close()
+        b.close()
+
+def test_locked_shared_table_fails_open_quickly(path):
+    dedup = UpdateDeduplicator(path=path)
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
+    try:
+        started = time.monotonic()
+        assert dedup.claim(7)  # falls back to the in-process set
+        assert time.monotonic() - started < BUSY_TIMEOUT + 0.5
+        assert not dedup.claim(7)
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+        dedup.close()
@@ -0,0 +1,107 @@
+# tests/test_invalidation.py
+import asyncio
+import logging
+
+import pytest
+import realtime
+
+from benchmarks.fakes import FakeSupabase
+from farmcore import FarmCore
+from invalidation import LONG_TTLS, InvalidationBus, LocalInvalidationBus, RealtimeInvalidationBus, _call_arg
+
+def _core():
+    db = FakeSupabase()
+    db.add("farmers", {"id": "f1", "telegram_id": 1, "language": "en"})
+    db.add("farmers", {"id": "f2", "telegram_id": 2, "language": "ar"})
+    db.add("crops", {"id": "c1", "farmer_id": "f1", "name": "Tomato"})
+    db.add("crops", {"id": "c2", "farmer_id": "f2", "name": "Potato"})
+    db.add("market_prices", {"id": "m1", "crop_name": "Tomato", "price": 900, "price_date": "2026-05-01"})
+    return FarmCore(client=db)
+
+def _keys(core, name):
+    return sorted(core.caches[name]._data, key=repr)
+
+def test_call_arg_reads_positional_and_keyword_keys():
+    assert _call_arg(("get_farmer", 7), 0, "telegram_id") == 7
+    assert _call_arg(("get_farmer", ("telegram_id", 7)), 0, "telegram_id") == 7
+    assert _call_arg(("get_market_prices", "Tomato", 5), 0, "crop_name") == "Tomato"
+    assert _call_arg(("get_market_prices", ("limit", 5)), 0, "crop_name") is None
+    assert _call_arg(("get_market_prices",), 0, "crop_name") is None
+
+def test_crop_change_evicts_only_that_farmers_list():
+    core, bus = _core(), LocalInvalidationBus()
+    bus.attach(core)
+    core.get_farmer_crops("f1")
+    core.get_farmer_crops(farmer_id="f2")
+
+    assert bus.publish("crops", {"id": "c3", "farmer_id": "f2"}) == 1
+    assert _keys(core, "crops") == [("get_farmer_crops", "f1")]
+    assert bus.versions == {"crops": 1}
+
+def test_old_record_and_missing_column_evictions():
+    core, bus = _core(), LocalInvalidationBus()
+    bus.attach(core)
+    core.get_farmer(1)
+    core.get_farmer(2)
+
+    # a farmer moved from telegram_id 1 to 3: the old value's entry goes
+    assert bus.publish("farmers", {"telegram_id": 3}, {"telegram_id": 1}) == 1
+    assert _keys(core, "farmers") == [("get_farmer", 2)]
+    # a delete without REPLICA IDENTITY FULL only carries the id: every get_farmer entry goes
+    core.get_farmer(1)
+    assert bus.publish("farmers", None, {"id": "f1"}) == 2
+    assert _keys(core, "farmers") == []
+
+def test_unfiltered_price_reads_always_go():
+    core, bus = _core(), LocalInvalidationBus()
+    bus.attach(core)
+    core.get_market_prices()
+    core.get_market_prices("Tomato")
+    core.get_market_prices(crop_name="Potato", limit=5)
+
+    assert bus.publish("market_prices", {"crop_name": "Tomato"}) == 2
+    assert _keys(core, "market_prices") == [("get_market_prices", ("crop_name", "Potato"), ("limit", 5))]
+    assert bus.publish("harvests", {"crop_id": "c1"}) == 0  # versioned only
+
+def test_connecting_clears_caches_and_stretches_ttls():
+    core, bus = _core(), LocalInvalidationBus()
+    bus.attach(core)
+    base = core.caches["crops"].ttl
+    core.get_farmer_crops("f1")
+    assert bus.version(["crops"]) is None
+
+    asyncio.run(bus.start())
+    assert _keys(core, "crops") == []
+    assert core.caches["crops"].ttl == max(base, LONG_TTLS["crops"])
+    before = bus.version(["crops"])
+    bus.publish("crops", {"farmer_id": "f1"})
+    assert bus.version(["crops"]) != before
+
+    asyncio.run(bus.stop())
+    assert core.caches["crops"].ttl == base
+    assert bus.version(["crops"]) is None
+
+def test_base_bus_cannot_be_started():
+    with pytest.raises(TypeError):
+        InvalidationBus()
+
+def test_realtime_client_without_read_loop_is_not_used(monkeypatch, caplog):
+    closed = []
+
+    class _RenamedClient:
+        """A realtime release that renamed the private read-loop task."""
+        def __init__(self, url, key):
+            self.is_connected = True
+        async def connect(self):
+            pass
+        async def close(self):
+            closed.append(True)
+
+    monkeypatch.setattr(realtime, "AsyncRealtimeClient", _RenamedClient)
+    bus = RealtimeInvalidationBus("https://example.supabase.co", "key")
+    bus.attach(_core())
+    with caplog.at_level(logging.ERROR, logger="invalidation"), pytest.raises(RuntimeError):
+        asyncio.run(bus.start())
+    assert closed == [True] and bus.client is None and bus._watchdog is None
+    assert not bus.connected
+    assert "_listen_task" in caplog.records[0].getMessage()
@@ -0,0 +1,45 @@
+# tests/test_keyset_pages.py
+from aboutcrop import _crop_page_data, _parse_crop_page_data
+from benchmarks.fakes import FakeSupabase
+from farmcore import FarmCore
+
+PLANTED = ["2026-03-01", None, "2026-01-10", None, "2026-03-01", "2025-12-24", None]
+
+def _core():
+    db = FakeSupabase()
+    farmer = db.add("farmers", {"id": "f1", "telegram_id": 1, "language": "en"})
+    for i, planted in enumerate(PLANTED):
+        db.add("crops", {"id": f"c{i}", "farmer_id": "f1", "name": f"Crop {i}", "planting_date": planted})
+    return FarmCore(client=db), farmer
+
+def _expected_order():
+    crops = [(planted, f"c{i}") for i, planted in enumerate(PLANTED)]
+    return [crop_id for planted, crop_id in sorted(crops, key=lambda c: (c[0] is None, c[0] or "", c[1]))]
+
+def _walk(core, farmer, backward_from=None, size=2):
+    """Follow the Next (or Prev) buttons through the callback data, like the My Crops view."""
+    seen, data = [], backward_from
+    backward = data is not None
+    cursor = _parse_crop_page_data(data)[0] if data else None
+    while True:
+        page = core.get_farmer_crops_page(farmer["id"], cursor=cursor, limit=size, backward=backward)
+        if not page:
+            return seen
+        seen.extend(c["id"] for c in page)
+        cursor, _ = _parse_crop_page_data(_crop_page_data("p" if backward else "n", page[-1]))
+
+def test_next_pages_include_undated_crops_once():
+    core, farmer = _core()
+    assert _walk(core, farmer) == _expected_order()
+
+def test_prev_pages_from_an_undated_crop_reach_the_first_crop():
+    core, farmer = _core()
+    order = _expected_order()
+    last = {"id": order[-1], "planting_date": None}
+    assert _walk(core, farmer, backward_from=_crop_page_data("p", last)) == list(reversed(order[:-1]))
+
+def test_undated_cursor_round_trips_as_none():
+    data = _crop_page_data("n", {"id": "c1", "planting_date": None})
+    assert data == "crop_page:n::c1"
+    assert _parse_crop_page_data(data) == ((None, "c1"), False)
+    assert _parse_crop_page_data("crop_page:n:None:c1") == ((None, "c1"), False)
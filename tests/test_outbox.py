@@ -0,0 +1,126 @@
+# tests/test_outbox.py
+import logging
+import sqlite3
+from datetime import date
+
+import pytest
+from postgrest.exceptions import APIError
+
+import outbox as outbox_module
+from outbox import WriteOutbox
+from resilience import FarmCoreUnavailable
+
+class _Backend:
+    """insert_idempotent stand-in: rejects rows whose category is "bad", or everything during an outage."""
+
+    def __init__(self):
+        self.down = False
+        self.calls = []
+        self.saved = []
+
+    def insert_idempotent(self, table, rows):
+        self.calls.append([r["category"] for r in rows])
+        if self.down:
+            raise FarmCoreUnavailable("circuit open")
+        if any(r["category"] == "bad" for r in rows):
+            raise APIError({"message": "null value in column", "code": "23502"})
+        self.saved.extend(r["category"] for r in rows)
+        return rows
+
+@pytest.fixture
+def box(tmp_path):
+    box = WriteOutbox(str(tmp_path / "outbox.db"))
+    yield box
+    box.close()
+
+def _submit(box, *categories):
+    for category in categories:
+        box.submit("add_expense", farmer_id="f1", expense_date=date(2026, 5, 1), category=category, amount=1000)
+
+def _rows(box):
+    return box._conn.execute("SELECT json_extract(payload, '$.category'), attempts, dead, next_attempt_at FROM outbox ORDER BY id").fetchall()
+
+def test_rejected_batch_is_replayed_row_by_row(box):
+    backend = _Backend()
+    _submit(box, "a", "bad", "b")
+
+    assert box.flush_once(backend) == 2
+    assert backend.calls == [["a", "bad", "b"], ["a"], ["bad"], ["b"]]
+    assert backend.saved == ["a", "b"]
+    [(category, attempts, dead, next_attempt_at)] = _rows(box)
+    assert (category, attempts, dead) == ("bad", 1, 0)
+    assert next_attempt_at > 0
+
+def test_rejected_row_waits_for_its_backoff(box, monkeypatch):
+    backend = _Backend()
+    _submit(box, "bad")
+    box.flush_once(backend)
+    backend.calls.clear()
+
+    # still inside the first backoff window: the row is not replayed
+    assert box.flush_once(backend) == 0
+    assert backend.calls == []
+
+    clock = outbox_module.time.time() + outbox_module.RETRY_BASE + 1
+    monkeypatch.setattr(outbox_module.time, "time", lambda: clock)
+    box.flush_once(backend)
+    assert backend.calls == [["bad"]]
+    [(_, attempts, _, next_attempt_at)] = _rows(box)
+    assert attempts == 2
+    assert next_attempt_at == pytest.approx(clock + 2 * outbox_module.RETRY_BASE)
+
+def test_outage_stops_the_flush_without_charging_attempts(box):
+    backend = _Backend()
+    backend.down = True
+    _submit(box, "a", "b")
+
+    assert box.flush_once(backend) == 0
+    assert [(c, a, d) for c, a, d, _ in _rows(box)] == [("a", 0, 0), ("b", 0, 0)]
+    assert box.stats()["failed_flushes"] == 1
+
+    backend.down = False
+    assert box.flush_once(backend) == 2
+    assert _rows(box) == []
+
+def test_row_is_dead_lettered_loudly_after_max_attempts(box, monkeypatch, caplog):
+    monkeypatch.setattr(outbox_module, "MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(outbox_module, "RETRY_BASE", 0.0)
+    backend = _Backend()
+    _submit(box, "bad", "ok")
+
+    with caplog.at_level(logging.WARNING, logger="outbox"):
+        for _ in range(5):
+            box.flush_once(backend)
+
+    assert backend.calls.count(["bad"]) == 3  # never replayed once dead
+    assert [(c, a, d) for c, a, d, _ in _rows(box)] == [("bad", 3, 1)]
+    assert box.stats()["dead"] == 1 and box.stats()["depth"] == 0
+    errors = [r for r in caplog.records if r.levelno == logging.ERROR]
+    assert len(errors) == 1 and '"category": "bad"' in errors[0].getMessage()
+
+def test_old_outbox_files_gain_the_backoff_column(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, payload TEXT NOT NULL,"
+                 " created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, dead INTEGER NOT NULL DEFAULT 0)")
+    conn.execute("INSERT INTO outbox (tbl, payload, created_at) VALUES ('expenses', '{\"category\": \"a\"}', 0)")
+    conn.commit()
+    conn.close()
+
+    box = WriteOutbox(path)
+    try:
+        assert box.flush_once(_Backend()) == 1
+    finally:
+        box.close()
+
+def test_stored_harvests_are_queued_like_other_farmer_writes(box):
+    saved = []
+
+    class _Harvests:
+        def insert_idempotent(self, table, rows):
+            saved.extend((table, r["crop_id"], r["quantity"], r["status"]) for r in rows)
+            return rows
+
+    box.submit("add_harvest", crop_id="c1", harvest_date=date(2026, 5, 1), quantity=12.5, status="stored")
+    assert box.flush_once(_Harvests()) == 1
+    assert saved == [("harvests", "c1", 12.5, "stored")]
@@ -0,0 +1,89 @@
+# tests/test_report.py
+import random
+from collections import defaultdict
+
+import pytest
+
+from aboutreport import compute_season_report, load_report_columns
+
+class _Records:
+    """Stands in for FarmCore.iter_records with fixed rows per kind."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def iter_records(self, kind, farmer_id, page_size, include_archived=False):
+        return iter(self.rows.get(kind, []))
+
+def _records(seed):
+    rng = random.Random(seed)
+    # two separate plantings called Tomato, and expenses with no crop at all
+    crops = [("t1", "Tomato"), ("t2", "Tomato"), ("p1", "Potato"), (None, None)]
+    years = ["2023", "2024", "2025", "0099", None]
+    when = lambda: None if (y := rng.choice(years)) is None else f"{y}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"
+    rows = defaultdict(list)
+    for _ in range(300):
+        crop_id, name = rng.choice(crops)
+        crop = {"name": name} if crop_id else None
+        rows["expenses"].append({"crop_id": crop_id, "crops": crop, "expense_date": when(),
+                                 "category": rng.choice(["Seeds", "Fertilizer", "Treatment", None]), "amount": rng.randint(1, 900)})
+        if crop_id is None:
+            continue
+        rows["treatments"].append({"crop_id": crop_id, "crops": crop, "treatment_date": when(), "cost": rng.choice([None, 0, 150])})
+        rows["harvests"].append({"crop_id": crop_id, "crops": crop, "harvest_date": when(), "quantity": rng.randint(1, 80)})
+        rows["payments"].append({"status": rng.choice(["paid", "pending"]), "paid_amount": rng.randint(100, 5000), "paid_date": when(),
+                                 "deliveries": {"harvests": {"crop_id": crop_id, "harvest_date": when(), "crops": crop}}})
+    return rows
+
+def _plain_report(rows):
+    """The same numbers, one record at a time."""
+    season = lambda v: int(str(v)[:4]) if v else 0
+    groups = defaultdict(lambda: {"cost_by_category": defaultdict(float), "treatment_cost": 0.0, "yield": 0.0, "revenue": 0.0})
+    names = {}
+    for e in rows["expenses"]:
+        g = groups[(e["crop_id"], season(e["expense_date"]))]
+        g["cost_by_category"][e["category"] or "Other"] += e["amount"]
+        names[e["crop_id"]] = (e["crops"] or {}).get("name")
+    for t in rows["treatments"]:
+        if t["cost"]:
+            groups[(t["crop_id"], season(t["treatment_date"]))]["treatment_cost"] += t["cost"]
+            names[t["crop_id"]] = t["crops"]["name"]
+    for h in rows["harvests"]:
+        groups[(h["crop_id"], season(h["harvest_date"]))]["yield"] += h["quantity"]
+        names[h["crop_id"]] = h["crops"]["name"]
+    for p in rows["payments"]:
+        if p["status"] == "paid":
+            h = p["deliveries"]["harvests"]
+            groups[(h["crop_id"], season(h["harvest_date"] or p["paid_date"]))]["revenue"] += p["paid_amount"]
+            names[h["crop_id"]] = h["crops"]["name"]
+    out = {}
+    for (crop_id, s), g in groups.items():
+        cost = sum(g["cost_by_category"].values()) + g["treatment_cost"]
+        out[(crop_id, s)] = {
+            "crop": names[crop_id], "season": s,
+            "cost_by_category": {c: v for c, v in g["cost_by_category"].items() if v},
+            "treatment_cost": g["treatment_cost"], "cost": cost, "yield": g["yield"], "revenue": g["revenue"],
+            "cost_per_kg": cost / g["yield"] if g["yield"] else None, "margin": g["revenue"] - cost,
+        }
+    return out
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_vectorized_report_matches_plain_aggregation(seed):
+    rows = _records(seed)
+    cols = load_report_columns(_Records(rows), "f1")
+    report = compute_season_report(cols)
+    expected = _plain_report(rows)
+
+    # one line per (crop id, season): the two Tomato plantings stay apart
+    assert len(report) == len(expected)
+    for r in report:
+        e = expected[(r["crop_id"], r["season"])]
+        assert (r["crop"], r["cost_by_category"]) == (e["crop"], pytest.approx(e["cost_by_category"]))
+        for field in ("treatment_cost", "cost", "yield", "revenue", "margin"):
+            assert r[field] == pytest.approx(e[field]), field
+        assert r["cost_per_kg"] == (None if e["cost_per_kg"] is None else pytest.approx(e["cost_per_kg"]))
+    seasons = [r["season"] for r in report]
+    assert seasons == sorted(seasons, reverse=True)
+
+def test_empty_report():
+    assert compute_season_report(load_report_columns(_Records({}), "f1")) == []
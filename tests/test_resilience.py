@@ -0,0 +1,186 @@
+# tests/test_resilience.py
+import asyncio
+
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+import resilience
+from resilience import (
+    CircuitBreaker, CircuitOpenError, FarmCoreTimeout, FarmCoreUnavailable, TTLCache, cap_request_timeout, resilient,
+)
+
+class _Clock:
+    """Replaces resilience.time: monotonic() only moves when the test (or a backoff sleep) moves it."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+class _Core:
+    """The parts of FarmCore that @resilient relies on."""
+
+    def __init__(self, failures=(), threshold=5):
+        self.breaker = CircuitBreaker(threshold=threshold, reset_after=30)
+        self.caches = {"farmers": TTLCache(ttl=60, stale_for=3600)}
+        self.failures = list(failures)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return {"id": "f1"}
+
+    @resilient(retry=True)
+    def read(self):
+        return self._next()
+
+    @resilient()
+    def write(self):
+        return self._next()
+
+    @resilient(retry=True, cache="farmers", allow_stale=True)
+    def get_farmer(self, telegram_id):
+        return self._next()
+
+def test_retries_outages_off_the_event_loop(clock):
+    core = _Core(failures=[httpx.ConnectError("refused"), httpx.ReadTimeout("slow")])
+    assert core.read() == {"id": "f1"}
+    assert core.calls == 3
+    assert len(clock.sleeps) == 2
+
+def test_single_attempt_on_the_event_loop(clock):
+    core = _Core(failures=[httpx.ConnectError("refused")])
+
+    async def handler():
+        return core.read()
+
+    with pytest.raises(FarmCoreUnavailable):
+        asyncio.run(handler())
+    assert core.calls == 1 and clock.sleeps == []
+
+def test_writes_and_database_rejections_are_not_retried(clock):
+    core = _Core(failures=[httpx.ConnectError("refused")])
+    with pytest.raises(FarmCoreUnavailable):
+        core.write()
+    assert core.calls == 1
+
+    core = _Core(failures=[APIError({"message": "duplicate key", "code": "23505"})])
+    with pytest.raises(APIError):
+        core.read()
+    assert core.calls == 1
+    assert core.breaker.failures == 0  # Supabase answered: not an outage
+
+def test_timeouts_are_classified():
+    assert isinstance(resilience.classify(APIError({"message": "canceled", "code": "57014"})), FarmCoreTimeout)
+    assert isinstance(resilience.classify(APIError({"message": "bad gateway", "code": "502"})), FarmCoreUnavailable)
+    assert resilience.classify(ValueError("bug")) is None
+
+def test_breaker_opens_then_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(threshold=2, reset_after=30)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 30
+    assert breaker.state == "half_open"
+    breaker.before_call()  # the trial
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one trial at a time
+
+    breaker.record_failure()  # trial failed: open for another reset_after
+    assert breaker.state == "open"
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+def test_breaker_release_trial_lets_the_next_call_decide(clock):
+    breaker = CircuitBreaker(threshold=1, reset_after=30)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.before_call()
+    breaker.release_trial()
+    breaker.before_call()  # not rejected as a second concurrent trial
+
+def test_open_circuit_rejects_without_calling_supabase(clock):
+    core = _Core(failures=[httpx.ConnectError("refused")] * 2, threshold=2)
+    for _ in range(2):
+        with pytest.raises(FarmCoreUnavailable):
+            core.write()
+    with pytest.raises(CircuitOpenError):
+        core.write()
+    assert core.calls == 2
+
+def test_ttl_cache_fresh_stale_and_expired(clock):
+    cache = TTLCache(ttl=60, stale_for=100)
+    cache.set(("get_farmer", 1), "row")
+    assert cache.get(("get_farmer", 1)) == (True, "row")
+    clock.now += 61
+    assert cache.get(("get_farmer", 1)) == (False, None)
+    assert cache.get(("get_farmer", 1), allow_stale=True) == (True, "row")
+    clock.now += 100
+    assert cache.get(("get_farmer", 1), allow_stale=True) == (False, None)
+
+def test_ttl_cache_invalidation(clock):
+    cache = TTLCache(ttl=60)
+    for key in [("get_farmer", 1), ("get_farmer", 2), ("get_farmer_crops", "f1")]:
+        cache.set(key, key)
+    cache.invalidate("get_farmer", 1)
+    assert cache.get(("get_farmer", 1)) == (False, None)
+    assert cache.get(("get_farmer", 2))[0]
+    assert cache.invalidate_where(lambda k: k[0] == "get_farmer_crops") == 1
+    cache.invalidate()
+    assert cache.get(("get_farmer", 2)) == (False, None)
+
+def test_ttl_cache_drops_oldest_entries_when_full(clock):
+    cache = TTLCache(ttl=60, max_entries=10)
+    for i in range(10):
+        cache.set(("k", i), i)
+        clock.now += 1
+    cache.set(("k", 10), 10)
+    assert cache.get(("k", 0)) == (False, None)
+    assert cache.get(("k", 1)) == (True, 1)
+    assert cache.get(("k", 10)) == (True, 10)
+
+def test_cached_read_serves_stale_entry_during_an_outage(clock):
+    core = _Core()
+    assert core.get_farmer(7) == {"id": "f1"}
+    assert core.get_farmer(7) == {"id": "f1"} and core.calls == 1  # fresh hit
+
+    clock.now += 120
+    core.failures = [httpx.ConnectError("refused")] * 3
+    assert core.get_farmer(7) == {"id": "f1"}  # stale, after the retries
+    assert core.calls == 4
+
+def test_request_timeout_is_capped_by_the_call_deadline(clock):
+    request = httpx.Request("GET", "http://localhost/rest/v1/farmers")
+    cap_request_timeout(request)  # outside a FarmCore call: untouched
+    assert "timeout" not in request.extensions
+
+    resilience._call_deadline.value = clock.now + 1.5
+    try:
+        cap_request_timeout(request)
+        assert request.extensions["timeout"]["read"] == pytest.approx(1.5)
+        clock.now += 2
+        with pytest.raises(FarmCoreTimeout):
+            cap_request_timeout(request)
+    finally:
+        resilience._call_deadline.value = None
@@ -0,0 +1,52 @@
+# tests/test_sessions.py
+import asyncio
+import os
+
+os.environ.setdefault("LOG_FILE", "")
+
+from telegram import Update, User
+from telegram.ext import ExtBot
+
+import main
+from sessions import sessions
+
+USER_ID = 4242
+
+async def _offline_get_me(self, *args, **kwargs):
+    return User(id=1, is_bot=True, first_name="farmbot", username="farmbot_test_bot")
+
+def _callback_update(app, update_id: int) -> Update:
+    # a callback no handler claims: only the group -2/-1 TypeHandlers match it
+    return Update.de_json({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "1",
+            "data": "nothing_matches_this",
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Farmer"},
+        },
+    }, app.bot)
+
+def test_track_fills_last_seen_and_sweep_keeps_active_wizard(monkeypatch):
+    monkeypatch.setattr(ExtBot, "get_me", _offline_get_me)
+    monkeypatch.setattr(sessions, "last_seen", type(sessions.last_seen)())
+    app = main._build_telegram_app("123456:TEST")
+
+    async def scenario():
+        await app.initialize()
+        try:
+            await app.process_update(_callback_update(app, 1))
+            assert USER_ID in sessions.last_seen
+
+            # a wizard in progress for the active farmer, and data left by someone never seen
+            app.user_data[USER_ID]["crop_name"] = "Tomato"
+            app.user_data[USER_ID + 1]["crop_name"] = "Potato"
+            result = sessions.sweep_application(app)
+
+            assert app.user_data[USER_ID] == {"crop_name": "Tomato"}
+            assert USER_ID + 1 not in app.user_data
+            assert result["dropped"] == 1
+        finally:
+            await app.shutdown()
+
+    asyncio.run(scenario())
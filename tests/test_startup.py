@@ -0,0 +1,20 @@
+# tests/test_startup.py
+import os
+import subprocess
+import sys
+
+os.environ.setdefault("LOG_FILE", "")
+
+import main
+
+def test_importing_main_leaves_the_supabase_sdk_to_startup():
+    # a fresh interpreter: other tests have already imported farmcore into this one
+    code = "import sys, main; print(sorted(m for m in ('supabase', 'postgrest', 'farmcore', 'api') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env={**os.environ, "LOG_FILE": ""})
+    assert out.stdout.strip() == "[]"
+
+def test_api_is_mounted_once():
+    main._mount_api()
+    main._mount_api()
+    assert [r.path for r in main.app.router.routes if r.path.startswith("/api/")] == ["/api/{resource}"]